@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark: single-pass DATESTAMP_CLASSIFIER vs. the REGEX_PATTERNS cascade.
+
+Generates a synthetic corpus of mixed basenames (all known datestamp styles plus
+unstamped names) and compares
+
+- the cascade generate_new_basename() used to run per name: both withtime patterns
+  eagerly, then STANDARD, COMPACT, SHORT and MONTH one by one,
+- the cascade remove_timestamp_from_basename() used to run per name: all of
+  REGEX_PATTERNS,
+
+against one classify_basename() call per name. Then it compares the bulk functions with
+the per-name path on the corpus and on a listing of mostly unstamped names:
+
+- classify_many() with classify_basename() and reading the fields of its result,
+- strip_many() with remove_timestamp_from_basename().
+
+Usage:  python3 benchmarks/bench_classifier.py [number_of_names]
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import date2name  # noqa: E402
+from corpus import generate_names as generate_corpus  # noqa: E402
+
+REGEX_PATTERNS = date2name.REGEX_PATTERNS
+
+
+def cascade_generate(basename):
+    """The per-name matching generate_new_basename() did before DATESTAMP_CLASSIFIER."""
+    withtime_and_seconds = REGEX_PATTERNS['WITHTIME_AND_SECONDS'].match(basename)
+    withtime_no_seconds = REGEX_PATTERNS['WITHTIME_NO_SECONDS'].match(basename)
+    if REGEX_PATTERNS['NODATESTAMP'].match(basename):
+        return 'NODATESTAMP', None
+    elif withtime_and_seconds:
+        return 'WITHTIME_AND_SECONDS', withtime_and_seconds
+    elif withtime_no_seconds:
+        return 'WITHTIME_NO_SECONDS', withtime_no_seconds
+    for kind in ('STANDARD', 'COMPACT', 'SHORT', 'MONTH'):
+        components = REGEX_PATTERNS[kind].match(basename)
+        if components:
+            return kind, components
+    return None
+
+
+def cascade_remove(basename):
+    """The per-name matching remove_timestamp_from_basename() did before DATESTAMP_CLASSIFIER."""
+    for regular_expression in [REGEX_PATTERNS[_] for _ in REGEX_PATTERNS]:
+        if regular_expression.match(basename):
+            basename = regular_expression.sub(repl='', string=basename, count=1).strip()
+    return basename
+
+
+def measure(function, corpus, repeat=5):
+    """Best of several runs over the whole corpus, in names per second."""
+    def run():
+        for name in corpus:
+            function(name)
+    best = min(timeit.repeat(run, number=1, repeat=repeat))
+    return len(corpus) / best
+
+
+def measure_bulk(function, corpus, repeat=5):
+    """Best of several calls of function with the whole corpus, in names per second."""
+    best = min(timeit.repeat(lambda: function(corpus), number=1, repeat=repeat))
+    return len(corpus) / best
+
+
+def classify_with_fields(basename):
+    """The per-name counterpart of classify_many(): the kind and all fields of the datestamp."""
+    datestamp = date2name.classify_basename(basename)
+    if datestamp is not None:
+        return (datestamp.kind, datestamp.year, datestamp.month, datestamp.day, datestamp.hour, datestamp.minute,
+                datestamp.second, datestamp.length)
+
+
+def main(number_of_names):
+    corpus = generate_corpus(number_of_names)
+    print('%d synthetic names' % len(corpus))
+    for label, cascade, classifier in [
+            ('classification', cascade_generate, date2name.classify_basename),
+            ('removal', cascade_remove, date2name.remove_timestamp_from_basename)]:
+        cascade_speed = measure(cascade, corpus)
+        classifier_speed = measure(classifier, corpus)
+        print('%-15s cascade %10.0f names/s   classifier %10.0f names/s   (%.2fx)' % (
+            label, cascade_speed, classifier_speed, classifier_speed / cascade_speed))
+    listing = generate_corpus(number_of_names, {'NODATESTAMP': 9, 'STANDARD': 1})
+    for corpus_label, names in [('corpus', corpus), ('listing', listing)]:
+        for label, per_name, bulk in [
+                ('classify_many', classify_with_fields, date2name.classify_many),
+                ('strip_many', date2name.remove_timestamp_from_basename, date2name.strip_many)]:
+            per_name_speed = measure(per_name, names)
+            bulk_speed = measure_bulk(bulk, names)
+            print('%-7s %-14s per name %10.0f names/s   bulk %10.0f names/s   (%.2fx)' % (
+                corpus_label, label, per_name_speed, bulk_speed, bulk_speed / per_name_speed))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
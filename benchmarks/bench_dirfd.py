@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: renaming relative to directory descriptors vs. paths vs. chdir per item.
+
+Creates NUMBER_OF_FILES empty files in one temporary directory and stamps them
+
+- with the command line interface, the paths passed via "find -print0 | xargs -0",
+- with rename_many() using directory descriptors (the default where supported),
+- with rename_many() using paths (the fallback on Windows),
+- with the loop date2name used to run: os.chdir() to the parent directory and
+  back for every item, rename relative to the working directory.
+
+Usage:  python3 benchmarks/bench_dirfd.py [number_of_files]
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+NUMBER_OF_FILES = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import date2name  # noqa: E402
+
+PROGRAM = os.path.abspath(date2name.__file__)
+
+
+def create_files(directory):
+    paths = []
+    for index in range(NUMBER_OF_FILES):
+        path = os.path.join(directory, 'file-%06d.txt' % index)
+        open(path, 'w').close()
+        paths.append(path)
+    return paths
+
+
+def run_xargs(directory, paths):
+    subprocess.run('find "%s" -type f -print0 | xargs -0 "%s" "%s" --quiet' % (directory, sys.executable, PROGRAM),
+                   shell=True, check=True)
+
+
+def run_dir_fd(directory, paths):
+    date2name.USE_DIR_FD = True
+    date2name.rename_many(paths, date2name.RenameConfig())
+
+
+def run_paths(directory, paths):
+    date2name.USE_DIR_FD = False
+    try:
+        date2name.rename_many(paths, date2name.RenameConfig())
+    finally:
+        date2name.USE_DIR_FD = os.rename in os.supports_dir_fd and os.stat in os.supports_dir_fd
+
+
+def run_chdir(directory, paths):
+    config = date2name.RenameConfig()
+    original_path = os.getcwd()
+    for item in paths:
+        if os.path.isdir(item) or os.path.isfile(item):
+            os.chdir(os.path.dirname(item))
+            basename = os.path.basename(item)
+            os.rename(basename, date2name.compute_new_name(basename, config))
+            os.chdir(original_path)
+
+
+def main():
+    print('%d files in one directory' % NUMBER_OF_FILES)
+    for label, function in [('CLI via xargs', run_xargs), ('directory descriptors', run_dir_fd),
+                            ('paths', run_paths), ('chdir per item', run_chdir)]:
+        if label == 'directory descriptors' and not date2name.USE_DIR_FD:
+            continue
+        with tempfile.TemporaryDirectory() as directory:
+            paths = create_files(directory)
+            start = time.perf_counter()
+            function(directory, paths)
+            duration = time.perf_counter() - start
+            assert not any(name.startswith('file-') for name in os.listdir(directory))
+        print('%-25s %8.3f s  %10.0f files/s' % (label, duration, NUMBER_OF_FILES / duration))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Index benchmark: a nightly recursive pass over a tree of stamped files, with
+and without an index (--index).
+
+Creates a tree of stamped files in directories of 1000 files each on tmpfs if
+available and times rename_many() in recursive mode with the output written to
+/dev/null like to a log file:
+
+- full:    without an index,
+- build:   with a new index, which is written afterwards,
+- diff:    with the index, after a share of the files were modified.
+
+Usage:  python3 benchmarks/bench_index.py [--modified FRACTION] [number]
+"""
+
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import date2name  # noqa: E402
+from corpus import create_corpus, default_directory  # noqa: E402
+
+FILES_PER_DIRECTORY = 1000
+
+
+def timed_pass(top, config, index_path=None):
+    """Return the seconds of a recursive pass over top, including loading and saving the index"""
+    start = time.perf_counter()
+    index = date2name.Index(index_path, config) if index_path else None
+    date2name.rename_many([top], config, index=index)
+    if index is not None:
+        index.save()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = OptionParser(usage='%prog [options] [number]')
+    parser.add_option('--modified', dest='modified', type='float', default=0.01,
+                      help='share of the files modified before the diff pass (default: 0.01)')
+    options, args = parser.parse_args()
+    number = int(args[0]) if args else 300000
+    logging.basicConfig(level=logging.INFO, format='%(message)s', stream=open(os.devnull, 'w'))
+
+    directory = tempfile.mkdtemp(prefix='date2name-bench-', dir=default_directory())
+    try:
+        top = os.path.join(directory, '2024-01-01_tree')
+        files = []
+        for start in range(0, number, FILES_PER_DIRECTORY):
+            subdirectory = os.path.join(top, '2024-01-01_%06d' % start)
+            os.makedirs(subdirectory)
+            files.extend(create_corpus(subdirectory, min(FILES_PER_DIRECTORY, number - start),
+                                       {'STANDARD': 1.0}, seed=start))
+        config = date2name.RenameConfig(recursive=True)
+        index_path = os.path.join(directory, 'index')
+
+        full = timed_pass(top, config)
+        build = timed_pass(top, config, index_path)
+        modified = random.Random(42).sample(files, int(len(files) * options.modified))
+        for path in modified:
+            os.utime(path, ns=(0, 1700000000 * 10 ** 9))
+        diff = timed_pass(top, config, index_path)
+
+        print('%i files, %i modified, index of %.1f MB' % (len(files), len(modified),
+                                                         os.path.getsize(index_path) / 1e6))
+        print('full  %8.2f s' % full)
+        print('build %8.2f s' % build)
+        print('diff  %8.2f s   (%.1fx faster than full)' % (diff, full / diff))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: rename_many() library calls vs. one date2name process per batch.
+
+Creates BATCHES batches of BATCH_SIZE empty files in a temporary directory and
+stamps them once by running the date2name command line interface per batch
+(the way ingestion workers had to do it) and once by calling
+date2name.rename_many() per batch in the same process.
+
+Usage:  python3 benchmarks/bench_library.py [batches] [batch_size]
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BATCHES = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+BATCH_SIZE = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import date2name  # noqa: E402
+
+PROGRAM = os.path.abspath(date2name.__file__)
+
+
+def create_batches(directory):
+    """Create the empty files and return their paths grouped into batches."""
+    batches = []
+    for batch in range(BATCHES):
+        paths = []
+        for index in range(BATCH_SIZE):
+            path = os.path.join(directory, 'file %d-%d.txt' % (batch, index))
+            open(path, 'w').close()
+            paths.append(path)
+        batches.append(paths)
+    return batches
+
+
+def run_cli(batches):
+    for paths in batches:
+        subprocess.run([sys.executable, PROGRAM, '--quiet'] + paths, check=True)
+
+
+def run_library(batches):
+    config = date2name.RenameConfig()
+    for paths in batches:
+        date2name.rename_many(paths, config)
+
+
+def main():
+    print('%d batches of %d files' % (BATCHES, BATCH_SIZE))
+    for label, function in [('CLI process per batch', run_cli), ('rename_many() per batch', run_library)]:
+        with tempfile.TemporaryDirectory() as directory:
+            batches = create_batches(directory)
+            start = time.perf_counter()
+            function(batches)
+            duration = time.perf_counter() - start
+            assert len(os.listdir(directory)) == BATCHES * BATCH_SIZE
+        print('%-25s %8.3f s  %10.0f files/s' % (label, duration, BATCHES * BATCH_SIZE / duration))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark: memoized datestamps of Renamer.format_time() vs. strftime(localtime()).
+
+Generates modification times like those of a camera import: bursts of shots
+within a few seconds, a few hundred bursts per day over some weeks. Each format
+is measured with a fresh Renamer and its cache hits and misses are printed.
+
+Usage:  python3 benchmarks/bench_memo.py [number_of_timestamps]
+"""
+
+import os
+import random
+import sys
+import time
+import timeit
+
+NUMBER_OF_TIMESTAMPS = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import date2name  # noqa: E402
+
+
+def generate_timestamps(number, seed=42):
+    """Return a reproducible list of camera-like modification times."""
+    rand = random.Random(seed)
+    timestamps = []
+    start = time.mktime((2021, 3, 1, 0, 0, 0, 0, 0, -1))
+    while len(timestamps) < number:
+        shot = start + rand.uniform(0, 60 * 86400)
+        for burst in range(rand.randint(1, 20)):
+            timestamps.append(shot + burst * rand.uniform(0.1, 0.6))
+    return timestamps[:number]
+
+
+def main():
+    timestamps = generate_timestamps(NUMBER_OF_TIMESTAMPS)
+    print('%d timestamps' % len(timestamps))
+    for label, config in [('standard', date2name.RenameConfig()),
+                          ('month', date2name.RenameConfig(month=True)),
+                          ('withtime', date2name.RenameConfig(withtime=True))]:
+        formatstring = config.formatstring
+        uncached = min(timeit.repeat(lambda: [time.strftime(formatstring, time.localtime(timestamp))
+                                              for timestamp in timestamps], number=1, repeat=3))
+        renamer = date2name.Renamer(config)
+        cached = min(timeit.repeat(lambda: [renamer.format_time(timestamp) for timestamp in timestamps],
+                                   number=1, repeat=3))
+        print('%-9s strftime %6.0f ns/stamp   memo %6.0f ns/stamp   (%.2fx, %i hits, %i misses)' % (
+            label, uncached / len(timestamps) * 1e9, cached / len(timestamps) * 1e9, uncached / cached,
+            renamer.hits, renamer.misses))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Embedded time benchmark: throughput of --meta on large movie files.
+
+Creates movie files of several GB each with the movie header after the media
+data, like cameras write them, as sparse files on tmpfs if available (or takes
+the files of an existing directory with --directory) and times per file
+
+- mtime: compute_new_name() with the modification time,
+- meta:  compute_new_name() with --meta, which reads the box headers only,
+- full:  reading the file completely, the least a parser of whole files costs.
+
+The bytes read per file are taken from /proc/self/io where available.
+
+Usage:  python3 benchmarks/bench_meta.py [--size GB] [--directory DIR] [number]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import date2name  # noqa: E402
+from corpus import default_directory  # noqa: E402
+
+MP4_EPOCH = 2082844800  # seconds from 1904-01-01 to 1970-01-01
+
+
+def create_movie(path, size, created):
+    """Create a sparse MP4 file of size bytes with its movie box after the media data"""
+    mvhd = b'\x00\x00\x00\x00' + (created + MP4_EPOCH).to_bytes(4, 'big') * 2 + bytes(92)
+    moov = (16 + len(mvhd)).to_bytes(4, 'big') + b'moov' + (8 + len(mvhd)).to_bytes(4, 'big') + b'mvhd' + mvhd
+    media_size = size - 16 - 16 - len(moov)
+    with open(path, 'wb') as movie:
+        movie.write(b'\x00\x00\x00\x10ftypisom\x00\x00\x02\x00')
+        movie.write((1).to_bytes(4, 'big') + b'mdat' + (16 + media_size).to_bytes(8, 'big'))
+        movie.seek(media_size, os.SEEK_CUR)
+        movie.write(moov)
+
+
+def bytes_read():
+    """Return the bytes this process read so far or None if unknown"""
+    try:
+        with open('/proc/self/io') as io:
+            return int(next(line for line in io if line.startswith('rchar:')).split()[1])
+    except (OSError, StopIteration):
+        return None
+
+
+def read_completely(path, config):
+    """Read the file at path to its end like a parser of whole files; config is not used"""
+    with open(path, 'rb', buffering=0) as stream:
+        while stream.read(1 << 20):
+            pass
+
+
+def timed(function, paths, config):
+    """Return the seconds and the bytes read per file of calling function with every path and config
+
+    function is called once before to leave out setting up the configuration."""
+    function(paths[0], config)
+    before, start = bytes_read(), time.perf_counter()
+    for path in paths:
+        function(path, config)
+    seconds, after = time.perf_counter() - start, bytes_read()
+    return seconds, (after - before) / len(paths) if before is not None else float('nan')
+
+
+def main():
+    parser = OptionParser(usage='%prog [options] [number]')
+    parser.add_option('--size', dest='size', type='float', default=4.0,
+                      help='size of every movie file in GB (default: 4)')
+    parser.add_option('--directory', dest='directory', metavar='DIR',
+                      help='take the files in DIR instead of creating movie files')
+    options, args = parser.parse_args()
+    number = int(args[0]) if args else 8
+
+    directory = None
+    try:
+        if options.directory:
+            paths = [entry.path for entry in os.scandir(options.directory) if entry.is_file()]
+        else:
+            directory = tempfile.mkdtemp(prefix='date2name-bench-', dir=default_directory())
+            paths = [os.path.join(directory, 'MOV_%04d.mp4' % index) for index in range(number)]
+            for index, path in enumerate(paths):
+                create_movie(path, int(options.size * 1e9), 1559384430 + index * 86400)
+        total = sum(os.path.getsize(path) for path in paths)
+        print('%i files, %.1f GB' % (len(paths), total / 1e9))
+        for label, function, config in (('mtime', date2name.compute_new_name, date2name.RenameConfig()),
+                                        ('meta', date2name.compute_new_name, date2name.RenameConfig(meta=True)),
+                                        ('full', read_completely, None)):
+            seconds, per_file = timed(function, paths, config)
+            print('%-5s %10.3f ms %12.1f files/s %12.1f GB/s %14.0f bytes read per file' % (
+                label, seconds * 1000, len(paths) / seconds, total / seconds / 1e9, per_file))
+    finally:
+        if directory is not None:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
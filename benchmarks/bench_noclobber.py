@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+No-clobber benchmark: the cost of never replacing existing items (--no-clobber)
+compared to plain renames and to checking every target before renaming.
+
+Stamps a new corpus of unstamped files on tmpfs if available for every case:
+
+- rename:     the default, which replaces an existing target,
+- prescan:    every target is lstat'ed before the rename like a careful script does,
+- renameat2:  --no-clobber with renameat2(RENAME_NOREPLACE),
+- link:       --no-clobber with its fallback of linking and unlinking.
+
+Usage:  python3 benchmarks/bench_noclobber.py [number]
+"""
+
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import date2name  # noqa: E402
+from corpus import create_corpus, default_directory  # noqa: E402
+
+
+def timed_pass(directory, number, config):
+    """Return the seconds rename_many() takes to stamp a new corpus of number files in directory"""
+    os.mkdir(directory)
+    paths = create_corpus(directory, number, {'NODATESTAMP': 1.0})
+    start = time.perf_counter()
+    assert len(date2name.rename_many(paths, config)) == number
+    return time.perf_counter() - start
+
+
+def prescanned(function):
+    """Return function wrapped to lstat the target of a rename first"""
+    def rename(source, target, **kwargs):
+        try:
+            os.lstat(target, dir_fd=kwargs.get('dst_dir_fd'))
+        except FileNotFoundError:
+            return function(source, target, **kwargs)
+        raise FileExistsError(target)
+    return rename
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    logging.disable(logging.CRITICAL)
+
+    directory = tempfile.mkdtemp(prefix='date2name-bench-', dir=default_directory())
+    try:
+        results = [('rename', timed_pass(os.path.join(directory, 'rename'), number, date2name.RenameConfig()))]
+        rename = os.rename
+        os.rename = prescanned(rename)
+        try:
+            results.append(('prescan', timed_pass(os.path.join(directory, 'prescan'), number,
+                                                  date2name.RenameConfig())))
+        finally:
+            os.rename = rename
+        config = date2name.RenameConfig(noclobber=True)
+        if date2name.get_renameat2():
+            results.append(('renameat2', timed_pass(os.path.join(directory, 'renameat2'), number, config)))
+        date2name.RENAMEAT2 = False
+        results.append(('link', timed_pass(os.path.join(directory, 'link'), number, config)))
+    finally:
+        shutil.rmtree(directory)
+    for label, seconds in results:
+        print('%-10s %8.3f s %9.0f files/s   (%.2fx of rename)' % (label, seconds, number / seconds,
+                                                                seconds / results[0][1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pipeline benchmark: renaming files on a file system with a high latency like a
+network share, sequentially, with -j, and with --pipeline.
+
+The latency is injected into a local corpus on tmpfs if available by a shim
+which sleeps before every os.stat() and os.rename(), like a round trip to a
+file server would take (the sleep releases the GIL like waiting for the network
+does). The files are spread over a few directories and given on the command
+line like "date2name share/*/*". Measured are rename_many() with
+
+- sequential:   the default loop,
+- jobs:         -j with as many threads as directories,
+- pipeline N:   --pipeline N for every N given.
+
+Usage:  python3 benchmarks/bench_pipeline.py [--latency MS] [--directories N] [number [inflight ...]]
+"""
+
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import date2name  # noqa: E402
+from corpus import create_corpus, default_directory  # noqa: E402
+
+
+def inject_latency(seconds):
+    """Make os.stat() and os.rename() sleep for seconds first"""
+    for name in ('stat', 'rename'):
+        def slow(*args, _call=getattr(os, name), **kwargs):
+            time.sleep(seconds)
+            return _call(*args, **kwargs)
+        setattr(os, name, slow)
+
+
+def timed_pass(directory, directories, number, config):
+    """Return the seconds rename_many() takes on a new corpus of number files in directories directories"""
+    paths = []
+    for index in range(directories):
+        subdirectory = tempfile.mkdtemp(prefix='share-', dir=directory)
+        paths.extend(create_corpus(subdirectory, number // directories, {'NODATESTAMP': 1.0}, seed=index))
+    start = time.perf_counter()
+    renames = date2name.rename_many(paths, config)
+    seconds = time.perf_counter() - start
+    assert len(renames) == len(paths)
+    return seconds
+
+
+def main():
+    parser = OptionParser(usage='%prog [options] [number [inflight ...]]')
+    parser.add_option('--latency', dest='latency', type='float', default=2.0,
+                      help='milliseconds slept per stat and rename (default: 2)')
+    parser.add_option('--directories', dest='directories', type='int', default=4,
+                      help='number of directories the files are spread over (default: 4)')
+    options, args = parser.parse_args()
+    number = int(args[0]) if args else 2000
+    inflight = [int(value) for value in args[1:]] or [4, 16, 64]
+    logging.disable(logging.CRITICAL)
+
+    directory = tempfile.mkdtemp(prefix='date2name-bench-', dir=default_directory())
+    try:
+        inject_latency(options.latency / 1000.0)
+        cases = [('sequential', date2name.RenameConfig()),
+                 ('jobs %i' % options.directories, date2name.RenameConfig(jobs=options.directories))]
+        cases.extend(('pipeline %i' % value, date2name.RenameConfig(pipeline=value)) for value in inflight)
+        print('%i files in %i directories, %.1f ms per stat and rename' % (number, options.directories,
+                                                                          options.latency))
+        sequential = None
+        for label, config in cases:
+            seconds = timed_pass(directory, options.directories, number, config)
+            sequential = sequential or seconds
+            print('%-12s %8.2f s %9.0f files/s   (%.1fx)' % (label, seconds, number / seconds, sequential / seconds))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Plan store benchmark: memory per planned rename in a PlanStore compared to the
+(position, old path, new path) tuples of full path strings kept before, and
+memory per item queued in the Shards of rename_parallel() before they are renamed.
+
+Adds synthetic renames like "IMG_00001234.jpg" → "2024-01-31_IMG_00001234.jpg"
+of directories of 1000 items each, the directories in a shuffled order like the
+workers of rename_parallel() finish them, and reads them back in input order.
+No files are created. The memory of the tuples is measured with tracemalloc on
+at most a million entries. The items are queued like the files collect_shards()
+finds in recursive mode, whose (position, basename, DirEntry) tuples took about
+335 bytes per item before.
+
+Usage:  python3 benchmarks/bench_plan_store.py [number]
+"""
+
+import os
+import random
+import stat
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import date2name  # noqa: E402
+
+PER_DIRECTORY = 1000
+
+
+def entries(number):
+    """Yield (position, directory, basename, new_basename) of number renames, directory by directory"""
+    starts = list(range(0, number, PER_DIRECTORY))
+    random.Random(42).shuffle(starts)
+    for start in starts:
+        directory = '/srv/photos/%04d/%02d/batch-%08d' % (2000 + start % 25, start % 12 + 1, start)
+        for position in range(start, min(start + PER_DIRECTORY, number)):
+            basename = 'IMG_%08d.jpg' % position
+            yield position, directory, basename, '2024-01-31_' + basename
+
+
+def store_bytes(store):
+    """Return the bytes of store without its names and the bytes of its names"""
+    columns = sum(sys.getsizeof(column) for column in (store.directory, store.old, store.new, store.positions))
+    table = sys.getsizeof(store.directories) + sys.getsizeof(store.numbers) + \
+        sum(sys.getsizeof(path) for path in store.directories)
+    return columns + table + sys.getsizeof(store.names) - len(store.names), len(store.names)
+
+
+def shard_bytes(shards):
+    """Return the bytes of the queues of shards without the names and the bytes of the names"""
+    columns = sum(sys.getsizeof(column) for shard in shards for column in (shard.positions, shard.modes, shard.ends))
+    names = sum(len(shard.names) for shard in shards)
+    return columns + sum(sys.getsizeof(shard.names) for shard in shards) - names, names
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 10000000
+
+    start = time.perf_counter()
+    store = date2name.PlanStore()
+    for entry in entries(number):
+        store.add(*entry)
+    added = time.perf_counter() - start
+    start = time.perf_counter()
+    previous = None
+    for previous in store.ordered():
+        pass
+    ordered = time.perf_counter() - start
+    overhead, names = store_bytes(store)
+    print('PlanStore of %i entries: %.1f MB of names, %.1f bytes per entry beyond the names' % (
+        number, names / 1e6, overhead / number))
+    print('  add %.2f s (%.2f µs per entry), read in input order %.2f s' % (added, added / number * 1e6, ordered))
+    del store
+
+    shards = {}
+    for position, directory, basename, new_basename in entries(number):
+        shard = shards.get(directory)
+        if shard is None:
+            shard = shards[directory] = date2name.Shard(directory, directory)
+        shard.add(position, basename, None, stat.S_IFREG)
+    overhead, names = shard_bytes(shards.values())
+    print('Shards queuing %i items: %.1f MB of names, %.1f bytes per item beyond the names' % (
+        number, names / 1e6, overhead / number))
+    del shards
+
+    sample = min(number, 1000000)
+    tracemalloc.start()
+    tuples = [(position, os.path.join(directory, basename), os.path.join(directory, new_basename))
+              for position, directory, basename, new_basename in entries(sample)]
+    tuple_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print('tuples of full paths (%i entries): %.1f bytes per entry in total' % (len(tuples), tuple_bytes / sample))
+
+
+if __name__ == '__main__':
+    main()
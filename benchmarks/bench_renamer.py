@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Profiling benchmark: per-item overhead of the per-run Renamer.
+
+Generates a synthetic corpus of mixed basenames (unstamped names and all known
+datestamp styles) with a fake stat_result each, and compares the per-item work
+get_timestamp_from_file() and get_converted_basename() did before the Renamer
+(platform.system() calls and branching on the configuration for every item)
+against the same functions with the decisions taken once per run.
+
+Usage:  python3 benchmarks/bench_renamer.py [number_of_names] [--profile]
+
+With --profile, the Renamer run is profiled with cProfile as well.
+"""
+
+import cProfile
+import logging
+import os
+import platform
+import pstats
+import sys
+import time
+import timeit
+
+ARGUMENTS = [argument for argument in sys.argv[1:] if argument != '--profile']
+NUMBER_OF_NAMES = int(ARGUMENTS[0]) if ARGUMENTS else 1000000
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import date2name  # noqa: E402
+from bench_classifier import generate_corpus  # noqa: E402
+
+
+def legacy_get_timestamp_from_file(formatstring, path, config, stat_result):
+    """get_timestamp_from_file() before the Renamer"""
+    item = os.path.basename(path)
+    if stat_result is None:
+        stat_result = os.stat(path)
+    elif isinstance(stat_result, os.DirEntry):
+        stat_result = stat_result.stat()
+    if " " in item:
+        delimiter_char = " "
+    else:
+        delimiter_char = "_"
+    if config.delimiter:
+        delimiter_char = config.delimiter
+    if config.ctime and platform.system() == 'Darwin':
+        return time.strftime(formatstring, time.localtime(stat_result.st_birthtime)) + delimiter_char + item
+    elif config.ctime:
+        return time.strftime(formatstring, time.localtime(stat_result.st_ctime)) + delimiter_char + item
+    else:
+        return time.strftime(formatstring, time.localtime(stat_result.st_mtime)) + delimiter_char + item
+
+
+def legacy_get_converted_basename(datestamp, item, config):
+    """get_converted_basename() before the Renamer"""
+    logging.debug("item \"%s\" matches %s pattern, doing conversion" % (item, datestamp.kind))
+    item_year = datestamp.year
+    item_month = datestamp.month
+    name_without_datestamp = item[datestamp.end:]
+    if datestamp.kind == 'MONTH':
+        logging.info("%s no datestamp information for day, so I will take \"00\" for conversion" % item)
+        item_day = "00"
+    else:
+        item_day = datestamp.day
+    if datestamp.hour is not None:
+        logging.warning("%s ... time will be lost due to conversion" % item)
+    logging.debug("item \"%s\" got year \"%s\" month \"%s\" day \"%s\"" % (item, item_year, item_month, item_day))
+    if config.compact:
+        return item_year + item_month + item_day + name_without_datestamp
+    elif config.month:
+        return item_year + "-" + item_month + name_without_datestamp
+    elif config.withtime:
+        logging.warning("%s: Sorry! Conversion to withtime-format not implemented yet, taking standard format" % item)
+        return item_year + "-" + item_month + "-" + item_day + name_without_datestamp
+    else:
+        return item_year + "-" + item_month + "-" + item_day + name_without_datestamp
+
+
+def compare(legacy_function, function, items, repeat=7):
+    """Best of several alternating runs of both functions with the arguments of every item, in nanoseconds per item."""
+    def run(function):
+        for arguments in items:
+            function(*arguments)
+    best = [float('inf'), float('inf')]
+    for attempt in range(repeat):
+        for index, candidate in enumerate((legacy_function, function)):
+            best[index] = min(best[index], timeit.timeit(lambda: run(candidate), number=1))
+    return [duration / len(items) * 1e9 for duration in best]
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+    corpus = generate_corpus(NUMBER_OF_NAMES)
+    stat_result = os.stat_result((0o100644, 0, 0, 1, 0, 0, 0, 1700000000, 1700000000, 1700000000))
+    datestamps = [(name, date2name.classify_basename(name)) for name in corpus]
+    print('%d synthetic names' % len(corpus))
+    for label, config in [('default', date2name.RenameConfig()),
+                          ('compact', date2name.RenameConfig(compact=True)),
+                          ('ctime', date2name.RenameConfig(ctime=True))]:
+        unstamped = [(name, config, stat_result)
+                     for name, datestamp in datestamps if datestamp is None or datestamp.kind == 'NODATESTAMP']
+        stamped = [(datestamp, name, config)
+                   for name, datestamp in datestamps if datestamp is not None and datestamp.kind != 'NODATESTAMP']
+        for name, items, legacy_function, function in [
+                ('get_timestamp_from_file', unstamped,
+                 lambda name, config, stat_result: legacy_get_timestamp_from_file(
+                     config.formatstring, name, config, stat_result),
+                 lambda name, config, stat_result: date2name.get_timestamp_from_file(
+                     config.renamer.formatstring, name, config, stat_result)),
+                ('get_converted_basename', stamped, legacy_get_converted_basename, date2name.get_converted_basename)]:
+            before, after = compare(legacy_function, function, items)
+            print('%-8s %-25s before %6.0f ns/item   Renamer %6.0f ns/item   (%.2fx)' % (
+                label, name, before, after, before / after))
+    if '--profile' in sys.argv[1:]:
+        config = date2name.RenameConfig(ctime=True)
+        profiler = cProfile.Profile()
+        profiler.runcall(lambda: [date2name.generate_new_basename(config.renamer.formatstring, name, config, stat_result)
+                                  for name in corpus])
+        pstats.Stats(profiler).sort_stats('tottime').print_stats(10)
+
+
+if __name__ == '__main__':
+    main()
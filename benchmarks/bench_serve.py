@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Server benchmark: requests per second and latency of date2name --serve compared
+to starting date2name for every request.
+
+Every request is a dry run on one file of a corpus created by corpus.py on
+tmpfs if available, like a file manager integration calling date2name per
+event. Measured are:
+
+- cli:        a new date2name process per request (like the installed console script),
+- client:     a new "python3 -S date2name/client.py" process per request,
+- connection: requests sent one after the other over one open connection to the
+              server (like a library or a long-running ingestion hook).
+
+Usage:  python3 benchmarks/bench_serve.py [--requests N] [--connection-requests N]
+"""
+
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from optparse import OptionParser
+
+from bench_startup import ROOT, RUN_MAIN, run_python
+from corpus import create_corpus, default_directory
+
+CLIENT = os.path.join(ROOT, 'date2name', 'client.py')
+
+
+def start_server(socket_path):
+    """Start date2name --serve on socket_path and return its process once it accepts connections"""
+    server = subprocess.Popen([sys.executable, '-c', RUN_MAIN, '--quiet', '--serve', socket_path], cwd=ROOT,
+                              env=dict(os.environ, PYTHONPATH=ROOT))
+    while not os.path.exists(socket_path):
+        if server.poll() is not None:
+            raise RuntimeError('the server exited with status %i' % server.returncode)
+        time.sleep(0.01)
+    return server
+
+
+def measure(request, paths):
+    """Call request with every one of paths and return the latencies in milliseconds"""
+    latencies = []
+    for path in paths:
+        start = time.perf_counter()
+        request(path)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    return latencies
+
+
+def report(label, latencies):
+    """Print the requests per second and the median and 99th percentile latency"""
+    ordered = sorted(latencies)
+    print('%-10s %6i requests %9.1f requests/s   p50 %7.2f ms   p99 %7.2f ms' % (
+        label, len(ordered), len(ordered) / (sum(ordered) / 1000.0), ordered[len(ordered) // 2],
+        ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]))
+
+
+def main():
+    parser = OptionParser(usage='%prog [options]')
+    parser.add_option('--requests', dest='requests', type='int', default=100,
+                      help='number of requests with a new process each (default: 100)')
+    parser.add_option('--connection-requests', dest='connection_requests', type='int', default=10000,
+                      help='number of requests over one connection (default: 10000)')
+    options, args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='date2name-bench-', dir=default_directory())
+    socket_path = os.path.join(directory, 'date2name.sock')
+    try:
+        os.mkdir(os.path.join(directory, 'corpus'))
+        paths = create_corpus(os.path.join(directory, 'corpus'), max(options.requests, options.connection_requests))
+        server = start_server(socket_path)
+        try:
+            report('cli', measure(lambda path: run_python(['-c', RUN_MAIN, '--quiet', '--dryrun', path]),
+                                  paths[:options.requests]))
+            report('client', measure(lambda path: run_python(['-S', CLIENT, '--socket', socket_path,
+                                                              '--quiet', '--dryrun', path]),
+                                     paths[:options.requests]))
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+                connection.connect(socket_path)
+                responses = connection.makefile('rb')
+
+                def request(path):
+                    connection.sendall(json.dumps({'paths': [path], 'options': {'dryrun': True}}).encode() + b'\n')
+                    json.loads(responses.readline())
+                report('connection', measure(request, paths))
+        finally:
+            server.terminate()
+            server.wait()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Startup benchmark: time to import date2name and to run it on a single file.
+
+Measures, each as the best of several runs in fresh interpreters:
+
+- import:  the cumulative time of "import date2name" as reported by
+           "python3 -X importtime" (with byte-compiled files, like an installed
+           date2name),
+- version: the wall clock time of "date2name --version",
+- dryrun:  the wall clock time of "date2name --dryrun FILE",
+
+the latter two compared to an interpreter doing nothing. It also lists the
+modules date2name imports only when needed but which got imported anyway.
+
+With --check, the exit status is 1 if the import takes longer than
+IMPORT_BUDGET_MS or one of the deferred modules is imported; the test suite
+runs this.
+
+Usage:  python3 benchmarks/bench_startup.py [--check] [--repeat N]
+"""
+
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from optparse import OptionParser
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+IMPORT_BUDGET_MS = 40.0
+
+DEFERRED_MODULES = ['optparse', 'json', 'platform', 'dataclasses', 'inspect', 'concurrent.futures']
+
+# like the date2name console script installed by pip:
+RUN_MAIN = 'import sys, date2name; sys.argv = ["date2name"] + sys.argv[1:]; sys.exit(date2name.main())'
+
+
+def run_python(arguments):
+    """Run a fresh interpreter with arguments in the repository, allowing byte-compiled files; return the result."""
+    environment = dict(os.environ, PYTHONPATH=ROOT)
+    environment.pop('PYTHONDONTWRITEBYTECODE', None)
+    return subprocess.run([sys.executable] + arguments, cwd=ROOT, env=environment, check=True,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+
+
+def import_milliseconds(repeat):
+    """Return the best cumulative import time of date2name in milliseconds."""
+    run_python(['-c', 'import date2name'])  # writes the byte-compiled files
+    best = float('inf')
+    for attempt in range(repeat):
+        stderr = run_python(['-X', 'importtime', '-c', 'import date2name']).stderr
+        cumulative = re.search(r'^import time:\s+\d+ \|\s+(\d+) \| date2name$', stderr, re.MULTILINE)
+        best = min(best, int(cumulative.group(1)) / 1000.0)
+    return best
+
+
+def wall_milliseconds(arguments, repeat):
+    """Return the best wall clock time of a fresh interpreter run with arguments in milliseconds."""
+    best = float('inf')
+    for attempt in range(repeat):
+        start = time.perf_counter()
+        run_python(arguments)
+        best = min(best, (time.perf_counter() - start) * 1000.0)
+    return best
+
+
+def deferred_modules_imported():
+    """Return the modules of DEFERRED_MODULES imported by "import date2name"."""
+    stdout = run_python(['-c', 'import sys, date2name; print("\\n".join(sorted(sys.modules)))']).stdout
+    return [module for module in DEFERRED_MODULES if module in stdout.split()]
+
+
+def main():
+    parser = OptionParser(usage='%prog [options]')
+    parser.add_option('--check', dest='check', action='store_true',
+                      help='exit with status 1 if the import exceeds its budget of %.0f ms' % IMPORT_BUDGET_MS)
+    parser.add_option('--repeat', dest='repeat', type='int', default=10,
+                      help='number of runs to take the best of (default: 10)')
+    options, args = parser.parse_args()
+
+    milliseconds = import_milliseconds(options.repeat)
+    imported = deferred_modules_imported()
+    print('import date2name          %7.1f ms   (budget %.0f ms)' % (milliseconds, IMPORT_BUDGET_MS))
+    print('deferred modules imported %s' % (', '.join(imported) or 'none'))
+    if options.check:
+        return 1 if milliseconds > IMPORT_BUDGET_MS or imported else 0
+
+    baseline = wall_milliseconds(['-c', 'pass'], options.repeat)
+    with tempfile.NamedTemporaryFile(prefix='date2name-bench-') as item:
+        for label, arguments in [('date2name --version', ['--version']),
+                                 ('date2name --dryrun FILE', ['--dryrun', item.name])]:
+            milliseconds = wall_milliseconds(['-c', RUN_MAIN] + arguments, options.repeat)
+            print('%-25s %7.1f ms   (%.1f ms more than python3 -c pass)' % (label, milliseconds,
+                                                                           milliseconds - baseline))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Stat source benchmark: renaming files on a file system whose metadata is slow to
+fetch like a cold storage tier, with and without a listing (--stat-source).
+
+The latency is injected into a local corpus on tmpfs if available by a shim
+which sleeps before every os.stat() and os.rename(). The listing is written
+like find -printf '%Y %T@ %p\\0' would before. Measured are rename_many() on
+the files given one by one
+
+- stat:     without a listing, which stats and renames every file,
+- listing:  with the listing, which only renames them,
+
+and the time to load the listing.
+
+Usage:  python3 benchmarks/bench_stat_source.py [--latency MS] [number]
+"""
+
+import logging
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import time
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import date2name  # noqa: E402
+from corpus import create_corpus, default_directory  # noqa: E402
+from bench_pipeline import inject_latency  # noqa: E402
+
+
+def write_listing(path, paths):
+    """Write the types, modification times, and paths of paths to path like find -printf '%Y %T@ %p\\0'"""
+    with open(path, 'wb') as listing:
+        for item in paths:
+            stat_result = os.stat(item)
+            listing.write(b'%s %i.%09i %s\0' % (b'd' if stat.S_ISDIR(stat_result.st_mode) else b'f',
+                                                 stat_result.st_mtime_ns // 10 ** 9,
+                                                 stat_result.st_mtime_ns % 10 ** 9, os.fsencode(item)))
+
+
+def main():
+    parser = OptionParser(usage='%prog [options] [number]')
+    parser.add_option('--latency', dest='latency', type='float', default=2.0,
+                      help='milliseconds slept per stat and rename (default: 2)')
+    options, args = parser.parse_args()
+    number = int(args[0]) if args else 2000
+    logging.disable(logging.CRITICAL)
+
+    directory = tempfile.mkdtemp(prefix='date2name-bench-', dir=default_directory())
+    try:
+        listing = os.path.join(directory, 'listing.bin')
+        corpora = []
+        for case in ('stat', 'listing'):
+            os.mkdir(os.path.join(directory, case))
+            corpora.append(create_corpus(os.path.join(directory, case), number, {'NODATESTAMP': 1.0}))
+        write_listing(listing, corpora[1])
+
+        start = time.perf_counter()
+        source = date2name.StatSource(listing)
+        load = time.perf_counter() - start
+
+        inject_latency(options.latency / 1000.0)
+        print('%i files, %.1f ms per stat and rename' % (number, options.latency))
+        results = []
+        for case, paths, config in (('stat', corpora[0], date2name.RenameConfig()),
+                                    ('listing', corpora[1], date2name.RenameConfig(stat_source=listing))):
+            config.renamer  # loads the listing before the clock starts
+            start = time.perf_counter()
+            renames = date2name.rename_many(paths, config)
+            results.append(time.perf_counter() - start)
+            assert len(renames) == len(paths)
+            print('%-8s %8.2f s %9.0f files/s   (%.1fx)' % (case, results[-1], number / results[-1],
+                                                           results[0] / results[-1]))
+        print('loading the listing of %i files: %.3f s (%.2f us per file)' % (len(source), load,
+                                                                            load / len(source) * 1e6))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite: throughput and peak memory of date2name on a synthetic corpus.
+
+Runs every case in a process of its own, on a fresh corpus created by
+corpus.py on tmpfs if available:
+
+- classify: classify_basename() of every name, no file system access,
+- dryrun:   rename_many() in dryrun mode,
+- rename:   rename_many() adding or converting datestamps,
+- remove:   rename_many() removing datestamps (like --remove),
+- batch:    rename_many() like rename but planning all renames first (like --batch).
+
+The output is quiet like with --quiet. The results (names per second, seconds,
+and the peak RSS of each case) are written as JSON to stdout or to --output,
+together with the date2name version and the platform, so that the results of
+two releases can be compared with --compare.
+
+Usage:  python3 benchmarks/bench_suite.py [--output FILE] [--mix KIND=WEIGHT,...]
+                                          [--directories FRACTION] [--case CASE] [number]
+        python3 benchmarks/bench_suite.py --compare OLD.json NEW.json
+"""
+
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import date2name  # noqa: E402
+from corpus import create_corpus, default_directory, generate_names, parse_mix  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+CASES = ['classify', 'dryrun', 'rename', 'remove', 'batch']
+
+
+def peak_rss_kib():
+    """Return the peak resident set size of this process in KiB or None if unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak  # bytes on macOS
+
+
+def run_case(case, number, mix, directories):
+    """Run one case in this process and return its result as a dict."""
+    logging.basicConfig(level=logging.CRITICAL)
+    if case == 'classify':
+        names = generate_names(number, mix)
+        start = time.perf_counter()
+        for name in names:
+            date2name.classify_basename(name)
+        seconds = time.perf_counter() - start
+    else:
+        corpus = tempfile.mkdtemp(prefix='date2name-bench-', dir=default_directory())
+        try:
+            paths = create_corpus(corpus, number, mix, directories)
+            config = date2name.RenameConfig(dryrun=(case == 'dryrun'), remove=(case == 'remove'),
+                                            batch=(case == 'batch'))
+            start = time.perf_counter()
+            date2name.rename_many(paths, config)
+            seconds = time.perf_counter() - start
+        finally:
+            shutil.rmtree(corpus)
+    return {'names_per_second': number / seconds, 'seconds': seconds, 'peak_rss_kib': peak_rss_kib()}
+
+
+def run_suite(cases, number, options):
+    """Run each case in a child process and return the results of all of them as a dict."""
+    results = {}
+    for case in cases:
+        command = [sys.executable, os.path.abspath(__file__), '--child', '--case', case,
+                   '--directories', str(options.directories), str(number)]
+        if options.mix:
+            command[2:2] = ['--mix', options.mix]
+        results[case] = json.loads(subprocess.run(command, check=True, stdout=subprocess.PIPE).stdout)
+        print('%-9s %12.0f names/s   %8.3f s   peak RSS %8s KiB' % (
+            case, results[case]['names_per_second'], results[case]['seconds'], results[case]['peak_rss_kib']),
+            file=sys.stderr)
+    return {'date2name': date2name.PROG_VERSION_DATE,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'number': number,
+            'mix': options.mix,
+            'directories': options.directories,
+            'results': results}
+
+
+def compare(old, new):
+    """Print the changes of the results new compared to old, both as written by run_suite()."""
+    print('%-9s %14s %14s %8s %12s %12s %8s' % ('case', 'old names/s', 'new names/s', 'ratio',
+                                                 'old RSS KiB', 'new RSS KiB', 'ratio'))
+    for case in CASES:
+        if case not in old['results'] or case not in new['results']:
+            continue
+        before, after = old['results'][case], new['results'][case]
+        memory_ratio = '-'
+        if before['peak_rss_kib'] and after['peak_rss_kib']:
+            memory_ratio = '%.2fx' % (after['peak_rss_kib'] / before['peak_rss_kib'])
+        print('%-9s %14.0f %14.0f %7.2fx %12s %12s %8s' % (
+            case, before['names_per_second'], after['names_per_second'],
+            after['names_per_second'] / before['names_per_second'],
+            before['peak_rss_kib'], after['peak_rss_kib'], memory_ratio))
+
+
+def main():
+    parser = OptionParser(usage='%prog [options] [number]\n       %prog --compare OLD.json NEW.json')
+    parser.add_option('--output', dest='output', metavar='FILE', help='write the results to FILE instead of stdout')
+    parser.add_option('--case', dest='cases', action='append', choices=CASES, type='choice',
+                      help='run only this case, may be given several times (default: all of %s)' % ', '.join(CASES))
+    parser.add_option('--mix', dest='mix', metavar='KIND=WEIGHT,...',
+                      help='weights of the datestamp styles of the corpus (default: all equally likely)')
+    parser.add_option('--directories', dest='directories', metavar='FRACTION', type='float', default=0.0,
+                      help='share of directories in the corpus (default: 0)')
+    parser.add_option('--compare', dest='compare', action='store_true',
+                      help='compare the results in the files OLD.json and NEW.json')
+    parser.add_option('--child', dest='child', action='store_true', help='run a single case (internal)')
+    options, args = parser.parse_args()
+
+    if options.compare:
+        if len(args) != 2:
+            parser.error('please give the files OLD.json and NEW.json to compare')
+        with open(args[0]) as old, open(args[1]) as new:
+            compare(json.load(old), json.load(new))
+        return
+
+    number = int(args[0]) if args else 100000
+    try:
+        mix = parse_mix(options.mix) if options.mix else None
+    except ValueError as error:
+        parser.error(str(error))
+
+    if options.child:
+        print(json.dumps(run_case(options.cases[0], number, mix, options.directories)))
+        return
+
+    results = run_suite(options.cases or CASES, number, options)
+    if options.output:
+        with open(options.output, 'w') as output:
+            json.dump(results, output, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Template benchmark: user-defined datestamp formats (--format) compiled to a
+formatter and a recognizer, compared with the built-in formats.
+
+For the built-in formats -C, default, and -w, the templates which write the
+same datestamps, and a template of its own, it times per name
+
+- format:     Renamer.format_struct_time(), the formatting on misses of the memo,
+- strftime:   time.strftime() with the format, what it replaces,
+- classify:   Renamer.classify() on names stamped in the format,
+- rename:     compute_new_name() on unstamped names, with their stat results at hand.
+
+Usage:  python3 benchmarks/bench_template.py [number_of_names]
+"""
+
+import os
+import random
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import date2name  # noqa: E402
+from corpus import generate_names  # noqa: E402
+
+CASES = (
+    ('-C', dict(compact=True)),
+    ('%Y%m%d', dict(template='%Y%m%d')),
+    ('default', dict()),
+    ('%Y-%m-%d', dict(template='%Y-%m-%d')),
+    ('-w', dict(withtime=True)),
+    ('%Y-%m-%dT%H.%M.%S', dict(template='%Y-%m-%dT%H.%M.%S')),
+    ('%Y%m%d-%H%M', dict(template='%Y%m%d-%H%M')),
+)
+
+
+def measure(function, items, repeat=5):
+    """Best of several runs over all items, in items per second."""
+    def run():
+        for item in items:
+            function(item)
+    best = min(timeit.repeat(run, number=1, repeat=repeat))
+    return len(items) / best
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rand = random.Random(42)
+    timestamps = [rand.uniform(631152000, 1924991999) for _ in range(number)]
+    struct_times = [time.localtime(timestamp) for timestamp in timestamps]
+    names = generate_names(number, {'NODATESTAMP': 1.0})
+    stat_results = [os.stat_result((0o100644, 0, 0, 1, 0, 0, 0, timestamp, timestamp, timestamp))
+                    for timestamp in timestamps]
+
+    print('%i names' % number)
+    print('%-20s %12s %12s %12s %12s' % ('format', 'format/s', 'strftime/s', 'classify/s', 'rename/s'))
+    for label, settings in CASES:
+        config = date2name.RenameConfig(**settings)
+        renamer = config.renamer
+        formatstring = renamer.formatstring
+        stamped = [renamer.format_struct_time(struct_time) + '_' + name
+                   for struct_time, name in zip(struct_times, names)]
+        assert all(renamer.classify(name).kind != 'NODATESTAMP' for name in stamped)
+        pairs = list(zip(names, stat_results))
+        print('%-20s %12.0f %12.0f %12.0f %12.0f' % (
+            label,
+            measure(renamer.format_struct_time, struct_times),
+            measure(lambda struct_time: time.strftime(formatstring, struct_time), struct_times),
+            measure(renamer.classify, stamped),
+            measure(lambda pair: date2name.compute_new_name(pair[0], config, pair[1]), pairs)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Watch benchmark: handling a few new files in a drop directory full of stamped
+files, by a cron-like pass over the whole directory and by --watch.
+
+For every directory size, the directory is filled with stamped files on tmpfs
+if available. Then a few new files arrive and are handled
+
+- cron:  by date2name on everything in the directory, like a cron job,
+- watch: by watch() running in a thread; measured is the time from the last
+         new file until all are stamped, less the debounce time.
+
+Usage:  python3 benchmarks/bench_watch.py [--new N] [size ...]
+"""
+
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import date2name  # noqa: E402
+from corpus import create_corpus, default_directory  # noqa: E402
+
+DEBOUNCE = 0.05
+
+
+def add_new_files(directory, number, prefix):
+    """Create number new unstamped files in directory and return their names"""
+    names = ['%s-%05d.txt' % (prefix, index) for index in range(number)]
+    for name in names:
+        with open(os.path.join(directory, name), 'w') as new_file:
+            new_file.write('new')
+    return names
+
+
+def cron(directory, number):
+    """Return the seconds a pass over all items of directory takes to stamp number new files"""
+    add_new_files(directory, number, 'cron')
+    start = time.perf_counter()
+    date2name.rename_many([os.path.join(directory, name) for name in os.listdir(directory)],
+                          date2name.RenameConfig())
+    return time.perf_counter() - start
+
+
+def watch(directory, number):
+    """Return the seconds watch() takes to stamp number new files in directory after the last one arrived
+
+    The debounce time is not included. directory is removed afterwards to stop watch()."""
+    watcher = threading.Thread(target=date2name.watch, args=([directory], date2name.RenameConfig(), None, DEBOUNCE))
+    watcher.start()
+    time.sleep(0.2)
+    names = add_new_files(directory, number, 'watch')
+    start = time.perf_counter()
+    while any(os.path.exists(os.path.join(directory, name)) for name in names):
+        time.sleep(0.001)
+    seconds = time.perf_counter() - start - DEBOUNCE
+    shutil.rmtree(directory)
+    watcher.join()
+    return seconds
+
+
+def main():
+    parser = OptionParser(usage='%prog [options] [size ...]')
+    parser.add_option('--new', dest='new', type='int', default=10,
+                      help='number of new files arriving (default: 10)')
+    options, args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    for size in [int(size) for size in args] or [1000, 10000, 100000]:
+        directory = tempfile.mkdtemp(prefix='date2name-bench-', dir=default_directory())
+        try:
+            results = []
+            for case, function in (('cron', cron), ('watch', watch)):
+                os.mkdir(os.path.join(directory, case))
+                create_corpus(os.path.join(directory, case), size, {'STANDARD': 1.0})
+                results.append(function(os.path.join(directory, case), options.new))
+        finally:
+            shutil.rmtree(directory)
+        print('%7i stamped files, %i new:   cron %9.2f ms   watch %7.2f ms' % (
+            size, options.new, results[0] * 1000, results[1] * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Synthetic corpus generator for the date2name benchmarks.
+
+Creates N empty files (and optionally directories) whose names mix the datestamp
+styles date2name knows: SHORT, COMPACT, STANDARD, MONTH, WITHTIME_AND_SECONDS,
+WITHTIME_NO_SECONDS, and names without any datestamp (NODATESTAMP). The mix is
+given as weights per style, all styles are equally likely by default. The
+corpus is reproducible for a given seed.
+
+Without a directory, the corpus is created in a new directory on tmpfs
+(/dev/shm) if available so that the benchmarks measure date2name rather than
+the disk.
+
+Usage:  python3 benchmarks/corpus.py [--directory DIR] [--mix KIND=WEIGHT,...]
+                                     [--directories FRACTION] [--seed SEED] [number]
+"""
+
+import os
+import random
+import sys
+import tempfile
+from optparse import OptionParser
+
+STAMP_STYLES = {
+    'SHORT': lambda y, m, d, H, M, S: '%02d%02d%02d_' % (y % 100, m, d),
+    'COMPACT': lambda y, m, d, H, M, S: '%04d%02d%02d_' % (y, m, d),
+    'STANDARD': lambda y, m, d, H, M, S: '%04d-%02d-%02d_' % (y, m, d),
+    'MONTH': lambda y, m, d, H, M, S: '%04d-%02d_' % (y, m),
+    'WITHTIME_AND_SECONDS': lambda y, m, d, H, M, S: '%04d-%02d-%02dT%02d.%02d.%02d_' % (y, m, d, H, M, S),
+    'WITHTIME_NO_SECONDS': lambda y, m, d, H, M, S: '%04d-%02d-%02dT%02d.%02d_' % (y, m, d, H, M),
+    'NODATESTAMP': lambda y, m, d, H, M, S: '',
+}
+
+NAME_TEMPLATES = ['IMG_%05d.jpg', 'scan %d.pdf', 'notes-%d.txt']
+
+
+def parse_mix(text):
+    """Return the weights of a mix like "NODATESTAMP=3,STANDARD=1" as a dict; raise ValueError if invalid."""
+    mix = {}
+    for part in text.split(','):
+        kind, separator, weight = part.partition('=')
+        kind = kind.strip().upper()
+        if kind not in STAMP_STYLES:
+            raise ValueError('unknown datestamp style "%s", use one of %s' % (kind, ', '.join(STAMP_STYLES)))
+        mix[kind] = float(weight) if separator else 1.0
+    if not any(weight > 0 for weight in mix.values()):
+        raise ValueError('at least one datestamp style needs a positive weight')
+    return mix
+
+
+def generate_names(number, mix=None, seed=42):
+    """Return a reproducible list of number unique basenames mixing the datestamp styles by the weights of mix."""
+    rand = random.Random(seed)
+    mix = mix or dict((kind, 1.0) for kind in STAMP_STYLES)
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+    names = []
+    for index, kind in enumerate(rand.choices(kinds, weights, k=number)):
+        stamp = STAMP_STYLES[kind](rand.randint(1990, 2030), rand.randint(1, 12), rand.randint(1, 28),
+                                   rand.randint(0, 23), rand.randint(0, 59), rand.randint(0, 59))
+        names.append(stamp + rand.choice(NAME_TEMPLATES) % index)
+    return names
+
+
+def default_directory():
+    """Return the directory to create corpora in: tmpfs if available, the temporary directory otherwise."""
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+
+def create_corpus(directory, number, mix=None, directories=0.0, seed=42):
+    """Create number empty items in the existing directory and return their paths
+
+    The share directories of them are directories, the others files."""
+    rand = random.Random(seed)
+    paths = []
+    for name in generate_names(number, mix, seed):
+        path = os.path.join(directory, name)
+        if rand.random() < directories:
+            os.mkdir(path)
+        else:
+            open(path, 'w').close()
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = OptionParser(usage='%prog [options] [number]')
+    parser.add_option('--directory', dest='directory', metavar='DIR',
+                      help='create the corpus in DIR instead of a new directory on tmpfs')
+    parser.add_option('--mix', dest='mix', metavar='KIND=WEIGHT,...',
+                      help='weights of the datestamp styles (default: all equally likely)')
+    parser.add_option('--directories', dest='directories', metavar='FRACTION', type='float', default=0.0,
+                      help='share of directories among the items (default: 0)')
+    parser.add_option('--seed', dest='seed', type='int', default=42, help='seed of the corpus (default: 42)')
+    options, args = parser.parse_args()
+    try:
+        mix = parse_mix(options.mix) if options.mix else None
+    except ValueError as error:
+        parser.error(str(error))
+
+    directory = options.directory or tempfile.mkdtemp(prefix='date2name-corpus-', dir=default_directory())
+    os.makedirs(directory, exist_ok=True)
+    paths = create_corpus(directory, int(args[0]) if args else 10000, mix, options.directories, options.seed)
+    print('%d items in %s' % (len(paths), directory))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -16,11 +16,21 @@ This script adds (or removes) datestamps to (or from) file(s)
 
 import re
 import  os
+import  stat
 import  time
+import  errno
 import  logging
 import  sys
-from optparse import OptionParser
-import platform
+import  threading
+import  itertools
+import  operator
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict, namedtuple
+from functools import cached_property, lru_cache, partial
+from types import SimpleNamespace
+# json, optparse, and concurrent.futures are imported where needed: most invocations do without
+# them and date2name gets started once per file by some file manager integrations
 
 # global variables
 PROG_VERSION_DATE = PROG_VERSION[13:23]
@@ -29,18 +39,159 @@ FORMATSTRING_COMPACT  = "%Y%m%d"
 FORMATSTRING_STANDARD = "%Y-%m-%d"
 FORMATSTRING_MONTH    = "%Y-%m"
 FORMATSTRING_WITHTIME = "%Y-%m-%dT%H.%M.%S"
-REGEX_PATTERNS = {
-    'NODATESTAMP': re.compile(r'^\D'),
-    'SHORT': re.compile(r'^(\d{2})([01]\d)([0123]\d)([- _])'),
-    'COMPACT': re.compile(r'^(\d{4})([01]\d)([0123]\d)([- _])'),
-    'STANDARD': re.compile(r'^(\d{4})-([01]\d)-([0123]\d)([- _])'),
-    'MONTH': re.compile(r'^(\d{4})-([01]\d)(?!-[0123]\d)([- _])'),
-    'WITHTIME_AND_SECONDS': re.compile(r'^(\d{4})-([01]\d)-([0123]\d)([T :_-])([012]\d)([:.-])([012345]\d)([:.-])([012345]\d)([- _.])'),
-    'WITHTIME_NO_SECONDS':  re.compile(r'^(\d{4})-([01]\d)-([0123]\d)([T :_-])([012]\d)([:.-])([012345]\d)([- _.])'),
-    'WITHSECONDS': re.compile(r'^(\d{4})-([01]\d)-([0123]\d)([T :_-])([012]\d)([:.-])([012345]\d)([:.-])([012345]\d)([- _])'),
+# the sources of REGEX_PATTERNS which are compiled on first use, see __getattr__()
+REGEX_PATTERN_SOURCES = {
+    'NODATESTAMP': r'^\D',
+    'SHORT': r'^(\d{2})([01]\d)([0123]\d)([- _])',
+    'COMPACT': r'^(\d{4})([01]\d)([0123]\d)([- _])',
+    'STANDARD': r'^(\d{4})-([01]\d)-([0123]\d)([- _])',
+    'MONTH': r'^(\d{4})-([01]\d)(?!-[0123]\d)([- _])',
+    'WITHTIME_AND_SECONDS': r'^(\d{4})-([01]\d)-([0123]\d)([T :_-])([012]\d)([:.-])([012345]\d)([:.-])([012345]\d)([- _.])',
+    'WITHTIME_NO_SECONDS':  r'^(\d{4})-([01]\d)-([0123]\d)([T :_-])([012]\d)([:.-])([012345]\d)([- _.])',
+    'WITHSECONDS': r'^(\d{4})-([01]\d)-([0123]\d)([T :_-])([012]\d)([:.-])([012345]\d)([:.-])([012345]\d)([- _])',
 }
+
+# All known datestamp styles combined into one alternation so that a basename gets classified
+# with a single match instead of walking REGEX_PATTERNS one by one. The alternatives are
+# ordered by precedence (the same order generate_new_basename() used to test them) and each one
+# is a named group whose unnamed sub-groups hold the fields. The trailing delimiter is matched
+# outside of the named group so that the named group is always the last one closed: this way,
+# match.lastgroup is the kind and match.lastindex the position of its fields. It is compiled on
+# first use by classify_basename() and available as DATESTAMP_CLASSIFIER then.
+STAMPED_CLASSIFIER_SOURCE = (
+    r'(?P<WITHTIME_AND_SECONDS>(\d{4})-([01]\d)-([0123]\d)([T :_-])([012]\d)([:.-])([012345]\d)([:.-])([012345]\d))[- _.]'
+    r'|(?P<WITHTIME_NO_SECONDS>(\d{4})-([01]\d)-([0123]\d)([T :_-])([012]\d)([:.-])([012345]\d))[- _.]'
+    r'|(?P<STANDARD>(\d{4})-([01]\d)-([0123]\d))[- _]'
+    r'|(?P<COMPACT>(\d{4})([01]\d)([0123]\d))[- _]'
+    r'|(?P<SHORT>(\d{2})([01]\d)([0123]\d))[- _]'
+    r'|(?P<MONTH>(\d{4})-([01]\d))(?!-[0123]\d)[- _]')
+DATESTAMP_CLASSIFIER_SOURCE = r'(?P<NODATESTAMP>\D)|' + STAMPED_CLASSIFIER_SOURCE
+DATESTAMP_KINDS = ('NODATESTAMP', 'WITHTIME_AND_SECONDS', 'WITHTIME_NO_SECONDS', 'STANDARD', 'COMPACT', 'SHORT', 'MONTH')
+
+# for every kind of DATESTAMP_CLASSIFIER, the offsets of year, month, day, hour, minute, and
+# second relative to its named group (0 for fields the kind does not have) and the offsets of
+# the separators between date, hours, minutes, and seconds
+DATESTAMP_LAYOUTS = {
+    'WITHTIME_AND_SECONDS': ((1, 2, 3, 5, 7, 9), (4, 6, 8)),
+    'WITHTIME_NO_SECONDS': ((1, 2, 3, 5, 7, 0), (4, 6)),
+    'STANDARD': ((1, 2, 3, 0, 0, 0), ()),
+    'COMPACT': ((1, 2, 3, 0, 0, 0), ()),
+    'SHORT': ((1, 2, 3, 0, 0, 0), ()),
+    'MONTH': ((1, 2, 0, 0, 0, 0), ()),
+}
+
+# the directives of datestamp templates (--format, see StampTemplate): their regex, their
+# %-conversion, and their value as an index of time.struct_time or a function of it
+TEMPLATE_DIRECTIVES = {
+    'Y': (r'\d{4}', '%04d', 0),
+    'y': (r'\d{2}', '%02d', lambda struct_time: struct_time[0] % 100),
+    'm': (r'[01]\d', '%02d', 1),
+    'd': (r'[0123]\d', '%02d', 2),
+    'e': (r'[ 123]\d', '%2d', 2),
+    'j': (r'[0123]\d{2}', '%03d', 7),
+    'H': (r'[012]\d', '%02d', 3),
+    'I': (r'[01]\d', '%02d', lambda struct_time: (struct_time[3] + 11) % 12 + 1),
+    'M': (r'[0-5]\d', '%02d', 4),
+    'S': (r'[0-6]\d', '%02d', 5),
+    'u': (r'[1-7]', '%d', lambda struct_time: struct_time[6] + 1),
+    'w': (r'[0-6]', '%d', lambda struct_time: (struct_time[6] + 1) % 7),
+    'U': (r'[0-5]\d', '%02d', lambda struct_time: (struct_time[7] + 6 - (struct_time[6] + 1) % 7) // 7),
+    'W': (r'[0-5]\d', '%02d', lambda struct_time: (struct_time[7] + 6 - struct_time[6]) // 7),
+    'G': (r'\d{4}', '%04d', lambda struct_time: iso_calendar(struct_time)[0]),
+    'V': (r'[0-5]\d', '%02d', lambda struct_time: iso_calendar(struct_time)[1]),
+    'z': (r'[+-]\d{4}', '%s', lambda struct_time: '%s%02d%02d' % ('-' if struct_time.tm_gmtoff < 0 else '+',
+                                                                  abs(struct_time.tm_gmtoff) // 3600,
+                                                                  abs(struct_time.tm_gmtoff) // 60 % 60)),
+}
+# the directives of names in the current locale: the index of time.struct_time they depend on and its values
+TEMPLATE_NAMES = {'a': (6, range(7)), 'A': (6, range(7)), 'b': (1, range(1, 13)), 'B': (1, range(1, 13)),
+                  'p': (3, range(24))}
+TEMPLATE_COMPOSITES = {'F': '%Y-%m-%d'}
+TEMPLATE_FIELDS = {'Y': 'year', 'm': 'month', 'd': 'day', 'H': 'hour', 'M': 'minute', 'S': 'second'}
+DATESTAMP_FIELDS = ('year', 'month', 'day', 'hour', 'minute', 'second')
+
+# classify_many() and strip_many() match many names at once, joined with NUL characters which
+# file names can not contain: the stamped alternatives of DATESTAMP_CLASSIFIER right after a NUL.
+# Names starting with a non-digit do not match; names starting with digits which form no known
+# datestamp and empty names match NONE. BULK_STRIPPER also takes the whitespace following the
+# datestamp, which \s matches like str.strip() removes it. The lookaheads let the names starting
+# with a non-digit fail at once instead of at every alternative.
+BULK_CLASSIFIER_SOURCE = r'\0(?=[\d\0])(?:' + STAMPED_CLASSIFIER_SOURCE + r'|(?P<NONE>\d|(?=\0)))'
+BULK_STRIPPER_SOURCE = r'\0(?=\d)(?:' + STAMPED_CLASSIFIER_SOURCE + r')\s*'
+BULK_CHUNK = 65536  # the number of names classify_many() and strip_many() join into one buffer
+
 MAX_PATHLENGTH = 255  # os.pathconf('/', 'PC_PATH_MAX') may be longer but os.rename() seems to have hard-coded 256
 
+TEMPORARY_PREFIX = '.date2name-'  # of the temporary names of --batch for renames which go round in a circle
+
+
+def get_bulk_patterns():
+    """Return BULK_CLASSIFIER and BULK_STRIPPER, compiling them on first use"""
+    global BULK_CLASSIFIER, BULK_STRIPPER
+    BULK_CLASSIFIER = re.compile(BULK_CLASSIFIER_SOURCE)
+    BULK_STRIPPER = re.compile(BULK_STRIPPER_SOURCE)
+    return BULK_CLASSIFIER, BULK_STRIPPER
+
+
+def get_datestamp_classifier():
+    """Return DATESTAMP_CLASSIFIER, compiling it on first use"""
+    global DATESTAMP_CLASSIFIER
+    DATESTAMP_CLASSIFIER = re.compile(DATESTAMP_CLASSIFIER_SOURCE)
+    return DATESTAMP_CLASSIFIER
+
+
+def get_pdf_creation_date():
+    """Return PDF_CREATION_DATE, compiling it on first use"""
+    global PDF_CREATION_DATE
+    PDF_CREATION_DATE = re.compile(PDF_CREATION_DATE_SOURCE)
+    return PDF_CREATION_DATE
+
+
+def __getattr__(name):
+    """Compile REGEX_PATTERNS, DATESTAMP_CLASSIFIER, PDF_CREATION_DATE, and the bulk patterns when they are accessed
+    first (PEP 562)"""
+    global REGEX_PATTERNS
+    if name == 'DATESTAMP_CLASSIFIER':
+        return get_datestamp_classifier()
+    if name == 'PDF_CREATION_DATE':
+        return get_pdf_creation_date()
+    if name in ('BULK_CLASSIFIER', 'BULK_STRIPPER'):
+        return get_bulk_patterns()[name == 'BULK_STRIPPER']
+    if name == 'REGEX_PATTERNS':
+        REGEX_PATTERNS = dict((kind, re.compile(source)) for kind, source in REGEX_PATTERN_SOURCES.items())
+        return REGEX_PATTERNS
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+# strftime() directives whose output only depends on the local date: their output is the same within a
+# quarter of an hour aligned to the epoch since local midnight and DST transitions are aligned like that
+# for all current time zones
+DATE_DIRECTIVES = frozenset('aAbBCdDeFgGhjmuUVwWxyY%')
+
+INDEX_VERSION = 1  # first line of an index written by Index.save(): {"date2name_index": INDEX_VERSION, ...}
+
+PLAN_VERSION = 1  # first line of a plan written by write_plan(): {"date2name_plan": PLAN_VERSION, "config": {...}}
+
+WATCH_DEBOUNCE = 0.5  # seconds without events before watch() handles the items which arrived
+
+SERVE_CONFIGS = 64  # the number of configurations serve() keeps with their Renamer for later requests
+
+STATS = None  # the RunStats collecting the statistics of --stats; None when not collecting
+
+# rename and stat relative to open directory descriptors instead of paths (not supported on Windows)
+USE_DIR_FD = os.rename in os.supports_dir_fd and os.stat in os.supports_dir_fd
+
+RENAME_NOREPLACE = 1  # flag of renameat2() on Linux: fail with EEXIST instead of replacing the target
+AT_FDCWD = -100       # directory descriptor of renameat() and friends standing for the current directory
+
+META_READ_SIZE = 64 * 1024  # bytes read_pdf_time() reads at most from the start and from the end of a PDF
+MP4_EPOCH = -2082844800  # 1904-01-01T00:00:00Z, the origin of the times in MP4 and QuickTime files
+MP4_BOX_TYPES = frozenset((b'ftyp', b'moov', b'mdat', b'wide', b'free', b'skip', b'pnot'))  # first box of a movie
+# the CreationDate of a PDF with its time zone; compiled by read_pdf_time() on first use as PDF_CREATION_DATE
+PDF_CREATION_DATE_SOURCE = (rb"/CreationDate\s*\(D:(\d{4})(\d\d)?(\d\d)?(\d\d)?(\d\d)?(\d\d)?"
+                            rb"(?:([Z+-])(?:(\d\d)'?(\d\d)?)?)?")
+RENAMEAT2 = None      # renameat2() of the C library once loaded by get_renameat2(), False if not available
+
 # cmdline parsing
 USAGE = "\n\
          %prog [options] file ...\n\
@@ -63,213 +214,1232 @@ with the (older) DIN 5008 version with dots.\n\
 \n\
 Run %prog --help for usage hints"
 
-# pylint: disable-msg=C0103
-parser = OptionParser(usage=USAGE)
-parser.add_option("-d", "--directories", dest="onlydirectories",
-                  action="store_true",
-                  help="modify only directory names")
-parser.add_option("-f", "--files", dest="onlyfiles",
-                  action="store_true",
-                  help="modify only file names")
-parser.add_option("-C", "--compact", dest="compact",
-                  action="store_true",
-                  help="use compact datestamp             (YYYYMMDD)")
-parser.add_option("-M", "--month", dest="month",
-                  action="store_true",
-                  help="use datestamp with year and month (YYYY-MM)")
-parser.add_option("-S", "--short", dest="short",
-                  action="store_true",
-                  help="use short datestamp               (YYMMDD)")
-parser.add_option("-w", "--withtime", dest="withtime",
-                  action="store_true",
-                  help="use datestamp including seconds   (YYYY-MM-DDThh.mm.ss)")
-parser.add_option("-r", "--remove", dest="remove",
-                  action="store_true",
-                  help="remove all known datestamps")
-parser.add_option("-m", "--mtime", dest="mtime",
-                  action="store_true",
-                  help="take modification time for datestamp [default]")
-parser.add_option("-c", "--ctime", dest="ctime",
-                  action="store_true",
-                  help="take creation time for datestamp")
-parser.add_option("--delimiter", dest="delimiter", metavar='DELIMITER_STRING',
-                  help='use this option to override the delimiter character between ' +
-                  'date/time-stamp and the rest. It may be a single character like "_" ' +
-                  'or some arbitrary string. Please note that anything else but minus, ' +
-                  'space, or underscore may result in not recognizing the delimiter ' +
-                  'for further operations such as fixing slightly wrong formatted time-stamps.')
-parser.add_option("--nocorrections", dest="nocorrections", action="store_true",
-                  help="do not convert existing but slightly wrong formatted date/time-stamps to new format. " +
-                  "E.g., when YYYY-MM-DD is used as format and YYYYMMDD is found in file name, it is not converted.")
-parser.add_option("-q", "--quiet", dest="quiet", action="store_true",
-                  help="do not output anything but just errors on console")
-parser.add_option("-v", "--verbose", dest="verbose", action="store_true",
-                  help="enable verbose mode")
-parser.add_option("-s", "--dryrun", dest="dryrun", action="store_true",
-                  help="enable dryrun mode: just simulate what would happen, do not modify files or directories")
-parser.add_option("--version", dest="version", action="store_true",
-                  help="display version and exit")
-(options, args) = parser.parse_args()
-
-
-def handle_logging():
+
+# the options of the command line interface as (flags, keyword arguments of OptionParser.add_option())
+OPTIONS = [
+    (("-d", "--directories"), dict(dest="onlydirectories", action="store_true", help="modify only directory names")),
+    (("-f", "--files"), dict(dest="onlyfiles", action="store_true", help="modify only file names")),
+    (("-C", "--compact"), dict(dest="compact", action="store_true",
+                               help="use compact datestamp             (YYYYMMDD)")),
+    (("-M", "--month"), dict(dest="month", action="store_true", help="use datestamp with year and month (YYYY-MM)")),
+    (("-S", "--short"), dict(dest="short", action="store_true", help="use short datestamp               (YYMMDD)")),
+    (("-w", "--withtime"), dict(dest="withtime", action="store_true",
+                                help="use datestamp including seconds   (YYYY-MM-DDThh.mm.ss)")),
+    (("--format",), dict(dest="template", metavar="TEMPLATE",
+                         help="use datestamp of the strftime() TEMPLATE like \"%Y%m%d-%H%M\" or \"%G-W%V\" " +
+                         "with the directives %Y %y %m %d %e %j %H %I %M %S %p %a %A %b %B %u %w %U %W %G %V " +
+                         "%z %F")),
+    (("-r", "--remove"), dict(dest="remove", action="store_true", help="remove all known datestamps")),
+    (("-R", "--recursive"), dict(dest="recursive", action="store_true",
+                                 help="also handle everything within the given directories, content first")),
+    (("-j", "--jobs"), dict(dest="jobs", metavar="N", type="int",
+                            help="rename the content of up to N directories in parallel (default: 1)")),
+    (("--pipeline",), dict(dest="pipeline", metavar="N", type="int",
+                           help="handle up to N items at once in an asynchronous pipeline, for file systems " +
+                           "with a high latency like network shares")),
+    (("-m", "--mtime"), dict(dest="mtime", action="store_true", help="take modification time for datestamp [default]")),
+    (("-c", "--ctime"), dict(dest="ctime", action="store_true", help="take creation time for datestamp")),
+    (("--meta",), dict(dest="meta", action="store_true",
+                       help="take the capture or creation time embedded in photos (EXIF), movies (MP4, QuickTime), " +
+                       "and PDFs for datestamp, the modification (or creation with -c) time for other items")),
+    (("--stat-source",), dict(dest="stat_source", metavar="FILE",
+                              help="take the times and types of the items listed in FILE instead of stat'ing " +
+                              "them, like the output of find DIR -printf '%Y %T@ %p\\0'; items not listed are " +
+                              "stat'ed")),
+    (("--stdin",), dict(dest="stdin", action="store_true",
+                        help="read the files to handle from standard input, one per line, in addition to the " +
+                        "arguments")),
+    (("-0", "--null"), dict(dest="null", action="store_true",
+                            help="like --stdin but the files are separated by NUL characters (find -print0)")),
+    (("--plan-out",), dict(dest="plan_out", metavar="FILE",
+                           help="do not rename anything but write the renames to FILE for --apply-plan " +
+                           "(implies --dryrun)")),
+    (("--apply-plan",), dict(dest="apply_plan", metavar="FILE",
+                             help="rename as written to FILE by --plan-out instead of handling any files given")),
+    (("--check-drift",), dict(dest="check_drift", action="store_true",
+                              help="with --apply-plan: skip items which changed since the plan was written")),
+    (("--journal",), dict(dest="journal", metavar="FILE", help="append every rename to FILE for --undo")),
+    (("--undo",), dict(dest="undo", metavar="FILE",
+                       help="reverse the renames recorded in the journal FILE, the last one first")),
+    (("--serve",), dict(dest="serve", metavar="SOCKET",
+                        help="handle rename requests on the Unix socket SOCKET instead of any files given, " +
+                        "see date2name/client.py")),
+    (("--watch",), dict(dest="watch", action="store_true",
+                        help="watch the given directories and handle files written to or moved into them until " +
+                        "terminated (Linux only)")),
+    (("--index",), dict(dest="index", metavar="FILE",
+                        help="skip the items which did not change since they were handled with the index FILE " +
+                        "and update it")),
+    (("--no-clobber",), dict(dest="noclobber", action="store_true",
+                             help="never replace an existing item: skip items whose new name exists already")),
+    (("--collision-suffix",), dict(dest="collision_suffix", metavar="FORMAT",
+                                   help="rename an item whose new name exists already to the first free name " +
+                                   "with FORMAT and a number inserted before the extension, like \"_%i\" for " +
+                                   "\"2024-01-31_photo_2.jpg\" (implies --no-clobber)")),
+    (("--batch",), dict(dest="batch", action="store_true",
+                        help="compute all new names before renaming anything, so that the result does not depend " +
+                        "on the order of the items: items which would get the same name are skipped (or " +
+                        "numbered with --collision-suffix) and renames are ordered so that no item replaces " +
+                        "another one of them")),
+    (("--delimiter",), dict(dest="delimiter", metavar='DELIMITER_STRING',
+                            help='use this option to override the delimiter character between ' +
+                            'date/time-stamp and the rest. It may be a single character like "_" ' +
+                            'or some arbitrary string. Please note that anything else but minus, ' +
+                            'space, or underscore may result in not recognizing the delimiter ' +
+                            'for further operations such as fixing slightly wrong formatted time-stamps.')),
+    (("--nocorrections",), dict(dest="nocorrections", action="store_true",
+                                help="do not convert existing but slightly wrong formatted date/time-stamps to new " +
+                                "format. E.g., when YYYY-MM-DD is used as format and YYYYMMDD is found in file name, " +
+                                "it is not converted.")),
+    (("-q", "--quiet"), dict(dest="quiet", action="store_true",
+                             help="do not output anything but just errors on console")),
+    (("-v", "--verbose"), dict(dest="verbose", action="store_true", help="enable verbose mode")),
+    (("--log-file",), dict(dest="log_file", metavar="FILE",
+                           help="append the output to FILE instead of writing it to the console, except for errors")),
+    (("--log-format",), dict(dest="log_format", metavar="FORMAT", type="choice", choices=["text", "json"],
+                             help="write the output as \"text\" [default] or as \"json\" objects, one per line")),
+    (("-s", "--dryrun"), dict(dest="dryrun", action="store_true",
+                              help="enable dryrun mode: just simulate what would happen, do not modify files or " +
+                              "directories")),
+    (("--stats",), dict(dest="stats", action="store_true",
+                        help="print the kinds of datestamps found, the numbers of renamed, unchanged, skipped, " +
+                        "and errored items, and the time spent per phase to standard error at the end")),
+    (("--profile",), dict(dest="profile", metavar="FILE",
+                          help="write the profile of the run (of the main thread) by cProfile to FILE, see " +
+                          "\"python3 -m pstats FILE\"")),
+    (("--version",), dict(dest="version", action="store_true", help="display version and exit")),
+]
+
+
+def build_parser():
+    """Return the OptionParser for the command line interface"""
+
+    from optparse import OptionParser  # only needed for --help and errors, see parse_arguments()
+
+    parser = OptionParser(usage=USAGE)
+    for flags, settings in OPTIONS:
+        parser.add_option(*flags, **settings)
+    return parser
+
+
+def parse_arguments(argv):
+    """Parse the command line arguments argv like build_parser().parse_args(argv) but faster
+
+    Returns the options and the remaining arguments. Only exactly written options and valid values
+    are handled here; everything else like --help, abbreviated or unknown options, and invalid
+    values is left to build_parser() so that its usage messages and errors stay the same. This
+    avoids importing optparse for ordinary invocations."""
+
+    lookup = {}
+    for flags, settings in OPTIONS:
+        for flag in flags:
+            lookup[flag] = settings
+    values = dict((settings['dest'], None) for flags, settings in OPTIONS)
+    args = []
+
+    def convert(settings, value):
+        if settings.get('type') == 'int':
+            return int(value)
+        if 'choices' in settings and value not in settings['choices']:
+            raise ValueError(value)
+        return value
+
+    index = 0
+    try:
+        while index < len(argv):
+            argument = argv[index]
+            index += 1
+            if argument == '--':
+                args.extend(argv[index:])
+                break
+            elif argument.startswith('--'):
+                name, separator, value = argument.partition('=')
+                settings = lookup[name]
+                if settings.get('action') == 'store_true':
+                    if separator:
+                        raise ValueError(argument)
+                    values[settings['dest']] = True
+                else:
+                    if not separator:
+                        value = argv[index]
+                        index += 1
+                    values[settings['dest']] = convert(settings, value)
+            elif argument.startswith('-') and argument != '-':
+                position = 1
+                while position < len(argument):
+                    settings = lookup['-' + argument[position]]
+                    position += 1
+                    if settings.get('action') == 'store_true':
+                        values[settings['dest']] = True
+                    else:
+                        value = argument[position:]
+                        if not value:
+                            value = argv[index]
+                            index += 1
+                        values[settings['dest']] = convert(settings, value)
+                        break
+            else:
+                args.append(argument)
+    except (KeyError, IndexError, ValueError):
+        return build_parser().parse_args(argv)
+    return SimpleNamespace(**values), args
+
+
+class RenameConfig(namedtuple('RenameConfig', ['onlydirectories', 'onlyfiles', 'compact', 'month', 'short',
+                                                 'withtime', 'template', 'remove', 'recursive', 'jobs', 'pipeline',
+                                                 'ctime', 'meta', 'stat_source', 'delimiter', 'nocorrections',
+                                                 'noclobber', 'collision_suffix', 'batch', 'dryrun'],
+                                 defaults=[False, False, False, False, False, False, None, False, False, 1, 0, False,
+                                           False, None, None, False, False, None, False, False])):
+    """Everything that controls how items get renamed; the library counterpart of the command line options
+
+    With template, a strftime() format, the datestamps are formatted and recognized like it
+    instead of like one of the built-in formats, see StampTemplate. The modification time is taken
+    for new datestamps unless ctime is set. With meta, the time embedded in the file is
+    preferred, see read_embedded_time(). With stat_source, the path of a listing, the times and
+    types of the items listed there are taken instead of stat'ing them, see StatSource. With
+    pipeline greater than zero, the items are handled by rename_pipelined(). With noclobber,
+    existing items are never replaced, see place_new_basename() and claim_new_basename(). With
+    batch, all new names are computed before the first rename, see plan_batch(). Configurations
+    are immutable, use _replace() to derive another one."""
+
+    def __new__(cls, *args, **kwargs):
+        self = super().__new__(cls, *args, **kwargs)
+        if self.onlyfiles and self.onlydirectories:
+            raise ValueError("please use either onlyfiles or onlydirectories or none of them")
+        if sum(1 for selected in (self.compact, self.month, self.withtime) if selected) > 1:
+            raise ValueError("please use either the default, short, month, or withtime format")
+        if self.template is not None:
+            if self.compact or self.month or self.short or self.withtime:
+                raise ValueError("please use either a template or the compact, short, month, or withtime format")
+            list(StampTemplate.tokens(self.template))  # raises ValueError if it is no valid template
+        if self.jobs < 1:
+            raise ValueError("the number of jobs has to be at least 1")
+        if self.pipeline < 0:
+            raise ValueError("the number of items in the pipeline has to be at least 1")
+        if self.pipeline and (self.jobs > 1 or self.batch):
+            raise ValueError("please use pipeline without jobs and batch")
+        if self.collision_suffix is not None and not (self.noclobber and is_collision_suffix(self.collision_suffix)):
+            raise ValueError("the collision suffix needs noclobber and has to hold one %i for the number")
+        return self
+
+    @classmethod
+    def from_options(cls, options):
+        """Create the configuration from the options of the command line parser"""
+        return cls(**dict((name, getattr(options, name) or cls._field_defaults[name]) for name in cls._fields))
+
+    @property
+    def formatstring(self):
+        """the strftime() format of the datestamps to add"""
+        if self.template is not None:
+            return self.template
+        elif self.compact:
+            return FORMATSTRING_COMPACT
+        elif self.short:
+            return FORMATSTRIING_SHORT
+        elif self.month:
+            return FORMATSTRING_MONTH
+        elif self.withtime:
+            return FORMATSTRING_WITHTIME
+        else:
+            return FORMATSTRING_STANDARD
+
+    @cached_property
+    def renamer(self):
+        """the Renamer of this configuration, built on first use"""
+        return Renamer(self)
+
+
+class Renamer(object):
+    """The decisions of a RenameConfig which are the same for every item, taken once per run
+
+    Holds the strftime() format of new datestamps with its StampTemplate if it is a template of
+    the user, the classifier of datestamps, the getter of the time to take from a
+    stat_result, whether to prefer the time embedded in files, the StatSource, the delimiter
+    policy, the formatter of converted datestamps, and the kinds of datestamps which are in the
+    selected format already. Use RenameConfig.renamer to get it.
+
+    New datestamps are memoized in a bounded cache keyed on the time truncated to MEMO_DATE_SECONDS
+    for formats of the local date only, and to the second otherwise. hits and misses count the
+    lookups of the cache."""
+
+    MEMO_SIZE = 4096
+    MEMO_DATE_SECONDS = 15 * 60
+
+    def __init__(self, config):
+        self.formatstring = config.formatstring
+        if set(re.findall('%(.)', self.formatstring)) <= DATE_DIRECTIVES:
+            self.memo_seconds = self.MEMO_DATE_SECONDS
+        else:
+            self.memo_seconds = 1
+        self.memo = {}
+        self.hits = 0
+        self.misses = 0
+        if config.template is not None:
+            self.template = StampTemplate(config.template, config.delimiter)
+            self.format_struct_time = self.template.format
+            self.classify = self.template.classify
+        else:
+            self.template = None
+            self.format_struct_time = partial(time.strftime, self.formatstring)
+            self.classify = classify_basename
+        if config.ctime and sys.platform == 'darwin':
+            # see https://github.com/novoid/date2name/issues/6 for macOS-issue with ctime
+            self.get_time = operator.attrgetter('st_birthtime')
+        elif config.ctime:
+            self.get_time = operator.attrgetter('st_ctime')
+        else:
+            self.get_time = operator.attrgetter('st_mtime')
+        self.meta = config.meta
+        if config.stat_source:
+            path = os.path.abspath(config.stat_source)
+            self.stat_source = load_stat_source(path, os.stat(path).st_mtime_ns)
+        else:
+            self.stat_source = None
+        self.delimiter = config.delimiter
+        if config.template is not None:
+            self.format_date = None  # see StampTemplate.convert()
+            self.unchanged_kinds = frozenset(('TEMPLATE',))
+        elif config.compact:
+            self.format_date = lambda year, month, day: year + month + day
+            self.unchanged_kinds = frozenset(('COMPACT', 'SHORT'))
+        elif config.month:
+            self.format_date = lambda year, month, day: year + "-" + month
+            self.unchanged_kinds = frozenset(('MONTH',))
+        else:
+            self.format_date = lambda year, month, day: year + "-" + month + "-" + day
+            self.unchanged_kinds = frozenset() if config.withtime else frozenset(('STANDARD',))
+
+    def format_time(self, timestamp):
+        """return the datestamp of timestamp (seconds since the epoch) in self.formatstring"""
+        key = int(timestamp // self.memo_seconds)
+        datestamp = self.memo.get(key)
+        if datestamp is not None:
+            self.hits += 1
+            return datestamp
+        self.misses += 1
+        local_time = time.localtime(timestamp)
+        datestamp = self.format_struct_time(local_time)
+        if local_time.tm_gmtoff % self.memo_seconds == 0:  # not for historic offsets like +00:19:32
+            if len(self.memo) >= self.MEMO_SIZE:
+                self.memo.clear()
+            self.memo[key] = datestamp
+        return datestamp
+
+    def stamp(self, formatstring, basename, stat_result, timestamp=None):
+        """return basename with a datestamp of timestamp or else the time in stat_result in front of it"""
+        if timestamp is None:
+            timestamp = self.get_time(stat_result)
+        if formatstring == self.formatstring:
+            datestamp = self.format_time(timestamp)
+        else:
+            datestamp = time.strftime(formatstring, time.localtime(timestamp))
+        return datestamp + (self.delimiter or (" " if " " in basename else "_")) + basename
+
+
+class BufferedLogHandler(logging.StreamHandler):
+    """Write log records to a stream without flushing it after every record
+
+    The stream is flushed after records of level ERROR and above and when the handler gets
+    flushed, which logging.shutdown() does at exit. Audits of millions of items thus do not cost
+    one write per line."""
+
+    def emit(self, record):
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+            if record.levelno >= logging.ERROR:
+                self.stream.flush()
+        except Exception:
+            self.handleError(record)
+
+
+class JsonLogFormatter(logging.Formatter):
+    """Format log records as JSON objects
+
+    Every object holds the time in seconds since the epoch, the level, and the message. Records
+    about an item (from apply_new_basename()) also hold its path and its new basename."""
+
+    def format(self, record):
+        import json
+        entry = {'time': record.created, 'level': record.levelname, 'message': record.getMessage()}
+        item = getattr(record, 'item', None)
+        if item is not None:
+            entry['item'] = item
+            entry['new_basename'] = record.new_basename
+        return json.dumps(entry)
+
+
+class RunStats(logging.Handler):
+    """Statistics of a run for --stats, collected while STATS is set to an instance
+
+    Counts the kinds of datestamps classified ("other" for names which start with a digit but
+    match none) and the items renamed (or to be renamed in dryrun mode), unchanged, and skipped
+    because of onlyfiles or onlydirectories. As a handler of the root logger, it counts the log
+    records of level ERROR and above as errors. The time spent and the items handled are summed
+    up per phase: discover (reading directories), stat (including reading embedded times),
+    classify, format (new datestamps and converted ones), and rename (including the output).
+    With several threads (-j, --pipeline), their times add up."""
+
+    PHASES = ('discover', 'stat', 'classify', 'format', 'rename')
+
+    def __init__(self):
+        logging.Handler.__init__(self, logging.ERROR)
+        self.counting = threading.Lock()
+        self.start = time.perf_counter()
+        self.kinds = dict.fromkeys(DATESTAMP_KINDS + ('TEMPLATE', 'other'), 0)
+        self.outcomes = dict.fromkeys(('renamed', 'unchanged', 'skipped', 'errors'), 0)
+        self.seconds = dict.fromkeys(self.PHASES, 0.0)
+        self.items = dict.fromkeys(self.PHASES, 0)
+
+    def emit(self, record):
+        self.count('errors')
+
+    def count(self, outcome, number=1):
+        """add number items to outcome"""
+        with self.counting:
+            self.outcomes[outcome] += number
+
+    def add(self, phase, start, items=1):
+        """add the time since start (from time.perf_counter()) and items to phase"""
+        seconds = time.perf_counter() - start
+        with self.counting:
+            self.seconds[phase] += seconds
+            self.items[phase] += items
+
+    def classified(self, datestamp, start):
+        """count the Datestamp (or None) classify_basename() returned after it started at start"""
+        with self.counting:
+            self.kinds[datestamp.kind if datestamp is not None else 'other'] += 1
+        self.add('classify', start)
+
+    def report(self):
+        """Return the statistics as text"""
+        lines = ["statistics of %.3f s:" % (time.perf_counter() - self.start),
+                 "  datestamps: " + (", ".join("%s %i" % (kind, number) for kind, number in self.kinds.items()
+                                               if number) or "none classified"),
+                 "  items:      " + ", ".join("%i %s" % (number, outcome)
+                                              for outcome, number in self.outcomes.items())]
+        for phase in self.PHASES:
+            seconds, items = self.seconds[phase], self.items[phase]
+            lines.append("  %-9s %10.3f s %10i items %12.0f items/s" % (
+                phase, seconds, items, items / seconds if seconds else 0))
+        return "\n".join(lines)
+
+
+def handle_logging(options):
     """Log handling and configuration"""
 
     if options.verbose:
         FORMAT = "%(levelname)-8s %(asctime)-15s %(message)s"
-        logging.basicConfig(level=logging.DEBUG, format=FORMAT)
+        level = logging.DEBUG
     elif options.quiet:
         FORMAT = "%(levelname)-8s %(message)s"
-        logging.basicConfig(level=logging.CRITICAL, format=FORMAT)
+        level = logging.CRITICAL
     else:
         FORMAT = "%(message)s"
-        logging.basicConfig(level=logging.INFO, format=FORMAT)
+        level = logging.INFO
+
+    if options.log_file or options.log_format == 'json':
+        if options.log_file:
+            handler = BufferedLogHandler(open(options.log_file, 'a', encoding='utf-8', buffering=1 << 16))
+        else:
+            handler = BufferedLogHandler()
+        handler.setFormatter(JsonLogFormatter() if options.log_format == 'json' else logging.Formatter(FORMAT))
+        handlers = [handler]
+        if options.log_file:
+            console = logging.StreamHandler()
+            console.setLevel(logging.ERROR)
+            console.setFormatter(logging.Formatter("%(levelname)-8s %(message)s"))
+            handlers.append(console)
+        logging.basicConfig(level=level, handlers=handlers)
+    else:
+        logging.basicConfig(level=level, format=FORMAT)
+
+
+class Datestamp(object):
+    """The datestamp classify_basename() found at the beginning of a basename.
+
+    kind is one of DATESTAMP_KINDS, or TEMPLATE for the datestamps of a StampTemplate. The fields
+    are taken from the match only when they are accessed since most callers just need the kind."""
+
+    __slots__ = ('kind', 'components')
+
+    def __init__(self, kind, components=None):
+        self.kind = kind
+        self.components = components
 
+    def _field(self, position):
+        if self.components is None:
+            return None
+        if self.kind == 'TEMPLATE':
+            return self.components.groupdict().get(DATESTAMP_FIELDS[position])
+        offset = DATESTAMP_LAYOUTS[self.kind][0][position]
+        if not offset:
+            return None
+        return self.components.group(self.components.lastindex + offset)
 
-def get_converted_basename(matched_pattern, item):
+    @property
+    def year(self):
+        """four digit year; years of SHORT datestamps are expanded like strptime() does for %y"""
+        year = self._field(0)
+        if self.kind == 'SHORT':
+            year = ('19' if year >= '69' else '20') + year
+        return year
+
+    month = property(lambda self: self._field(1))
+    day = property(lambda self: self._field(2))
+    hour = property(lambda self: self._field(3))
+    minute = property(lambda self: self._field(4))
+    second = property(lambda self: self._field(5))
+
+    @property
+    def separators(self):
+        """characters between date and hours, hours and minutes, and minutes and seconds"""
+        if self.components is None or self.kind == 'TEMPLATE':
+            return ()
+        index = self.components.lastindex
+        return tuple(self.components.group(index + offset) for offset in DATESTAMP_LAYOUTS[self.kind][1])
+
+    @property
+    def end(self):
+        """index right after the datestamp, without the delimiter"""
+        return self.components.end(self.components.lastindex) if self.components else 0
+
+    @property
+    def length(self):
+        """index right after the delimiter following the datestamp"""
+        return self.components.end() if self.components else 0
+
+    def __repr__(self):
+        return 'Datestamp(%r, year=%r, month=%r, day=%r, hour=%r, minute=%r, second=%r)' % (
+            self.kind, self.year, self.month, self.day, self.hour, self.minute, self.second)
+
+
+NO_DATESTAMP = Datestamp('NODATESTAMP')
+
+
+def classify_basename(basename):
+    """Classify the datestamp at the beginning of basename with a single match against DATESTAMP_CLASSIFIER.
+
+    Returns a Datestamp whose kind is a key of REGEX_PATTERNS and which provides the
+    year/month/day/time fields. Names starting with a non-digit return NO_DATESTAMP, names
+    starting with digits that do not form a known datestamp return None."""
+
+    try:
+        components = DATESTAMP_CLASSIFIER.match(basename)
+    except NameError:
+        components = get_datestamp_classifier().match(basename)
+    if components is None:
+        return None
+    kind = components.lastgroup
+    if kind == 'NODATESTAMP':
+        return NO_DATESTAMP
+    return Datestamp(kind, components)
+
+
+class StampTemplate(object):
+    """A datestamp format of the user (--format), compiled once into a formatter and a recognizer
+
+    The template is a strftime() format with the directives of TEMPLATE_DIRECTIVES,
+    TEMPLATE_NAMES, and TEMPLATE_COMPOSITES. format() turns a time.struct_time into a datestamp
+    with a single %-formatting of its fields. match() recognizes a datestamp of the template
+    followed by a delimiter at the beginning of a basename with an anchored regex whose named
+    group TEMPLATE spans the datestamp and whose groups year, month, day, hour, minute, and
+    second hold the fields of %Y, %m, %d, %H, %M, and %S. The delimiter is delimiter if given,
+    else one of "-", " ", and "_". Raises ValueError if template is no valid template."""
+
+    TIME_DIRECTIVES = frozenset('HIMSpz')
+
+    def __init__(self, template, delimiter=None):
+        self.template = template
+        self.directives = set()
+        conversions, patterns, getters = [], [], []
+        for literal, directive in self.tokens(template):
+            conversions.append(literal.replace('%', '%%'))
+            patterns.append(re.escape(literal))
+            if not directive:
+                continue
+            if directive in TEMPLATE_NAMES:
+                pattern, conversion, getter = self.names(directive)
+            else:
+                pattern, conversion, getter = TEMPLATE_DIRECTIVES[directive]
+            if directive in TEMPLATE_FIELDS and directive not in self.directives:
+                pattern = '(?P<%s>%s)' % (TEMPLATE_FIELDS[directive], pattern)
+            self.directives.add(directive)
+            conversions.append(conversion)
+            patterns.append(pattern)
+            getters.append(getter)
+        self.pattern = '(?P<TEMPLATE>%s)%s' % (''.join(patterns), re.escape(delimiter) if delimiter else '[- _]')
+        self.match = re.compile(self.pattern).match
+        self.conversion = ''.join(conversions)
+        if all(isinstance(getter, int) for getter in getters):
+            if len(getters) == 1:
+                self.fields = lambda struct_time, index=getters[0]: (struct_time[index],)
+            else:
+                self.fields = operator.itemgetter(*getters)
+        else:
+            getters = [operator.itemgetter(getter) if isinstance(getter, int) else getter for getter in getters]
+            self.fields = lambda struct_time: tuple(getter(struct_time) for getter in getters)
+
+    @staticmethod
+    def tokens(template):
+        """Yield the pairs of literal text and directive (or '') of template
+
+        Raises ValueError if template is no valid template."""
+        if os.sep in template or (os.altsep and os.altsep in template):
+            raise ValueError("the template \"%s\" must not hold a path separator" % template)
+        literal, found, index = '', False, 0
+        while index < len(template):
+            character, index = template[index], index + 1
+            if character != '%':
+                literal += character
+                continue
+            directive, index = template[index:index + 1], index + 1
+            if directive == '%':
+                literal += '%'
+            elif directive in TEMPLATE_COMPOSITES:
+                yield literal, ''
+                yield from StampTemplate.tokens(TEMPLATE_COMPOSITES[directive])
+                literal, found = '', True
+            elif directive in TEMPLATE_DIRECTIVES or directive in TEMPLATE_NAMES:
+                yield literal, directive
+                literal, found = '', True
+            else:
+                raise ValueError("the template \"%s\" holds %%%s which is not supported" % (template, directive))
+        if not found:
+            raise ValueError("the template \"%s\" holds no directive like %%Y" % template)
+        if literal:
+            yield literal, ''
+
+    @staticmethod
+    def names(directive):
+        """Return the regex, the %-conversion, and the getter of the directive of names in the current locale"""
+        field, values = TEMPLATE_NAMES[directive]
+        names = {}
+        for value in values:
+            fields = [2024, 1, 1, 0, 0, 0, 0, 1, -1]
+            fields[field] = value
+            names[value] = time.strftime('%' + directive, tuple(fields))
+        alternatives = sorted(set(names.values()), key=len, reverse=True)
+        return ('(?:%s)' % '|'.join(re.escape(name) for name in alternatives), '%s',
+                lambda struct_time: names[struct_time[field]])
+
+    def format(self, struct_time):
+        """Return the datestamp of the time.struct_time struct_time"""
+        return self.conversion % self.fields(struct_time)
+
+    def classify(self, basename):
+        """Return the Datestamp of kind TEMPLATE at the beginning of basename, else like classify_basename()
+
+        A longer built-in datestamp wins over the template: "%Y-%m" matches the start of
+        "2019-06-01_name" but the datestamp is the STANDARD one."""
+        components = self.match(basename)
+        datestamp = classify_basename(basename)
+        if components is None or (datestamp is not None and datestamp.length > components.end()):
+            return datestamp
+        return Datestamp('TEMPLATE', components)
+
+    def convert(self, datestamp, item):
+        """Return the datestamp of the template with the fields of datestamp or None if they are no valid date"""
+        if datestamp.hour is not None and not self.directives & self.TIME_DIRECTIVES:
+            logging.warning("%s ... time will be lost due to conversion", item)
+        elif datestamp.hour is None and self.directives & self.TIME_DIRECTIVES:
+            logging.info("%s no time information, so I will take \"00:00\" for conversion", item)
+        if datestamp.day is None and self.directives - self.TIME_DIRECTIVES - set('YyGmbB'):
+            logging.info("%s no datestamp information for day, so I will take the first for conversion", item)
+        fields = (datestamp.year, datestamp.month, datestamp.day or '01', datestamp.hour or '00',
+                  datestamp.minute or '00', datestamp.second or '00')
+        try:
+            struct_time = time.strptime(' '.join(fields), '%Y %m %d %H %M %S')
+            if 'z' in self.directives:
+                struct_time = time.localtime(time.mktime(struct_time))
+        except (ValueError, OverflowError):
+            return None
+        return self.format(struct_time)
+
+
+def iso_calendar(struct_time):
+    """Return the ISO 8601 year and week of the date of struct_time like %G and %V"""
+    from datetime import date
+    return date(*struct_time[:3]).isocalendar()[:2]
+
+
+class DatestampColumns(object):
+    """The datestamps classify_many() found, as columns with one entry per name
+
+    kinds holds the index of the kind in DATESTAMP_KINDS, -1 where classify_basename() returns
+    None. year, month, day, hour, minute, and second hold the fields as numbers, -1 where the
+    kind has no such field; years of SHORT datestamps are expanded like Datestamp.year does.
+    lengths holds Datestamp.length, the length of the datestamp and its delimiter. Every name
+    takes 14 bytes."""
+
+    FIELDS = DATESTAMP_FIELDS
+
+    def __init__(self):
+        self.kinds = array('b')
+        self.year, self.month, self.day, self.hour, self.minute, self.second = (array('h') for _ in self.FIELDS)
+        self.lengths = array('B')
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def kind(self, index):
+        """the kind of the datestamp of name index like Datestamp.kind, None if there is none"""
+        return DATESTAMP_KINDS[self.kinds[index]] if self.kinds[index] >= 0 else None
+
+    def counts(self):
+        """Return the number of names per kind (None for classify_basename() returning None)"""
+        codes = self.kinds.tobytes()
+        counts = dict((kind, codes.count(bytes([code]))) for code, kind in enumerate(DATESTAMP_KINDS))
+        counts[None] = codes.count(b'\xff')  # -1
+        return counts
+
+    def extend(self, number):
+        """append number names without datestamp and return the index of the first"""
+        first = len(self.kinds)
+        self.kinds.extend(array('b', [0]) * number)
+        for field in self.FIELDS:
+            getattr(self, field).extend(array('h', [-1]) * number)
+        self.lengths.extend(array('B', [0]) * number)
+        return first
+
+    def set(self, index, kind, fields, length):
+        """set name index to the kind (or None), the strings of its fields (or None), and length"""
+        self.kinds[index] = DATESTAMP_KINDS.index(kind) if kind is not None else -1
+        if kind == 'SHORT':
+            fields = (('19' if fields[0] >= '69' else '20') + fields[0],) + tuple(fields[1:])
+        for field, value in zip(self.FIELDS, fields):
+            getattr(self, field)[index] = int(value) if value is not None else -1
+        self.lengths[index] = length
+
+
+def classify_many(names):
+    """Classify the datestamps of all names at once; like classify_basename() for each of them
+
+    Returns the DatestampColumns of names, which may be any iterable of strings. They are
+    joined into buffers of BULK_CHUNK names which are scanned by BULK_CLASSIFIER: names without
+    a datestamp cost no Python code at all. Chunks holding a NUL character are classified name
+    by name."""
+
+    try:
+        classifier = BULK_CLASSIFIER
+    except NameError:
+        classifier = get_bulk_patterns()[0]
+    columns = DatestampColumns()
+    kinds, lengths = columns.kinds, columns.lengths
+    short = DATESTAMP_KINDS.index('SHORT')
+    plans = {}  # match.lastindex → the index of the kind, the group numbers of its fields, and their columns
+    for kind, (offsets, separators) in DATESTAMP_LAYOUTS.items():
+        fields = [(classifier.groupindex[kind] + offset, getattr(columns, field))
+                  for offset, field in zip(offsets, DatestampColumns.FIELDS) if offset]
+        plans[classifier.groupindex[kind]] = (DATESTAMP_KINDS.index(kind), tuple(group for group, column in fields),
+                                              tuple(column for group, column in fields))
+    names = iter(names)
+    while True:
+        chunk = list(itertools.islice(names, BULK_CHUNK))
+        if not chunk:
+            return columns
+        index = columns.extend(len(chunk))
+        buffer = '\0' + '\0'.join(chunk) + '\0'
+        if buffer.count('\0') != len(chunk) + 1:
+            for index, name in enumerate(chunk, index):
+                datestamp = classify_basename(name)
+                if datestamp is None:
+                    columns.set(index, None, (), 0)
+                elif datestamp.kind != 'NODATESTAMP':
+                    columns.set(index, datestamp.kind, [datestamp._field(position) for position in range(6)],
+                                datestamp.length)
+            continue
+        last = 0
+        for match in classifier.finditer(buffer):
+            start, end = match.span()
+            index += buffer.count('\0', last, start)
+            last = start
+            if end - start < 3:  # NONE: a NUL and one digit or none
+                kinds[index] = -1
+                continue
+            code, groups, fields = plans[match.lastindex]
+            kinds[index] = code
+            lengths[index] = end - start - 1
+            values = match.group(*groups)
+            if code == short:
+                values = (('19' if values[0] >= '69' else '20') + values[0],) + values[1:]
+            for column, value in zip(fields, values):
+                column[index] = int(value)
+
+
+def strip_many(names):
+    """Return the list of names without their datestamps; like remove_timestamp_from_basename() for each of them
+
+    names may be any iterable of strings. They are joined into buffers of BULK_CHUNK names
+    from which BULK_STRIPPER removes the datestamps: names without a datestamp cost no Python
+    code at all. Only the names ending with whitespace, which remove_timestamp_from_basename()
+    strips if they had a datestamp, and chunks holding a NUL character are stripped name by
+    name."""
+
+    try:
+        stripper = BULK_STRIPPER
+    except NameError:
+        stripper = get_bulk_patterns()[1]
+    stripped = []
+    names = iter(names)
+    while True:
+        chunk = list(itertools.islice(names, BULK_CHUNK))
+        if not chunk:
+            return stripped
+        buffer = '\0' + '\0'.join(chunk) + '\0'
+        if buffer.count('\0') != len(chunk) + 1:
+            stripped.extend(remove_timestamp_from_basename(name) for name in chunk)
+            continue
+        first = len(stripped)
+        stripped.extend(stripper.sub('\0', buffer)[1:-1].split('\0'))
+        index, last = first - 2, 0  # a name is preceded by index + 1 NULs and followed by one
+        for match in re.finditer(r'\s\0', buffer):
+            index += buffer.count('\0', last, match.end())
+            last = match.end()
+            stripped[index] = remove_timestamp_from_basename(chunk[index - first])
+
+
+def get_converted_basename(datestamp, item, config):
     """returns a new filename based on found timestamp information and currently selected datestamp format"""
 
-    if matched_pattern == "compact":
-        logging.debug("item \"%s\" matches compact pattern, doing conversion" % item)
-        item_year = item[0:4]
-        item_month = item[4:6]
-        item_day = item[6:8]
-        name_without_datestamp = item[8:]
-    elif matched_pattern == "standard":
-        logging.debug("item \"%s\" matches standard pattern, doing conversion" % item)
-        item_year = item[0:4]
-        item_month = item[5:7]
-        item_day = item[8:10]
-        name_without_datestamp = item[10:]
-    elif matched_pattern == "month":
-        logging.debug("item \"%s\" matches month pattern, doing conversion" % item)
-        item_year = item[0:4]
-        item_month = item[5:7]
-        logging.info("%s no datestamp information for day, so I will take \"00\" for conversion" % item)
+    debug = logging.root.isEnabledFor(logging.DEBUG)
+    if debug:
+        logging.debug("item \"%s\" matches %s pattern, doing conversion", item, datestamp.kind)
+    name_without_datestamp = item[datestamp.end:]
+    template = config.renamer.template
+    if template is not None:
+        converted = template.convert(datestamp, item)
+        if converted is None:
+            logging.warning("%s: datestamp is no valid date, keeping it", item)
+            return item
+        return converted + name_without_datestamp
+    item_year = datestamp.year
+    item_month = datestamp.month
+    if datestamp.kind == 'MONTH':
+        logging.info("%s no datestamp information for day, so I will take \"00\" for conversion", item)
         item_day = "00"
-        name_without_datestamp = item[7:]
-    elif matched_pattern == "withtime":
-        logging.debug("item \"%s\" matches withtime pattern, doing conversion" % item)
-        item_year = item[0:4]
-        item_month = item[5:7]
-        item_day = item[8:10]
-        logging.warn("%s ... time will be lost due to conversion" % item)
-        if REGEX_PATTERNS['WITHSECONDS'].match(item):
-            name_without_datestamp = item[19:]
-        else:
-            # time-stamp only with hours and minutes:
-            name_without_datestamp = item[16:]
     else:
-        logging.error("unknown matched pattern (internal error)")
+        item_day = datestamp.day
+    if datestamp.hour is not None:
+        logging.warning("%s ... time will be lost due to conversion", item)
 
-    logging.debug("item \"%s\" got year \"%s\" month \"%s\" day \"%s\"" % (item, item_year, item_month, item_day))
+    if debug:
+        logging.debug("item \"%s\" got year \"%s\" month \"%s\" day \"%s\"", item, item_year, item_month, item_day)
 
-    if options.compact:
-        return item_year + item_month + item_day + name_without_datestamp
-    elif options.month:
-        return item_year + "-" + item_month + name_without_datestamp
-    elif options.withtime:
+    if config.withtime:
         # FIXXME: probably implement some kind of conversion to withtime-format
-        logging.warn("%s: Sorry! Conversion to withtime-format not implemented yet, taking standard format" % item)
-        return item_year + "-" + item_month + "-" + item_day + name_without_datestamp
-    else:
-        return item_year + "-" + item_month + "-" + item_day + name_without_datestamp
+        logging.warning("%s: Sorry! Conversion to withtime-format not implemented yet, taking standard format", item)
+    return config.renamer.format_date(item_year, item_month, item_day) + name_without_datestamp
 
 
-def get_timestamp_from_file(formatstring, item):
-    """read out ctime or mtime of file and return new itemname"""
+def to_timestamp(year, month=1, day=1, hour=0, minute=0, second=0, offset=None):
+    """Return the seconds since the epoch of a date and time, in local time unless offset (in minutes) is given
 
-    if " " in item:
-        delimiter_char = " "
-    else:
-        delimiter_char = "_"
-
-    if options.delimiter:
-        delimiter_char = options.delimiter
-
-    if options.ctime and platform.system() == 'Darwin':
-        # see https://github.com/novoid/date2name/issues/6 for macOS-issue with ctime
-        return time.strftime(formatstring, time.localtime(os.stat(item).st_birthtime)) + delimiter_char + item
-    elif options.ctime and platform.system() != 'Darwin':
-        return time.strftime(formatstring, time.localtime(os.path.getctime(item))) + delimiter_char + item
-    elif options.mtime:
-        return time.strftime(formatstring, time.localtime(os.path.getmtime(item))) + delimiter_char + item
-    else:
-        logging.error("internal error: not ctime nor mtime chosen! You can correct this by giving a parameter")
+    Returns None for invalid dates like the "0000:00:00 00:00:00" of cameras without a clock."""
+    from datetime import datetime, timedelta, timezone
+    try:
+        zone = timezone(timedelta(minutes=offset)) if offset is not None else None
+        return datetime(year, month, day, hour, minute, second, tzinfo=zone).timestamp()
+    except (ValueError, OverflowError, OSError):
+        return None
 
 
-def generate_new_basename(formatstring, basename):
-    """generates the new itemname; considering options.nocorrections"""
+def read_tiff_time(stream, base=0):
+    """Return the capture time in the TIFF structure at offset base of the binary stream or None
 
-    withtime_and_seconds_components = REGEX_PATTERNS['WITHTIME_AND_SECONDS'].match(basename)
-    withtime_no_seconds_components = REGEX_PATTERNS['WITHTIME_NO_SECONDS'].match(basename)
+    Takes DateTimeOriginal or else DateTimeDigitized of the Exif IFD, or else DateTime of IFD0.
+    Only the IFDs on the way and the value are read. TIFF based raw formats (CR2, NEF, DNG, ...)
+    and the EXIF of JPEGs (see read_jpeg_time()) are TIFF structures."""
 
-    if options.nocorrections or REGEX_PATTERNS['NODATESTAMP'].match(basename):
-        logging.debug("basename \"" + basename + "\" matches nodatestamp-pattern or option nocorrections " +
-                      "is set: skipping further pattern matching")
-        new_basename = get_timestamp_from_file(formatstring, basename)
+    stream.seek(base)
+    header = stream.read(8)
+    if header[:4] == b'II*\x00':
+        order = 'little'
+    elif header[:4] == b'MM\x00*':
+        order = 'big'
+    else:
+        return None
+
+    def read_ifd(offset):
+        stream.seek(base + offset)
+        data = stream.read(2)
+        data = stream.read(12 * int.from_bytes(data, order)) if len(data) == 2 else b''
+        return dict((int.from_bytes(data[position:position + 2], order), data[position + 2:position + 12])
+                    for position in range(0, len(data) - 11, 12))
+
+    def read_datetime(entry):
+        if entry is None or int.from_bytes(entry[:2], order) != 2:  # not ASCII
+            return None
+        count = int.from_bytes(entry[2:6], order)
+        if count < 19:
+            return None
+        stream.seek(base + int.from_bytes(entry[6:10], order))
+        value = stream.read(19)  # "YYYY:MM:DD HH:MM:SS"
+        if not re.match(rb'\d{4}:\d\d:\d\d \d\d:\d\d:\d\d\Z', value):
+            return None
+        return to_timestamp(*(int(field) for field in re.split(rb'[: ]', value)))
+
+    ifd0 = read_ifd(int.from_bytes(header[4:8], order))
+    if 0x8769 in ifd0:  # the Exif IFD
+        exif = read_ifd(int.from_bytes(ifd0[0x8769][6:10], order))
+        for tag in (0x9003, 0x9004):  # DateTimeOriginal, DateTimeDigitized
+            timestamp = read_datetime(exif.get(tag))
+            if timestamp is not None:
+                return timestamp
+    return read_datetime(ifd0.get(0x0132))  # DateTime
+
+
+def read_jpeg_time(stream):
+    """Return the capture time in the EXIF of the JPEG binary stream or None
+
+    Walks the segments in front of the image data up to the APP1 segment holding the EXIF."""
+
+    from io import BytesIO
+    stream.seek(2)
+    while True:
+        marker = stream.read(4)
+        if len(marker) < 4 or marker[0] != 0xff or marker[1] in (0xd9, 0xda):  # end of image, start of scan
+            return None
+        length = int.from_bytes(marker[2:], 'big')
+        if length < 2:  # the length counts its own two bytes: anything shorter is no segment
+            return None
+        if marker[1] == 0xe1:
+            data = stream.read(length - 2)
+            if data[:6] == b'Exif\x00\x00':
+                return read_tiff_time(BytesIO(data), 6)
+        else:
+            stream.seek(length - 2, os.SEEK_CUR)
+
+
+def read_mp4_time(stream, size):
+    """Return the creation time in the movie header (mvhd) of the MP4 or QuickTime binary stream or None
+
+    Only the headers of the top level boxes are read on the way to the movie box (moov): the
+    media data (mdat) is skipped however large it is, also when the movie box comes after it.
+    size is the size of the file."""
+
+    def boxes(start, end):
+        while start + 8 <= end:
+            stream.seek(start)
+            header = stream.read(16)
+            if len(header) < 8:
+                return
+            box_end, content = start + int.from_bytes(header[:4], 'big'), start + 8
+            if box_end == start + 1:  # the size follows the type as 64 bits
+                box_end, content = start + int.from_bytes(header[8:16], 'big'), start + 16
+            elif box_end == start:  # the box extends to the end
+                box_end = end
+            if box_end < content:
+                return
+            yield header[4:8], content, box_end
+            start = box_end
+
+    for kind, content, end in boxes(0, size):
+        if kind == b'moov':
+            for kind, content, _ in boxes(content, end):
+                if kind == b'mvhd':
+                    stream.seek(content)
+                    data = stream.read(12)
+                    creation = int.from_bytes(data[4:12] if data[:1] == b'\x01' else data[4:8], 'big')
+                    return creation + MP4_EPOCH if creation else None
+            return None
+    return None
+
+
+def read_pdf_time(stream, size):
+    """Return the CreationDate of the PDF binary stream or None
+
+    The document information dictionary is looked for within the last and the first
+    META_READ_SIZE bytes where PDF writers put it. CreationDates within compressed object
+    streams are not found."""
 
-    elif withtime_and_seconds_components:
-        logging.debug("basename \"%s\" matches withtime-and-seconds pattern" % basename)
-        if options.withtime:
-            if not (withtime_and_seconds_components.group(1) == 'T' and withtime_and_seconds_components.group(3) == '.' and withtime_and_seconds_components.group(5) == '.'):
-                logging.debug("old time pattern does not match the ISO pattern for the delimiter characters. I will modify them.")
-                return basename[0:10] + 'T' + basename[11:13] + '.' + basename[14:16] + '.' + basename[17:]
-            else:
-                logging.debug("old pattern is the same as the recognised, basename stays the same")
-                return basename
+    try:
+        pattern = PDF_CREATION_DATE
+    except NameError:
+        pattern = get_pdf_creation_date()
+    for start in ((size - META_READ_SIZE, 0) if size > META_READ_SIZE else (0,)):
+        stream.seek(start)
+        match = pattern.search(stream.read(META_READ_SIZE))
+        if match:
+            fields = [int(field) for field in match.groups()[:6] if field is not None]
+            sign, hours, minutes = match.group(7, 8, 9)
+            offset = None
+            if sign:
+                offset = (int(hours or 0) * 60 + int(minutes or 0)) * (-1 if sign == b'-' else 1)
+            return to_timestamp(*fields, offset=offset)
+    return None
+
+
+def read_embedded_time(path):
+    """Return the capture or creation time embedded in the file at path in seconds since the epoch or None
+
+    The format is recognized by the content: JPEG and TIFF with EXIF, MP4 and QuickTime, and
+    PDF. Only the headers needed are read, never the whole file. Returns None for other formats
+    and files without or with damaged metadata."""
+
+    try:
+        with open(path, 'rb', buffering=0) as stream:
+            head = stream.read(16)
+            if head[:2] == b'\xff\xd8':
+                return read_jpeg_time(stream)
+            if head[:4] in (b'II*\x00', b'MM\x00*'):
+                return read_tiff_time(stream)
+            if head[4:8] in MP4_BOX_TYPES:
+                return read_mp4_time(stream, os.fstat(stream.fileno()).st_size)
+            if head[:5] == b'%PDF-':
+                return read_pdf_time(stream, os.fstat(stream.fileno()).st_size)
+    except OSError as error:
+        logging.debug("%s: no embedded time read: %s", path, error.strerror)
+    return None
+
+
+class StatSource(object):
+    """The times and types of items listed beforehand, taken instead of stat'ing the items
+
+    The listing holds one record per item, separated by NUL characters if there are any in it and
+    by newlines otherwise. A record holds the type of the item as printed by find with %Y or %y
+    (optional), the time in seconds since the epoch, and the path, separated by spaces, like
+    find DIR -printf '%Y %T@ %p\\0' writes them. The time is taken like the modification time, or
+    like the creation time with ctime. Relative paths are relative to the current directory. If a
+    path is listed more than once, its last record counts. Records of links and of items of an
+    unknown type are skipped, other records not understood are skipped with a warning.
+
+    Each path is kept as a 64 bit hash of its absolute path in a sorted array like the keys of
+    Index, with its time, its type, and the end of the absolute path within paths in arrays beside,
+    26 bytes per item besides the paths. The keys are never written, so they are the built-in
+    hash() of the path where that has 64 bits. find() compares the path of a matching key, so
+    colliding keys never give the time of another item."""
+
+    TYPES = {b'f': stat.S_IFREG, b'd': stat.S_IFDIR, b'p': stat.S_IFIFO, b's': stat.S_IFSOCK,
+             b'b': stat.S_IFBLK, b'c': stat.S_IFCHR}
+    SKIPPED_TYPES = frozenset((b'l', b'L', b'N', b'?', b'D', b'U'))
+    CHUNK_SIZE = 1 << 20
+
+    def __init__(self, path):
+        if sys.hash_info.width >= 64:
+            self.hash = hash
         else:
-            new_basename = get_converted_basename("withtime", basename)
-
-    elif withtime_no_seconds_components:
-        logging.debug("basename \"%s\" matches withtime-no-seconds pattern" % basename)
-        if options.withtime:
-            if not (withtime_no_seconds_components.group(1) == 'T' and withtime_and_seconds_components.group(3) == '.'):
-                logging.debug("old time pattern does not match the ISO pattern for the delimiter characters. I will modify them.")
-                return basename[0:10] + 'T' + basename[11:13] + '.' + basename[14:]
-            else:
-                logging.debug("old pattern is the same as the recognised, basename stays the same")
-                return basename
+            from hashlib import blake2b
+            self.hash = lambda path: int.from_bytes(blake2b(path, digest_size=8).digest(), 'little', signed=True)
+        self.encoding, self.errors = sys.getfilesystemencoding(), sys.getfilesystemencodeerrors()
+        self.cwd = os.fsencode(os.getcwd())
+        self.separator = os.fsencode(os.sep)
+        self.needs_normpath = re.compile(re.escape(self.separator) + rb'(?:\.|' + re.escape(self.separator) +
+                                         rb'|$)').search
+        keys, times, modes, paths, ends = array('q'), array('q'), array('H'), bytearray(), array('Q')
+        invalid = 0
+        with open(path, 'rb') as stream:
+            for record in self.read_records(stream):
+                field, space, rest = record.partition(b' ')
+                mode = self.TYPES.get(field, 0)
+                if mode:
+                    field, space, rest = rest.partition(b' ')
+                elif field in self.SKIPPED_TYPES:
+                    continue
+                try:
+                    nanoseconds = self.nanoseconds(field)
+                except ValueError:
+                    nanoseconds = None
+                if nanoseconds is None or not rest:
+                    if record.strip():
+                        invalid += 1
+                    continue
+                rest = self.normalize(rest)
+                keys.append(self.hash(rest))
+                times.append(nanoseconds)
+                modes.append(mode)
+                paths += rest
+                ends.append(len(paths))
+        if invalid:
+            logging.warning("WARNING: %s: skipped %i records which are not understood" % (path, invalid))
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        order = [position for index, position in enumerate(order)  # the last record of each key
+                 if index + 1 == len(order) or keys[order[index + 1]] != keys[position]]
+        starts = array('Q', [0]) + ends[:-1]
+        if len(order) < len(keys):  # paths listed again, or paths whose keys collide which are all kept
+            last = dict((bytes(paths[starts[position]:ends[position]]), position) for position in range(len(keys)))
+            order = sorted(last.values(), key=keys.__getitem__)
+        self.keys = array('q', (keys[position] for position in order))
+        self.times = array('q', (times[position] for position in order))
+        self.modes = array('H', (modes[position] for position in order))
+        self.paths = b''.join(paths[starts[position]:ends[position]] for position in order)
+        self.ends = array('Q', itertools.accumulate(ends[position] - starts[position] for position in order))
+        logging.debug("stat source: %i items listed in %s", len(self.keys), path)
+
+    def read_records(self, stream):
+        """Yield the records of the binary stream, read chunk by chunk"""
+        data = stream.read(self.CHUNK_SIZE)
+        separator = b'\0' if b'\0' in data else b'\n'
+        remainder = b''
+        while data:
+            records = (remainder + data).split(separator)
+            remainder = records.pop()
+            yield from records
+            data = stream.read(self.CHUNK_SIZE)
+        if remainder:
+            yield remainder
+
+    @staticmethod
+    def nanoseconds(field):
+        """Return the nanoseconds of the decimal seconds in the bytes field; raises ValueError if it is none"""
+        whole, point, fraction = field.partition(b'.')
+        if not whole:
+            raise ValueError(field)
+        return int(whole + fraction[:9].ljust(9, b'0'))
+
+    def normalize(self, path):
+        """Return the absolute, normalized path of path given as bytes"""
+        if not path.startswith(self.separator):
+            path = os.path.join(self.cwd, path)
+        if self.needs_normpath(path):
+            path = os.path.normpath(path)
+        return path
+
+    def find(self, path):
+        """Return the position of path in the arrays or None if it is not listed"""
+        path = self.normalize(path.encode(self.encoding, self.errors))  # like os.fsencode() but faster
+        key = self.hash(path)
+        keys, ends = self.keys, self.ends
+        position = bisect_left(keys, key)
+        while position < len(keys) and keys[position] == key:
+            if self.paths[ends[position - 1] if position else 0:ends[position]] == path:
+                return position
+            position += 1
+        return None
+
+    def __contains__(self, path):
+        return self.find(path) is not None
+
+    def __len__(self):
+        return len(self.keys)
+
+    def stat_result(self, position, mode):
+        """Return an os.stat_result of the type mode with the time of the record at position"""
+        nanoseconds = self.times[position]
+        seconds = nanoseconds // 1000000000
+        times = {'st_mtime': nanoseconds / 1e9, 'st_ctime': nanoseconds / 1e9,
+                 'st_mtime_ns': nanoseconds, 'st_ctime_ns': nanoseconds}
+        if hasattr(os.stat_result, 'st_birthtime'):
+            times['st_birthtime'] = nanoseconds / 1e9
+        return os.stat_result((mode, 0, 0, 0, 0, 0, 0, seconds, seconds, seconds), times)
+
+
+@lru_cache(maxsize=1)
+def load_stat_source(path, mtime_ns):
+    """Return the StatSource of the listing at path, loaded again only if its modification time mtime_ns changed"""
+    return StatSource(path)
+
+
+def stat_item(item, config, dir_fd=None, mode=0):
+    """Return the os.stat_result of item, taken from the StatSource of config if it lists item
+
+    item is a path or an os.DirEntry whose cached information is used. Items which are not listed
+    are stat'ed, relative to dir_fd if it is an open descriptor of the directory of the path item.
+    The type of listed items without one is taken from mode if given (stat.S_IFDIR or
+    stat.S_IFREG), from their DirEntry, or else by stat'ing them."""
+
+    source = config.renamer.stat_source
+    position = None
+    if source is not None:
+        position = source.find(item.path if isinstance(item, os.DirEntry) else item)
+    if position is None:
+        if isinstance(item, os.DirEntry):
+            return item.stat()
+        return os.stat(item if dir_fd is None else os.path.basename(item), dir_fd=dir_fd)
+    mode = source.modes[position] or mode
+    if not mode:
+        if isinstance(item, os.DirEntry):
+            mode = stat.S_IFDIR if item.is_dir() else stat.S_IFREG
         else:
-            new_basename = get_converted_basename("withtime", basename)
+            mode = os.stat(item if dir_fd is None else os.path.basename(item), dir_fd=dir_fd).st_mode
+    return source.stat_result(position, mode)
 
-    elif REGEX_PATTERNS['STANDARD'].match(basename):
-        logging.debug("basename \"%s\" matches standard-pattern" % basename)
-        if not options.withtime and not options.compact and not options.month:
-            logging.debug("old pattern is the same as the recognised, basename stays the same")
-            return basename
-        else:
-            new_basename = get_converted_basename("standard", basename)
 
-    elif REGEX_PATTERNS['COMPACT'].match(basename):
-        logging.debug("basename \"%s\" matches compact-pattern" % basename)
-        if options.compact:
-            logging.debug("old pattern is the same as the recognised, basename stays the same")
-            return basename
-        else:
-            new_basename = get_converted_basename("compact", basename)
+def get_timestamp_from_file(formatstring, path, config, stat_result=None):
+    """read out ctime or mtime of file (or the time embedded in it with config.meta) and return new itemname"""
 
-    elif REGEX_PATTERNS['SHORT'].match(basename):
-        logging.debug("basename \"%s\" matches short-pattern" % basename)
-        if options.compact:
-            logging.debug("old pattern is the same as the recognised, basename stays the same")
-            return basename
+    item = os.path.basename(path)
+    stats = STATS
+    if stats is not None:
+        start = time.perf_counter()
+
+    if stat_result is None or isinstance(stat_result, os.DirEntry):
+        stat_result = stat_item(path if stat_result is None else stat_result, config)
+
+    timestamp = None
+    if config.renamer.meta and stat.S_ISREG(stat_result.st_mode):
+        timestamp = read_embedded_time(path)
+        if timestamp is None:
+            logging.debug("%s: no embedded time found, taking the time of the file", item)
+
+    if stats is None:
+        return config.renamer.stamp(formatstring, item, stat_result, timestamp)
+    stats.add('stat', start)
+    start = time.perf_counter()
+    new_basename = config.renamer.stamp(formatstring, item, stat_result, timestamp)
+    stats.add('format', start)
+    return new_basename
+
+
+def generate_new_basename(formatstring, path, config, stat_result=None):
+    """generates the new itemname; considering config.nocorrections"""
+
+    basename = os.path.basename(path)
+    stats = STATS
+    if config.nocorrections:
+        datestamp = None
+    elif stats is None:
+        datestamp = config.renamer.classify(basename)
+    else:
+        start = time.perf_counter()
+        datestamp = config.renamer.classify(basename)
+        stats.classified(datestamp, start)
+    debug = logging.root.isEnabledFor(logging.DEBUG)
+
+    if datestamp is None or datestamp.kind == 'NODATESTAMP':
+        if debug and datestamp is None and not config.nocorrections:
+            logging.debug("basename \"%s\" does not match any known datestamp-pattern", basename)
+        elif debug:
+            logging.debug("basename \"%s\" matches nodatestamp-pattern or option nocorrections " +
+                          "is set: skipping further pattern matching", basename)
+        new_basename = get_timestamp_from_file(formatstring, path, config, stat_result)
+
+    elif config.withtime and datestamp.kind in ('WITHTIME_AND_SECONDS', 'WITHTIME_NO_SECONDS'):
+        if debug:
+            logging.debug("basename \"%s\" matches %s pattern", basename, datestamp.kind)
+        iso_separators = ('T', '.', '.') if datestamp.second is not None else ('T', '.')
+        if datestamp.separators != iso_separators:
+            if debug:
+                logging.debug("old time pattern does not match the ISO pattern for the delimiter characters. "
+                              "I will modify them.")
+            new_basename = datestamp.year + '-' + datestamp.month + '-' + datestamp.day + 'T' + \
+                datestamp.hour + '.' + datestamp.minute
+            if datestamp.second is not None:
+                new_basename += '.' + datestamp.second
+            return new_basename + basename[datestamp.end:]
         else:
-            new_basename = get_converted_basename("compact", basename)
+            if debug:
+                logging.debug("old pattern is the same as the recognised, basename stays the same")
+            return basename
 
-    elif REGEX_PATTERNS['MONTH'].match(basename):
-        logging.debug("basename \"%s\" matches month-pattern" % basename)
-        if options.month:
+    elif datestamp.kind in config.renamer.unchanged_kinds:
+        if debug:
+            logging.debug("basename \"%s\" matches %s pattern", basename, datestamp.kind)
             logging.debug("old pattern is the same as the recognised, basename stays the same")
-            return basename
-        else:
-            new_basename = get_converted_basename("month", basename)
+        return basename
 
     else:
-        logging.debug("basename \"%s\" does not match any known datestamp-pattern" % basename)
-        new_basename = get_timestamp_from_file(formatstring, basename)
+        if debug:
+            logging.debug("basename \"%s\" matches %s pattern", basename, datestamp.kind)
+        if stats is not None:
+            start = time.perf_counter()
+        new_basename = get_converted_basename(datestamp, basename, config)
+        if stats is not None:
+            stats.add('format', start)
 
-    logging.debug("new basename is \"%s\"" % new_basename)
+    if debug:
+        logging.debug("new basename is \"%s\"", new_basename)
 
     return new_basename
 
@@ -279,124 +1449,1838 @@ def get_full_name(path, filename):
 
 
 def remove_timestamp_from_basename(basename, list_of_regular_expressions=None):
-    """Identify timestamp by a given list of regular expressions. Then remove the timestamp from basename."""
-    if not list_of_regular_expressions or not isinstance(list_of_regular_expressions, list):
-        list_of_regular_expressions = [REGEX_PATTERNS[_] for _ in REGEX_PATTERNS]
+    """Identify timestamp by a given list of regular expressions. Then remove the timestamp from basename.
+
+    Without a list of regular expressions, the datestamp found by classify_basename() is removed."""
+    if list_of_regular_expressions and isinstance(list_of_regular_expressions, list):
+        for regular_expression in list_of_regular_expressions:
+            if regular_expression.match(basename):
+                basename = regular_expression.sub(repl='', string=basename, count=1).strip()
+        return basename
+
+    datestamp = classify_basename(basename)
+    if datestamp is None or datestamp.kind == 'NODATESTAMP':
+        return basename
+    return basename[datestamp.length:].strip()
+
+
+def compute_new_name(path, config, stat_result=None):
+    """Return the new basename of the file or directory at path according to config.
+
+    Returns None if the item is skipped because of config.onlyfiles or config.onlydirectories.
+    Pass the stat_result of path if it is at hand already: path does not get stat'ed again then.
+    stat_result may also be the os.DirEntry of path whose cached information is used then."""
+
+    basename = os.path.basename(path)
+    debug = logging.root.isEnabledFor(logging.DEBUG)
+
+    if config.remove:
+        if debug:
+            logging.debug("removing timestamp from base \"%s\"", basename)
+        stats = STATS
+        classify = config.renamer.classify
+        if stats is None:
+            if classify is classify_basename:
+                return remove_timestamp_from_basename(basename)
+            datestamp = classify(basename)
+        else:
+            start = time.perf_counter()
+            datestamp = classify(basename)  # like remove_timestamp_from_basename() but counted
+            stats.classified(datestamp, start)
+        if datestamp is None or datestamp.kind == 'NODATESTAMP':
+            return basename
+        return basename[datestamp.length:].strip()
 
-    for regular_expression in list_of_regular_expressions:
-        if regular_expression.match(basename):
-            basename = regular_expression.sub(repl='', string=basename, count=1).strip()
+    if debug:
+        logging.debug("••••••••••••••••········· adding timestamp to base \"%s\"", basename)
 
-    return basename
+    if config.onlyfiles or config.onlydirectories:
+        if stat_result is None:
+            stat_result = stat_item(path, config)
+        if isinstance(stat_result, os.DirEntry):
+            is_directory, is_file = stat_result.is_dir(), stat_result.is_file()
+        else:
+            is_directory, is_file = stat.S_ISDIR(stat_result.st_mode), stat.S_ISREG(stat_result.st_mode)
+
+        if config.onlyfiles and is_directory:
+            logging.debug("skipping directory \"%s\" because of command line option \"-f\"", basename)
+            if STATS is not None:
+                STATS.count('skipped')
+            return None
+
+        if config.onlydirectories and is_file:
+            logging.debug("skipping file \"%s\" because of command line option \"-d\"", basename)
+            if STATS is not None:
+                STATS.count('skipped')
+            return None
+
+    return generate_new_basename(config.renamer.formatstring, path, config, stat_result)
+
+
+class DirectoryHandles(object):
+    """Open file descriptors of the directories containing the items to rename.
+
+    Every directory is opened once and its descriptor is reused for all of its items while it is
+    among the MAX_OPEN most recently used ones. Where os.rename() and os.stat() do not support
+    dir_fd (Windows), get() returns None and callers have to use paths instead. Use it as a
+    context manager to close the descriptors."""
+
+    MAX_OPEN = 64
+
+    def __init__(self):
+        self.handles = OrderedDict()
+
+    def get(self, path):
+        """return the descriptor of directory path ("" is the current directory) or None"""
+        if not USE_DIR_FD:
+            return None
+        path = os.path.normpath(path or os.curdir)  # one descriptor for "./a", "a", and "a/"
+        handle = self.handles.get(path)
+        if handle is not None:
+            self.handles.move_to_end(path)
+            return handle
+        handle = os.open(path, os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0))
+        self.handles[path] = handle
+        if len(self.handles) > self.MAX_OPEN:
+            os.close(self.handles.popitem(last=False)[1])
+        return handle
+
+    def forget(self, path):
+        """close the descriptors of directory path and everything below since it got renamed"""
+        path = os.path.normpath(path)
+        prefix = os.path.join(path, '')
+        for key in [key for key in self.handles if key == path or key.startswith(prefix)]:
+            os.close(self.handles.pop(key))
+
+    def close(self):
+        while self.handles:
+            os.close(self.handles.popitem()[1])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def report_name_too_long(new_basename):
+    """log the error about a new name longer than MAX_PATHLENGTH"""
+    logging.error("ERROR: the current file needs to be renamed with a file name length of " +
+                  "%i which is greater than %i. " % (len(new_basename), MAX_PATHLENGTH) +
+                  "This usually causes \"[Errno 36] File name too long\" and therefore " +
+                  "I ignore this file for now. Please shorten file name for at " +
+                  "least %i characters and try again." % (len(new_basename)-MAX_PATHLENGTH))
+
+
+def is_collision_suffix(suffix):
+    """return whether suffix holds one %i (or %d) for a number and makes a valid part of a name"""
+    try:
+        return suffix % 2 != suffix % 3 and os.sep not in suffix % 2 and '\0' not in suffix
+    except (TypeError, ValueError):
+        return False
+
+
+def add_collision_suffix(new_basename, suffix, number):
+    """return new_basename with suffix % number inserted before its extension"""
+    root, extension = os.path.splitext(new_basename)
+    return root + suffix % number + extension
+
+
+def get_renameat2():
+    """Return renameat2() of the C library through ctypes, loaded on first use; False if it is not available"""
+    global RENAMEAT2
+    if RENAMEAT2 is None:
+        RENAMEAT2 = False
+        if sys.platform.startswith('linux'):
+            import ctypes
+            function = getattr(ctypes.CDLL(None, use_errno=True), 'renameat2', None)  # glibc 2.28 and later
+            if function is not None:
+                function.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+                RENAMEAT2 = function
+    return RENAMEAT2
+
+
+def rename_noclobber(source, target, dir_fd=None):
+    """Rename source to target like os.rename() but raise FileExistsError instead of replacing target
+
+    Uses renameat2() with RENAME_NOREPLACE on Linux. Where it is not available or the file system
+    does not support it, a file is hard linked to target, which fails if target exists, and
+    source is unlinked afterwards. Directories, which can not be hard linked, and items on file
+    systems without hard links are renamed only if target does not exist right before, which is
+    not atomic. With dir_fd, source and target are relative to the directory it is open on."""
+
+    renameat2 = get_renameat2()
+    if renameat2:
+        descriptor = AT_FDCWD if dir_fd is None else dir_fd
+        if renameat2(descriptor, os.fsencode(source), descriptor, os.fsencode(target), RENAME_NOREPLACE) == 0:
+            return
+        import ctypes
+        error = ctypes.get_errno()
+        if error not in (errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP):
+            raise OSError(error, os.strerror(error), source, None, target)
+    try:
+        os.link(source, target, src_dir_fd=dir_fd, dst_dir_fd=dir_fd, follow_symlinks=False)
+    except FileExistsError:
+        raise
+    except OSError:
+        try:
+            os.lstat(target, dir_fd=dir_fd)
+        except FileNotFoundError:
+            os.rename(source, target, src_dir_fd=dir_fd, dst_dir_fd=dir_fd)
+            return
+        raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), target)
+    try:
+        os.unlink(source, dir_fd=dir_fd)
+    except OSError:
+        os.unlink(target, dir_fd=dir_fd)
+        raise
+
+
+def claim_new_basename(claimed, path, basename, new_basename, config):
+    """Return the name an item of directory path gets instead of new_basename which no earlier item claimed
+
+    claimed maps the directories to the sets of names which the items handled so far are renamed
+    to or keep; the name returned is added. This detects the collisions within a run before
+    anything is renamed, for config.noclobber. A taken name is replaced by the first free one
+    with config.collision_suffix. Without, None is returned after logging an error."""
+
+    names = claimed.setdefault(os.path.abspath(path), set())
+    candidate = new_basename
+    number = 1
+    while candidate in names and candidate != basename:
+        if not config.collision_suffix:
+            logging.error("ERROR: %s: is the new name of another item already, skipping \"%s\"" % (
+                os.path.join(path, candidate), os.path.join(path, basename)))
+            return None
+        number += 1
+        candidate = add_collision_suffix(new_basename, config.collision_suffix, number)
+    names.add(candidate)
+    return candidate
+
+
+def place_new_basename(path, basename, new_basename, config, dir_fd=None):
+    """Rename an item to new_basename by rename_noclobber() and return the name it got, for config.noclobber
+
+    If an item with the name exists, the first free name with config.collision_suffix is taken.
+    Without, None is returned after logging an error. In dryrun mode, nothing gets renamed but
+    the names are checked. A name longer than MAX_PATHLENGTH is returned without renaming."""
+
+    candidate = new_basename
+    number = 1
+    while True:
+        if len(candidate) > MAX_PATHLENGTH and not config.dryrun:
+            return candidate
+        try:
+            if config.dryrun:
+                if exists_in(path, candidate, dir_fd):
+                    raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), candidate)
+            elif dir_fd is not None:
+                rename_noclobber(basename, candidate, dir_fd)
+            else:
+                rename_noclobber(os.path.join(path, basename), os.path.join(path, candidate))
+            return candidate
+        except FileExistsError:
+            if not config.collision_suffix:
+                logging.error("ERROR: %s: exists already, skipping \"%s\"" % (os.path.join(path, candidate),
+                                                                             os.path.join(path, basename)))
+                return None
+            number += 1
+            candidate = add_collision_suffix(new_basename, config.collision_suffix, number)
+
+
+def apply_new_basename(path, basename, new_basename, config, dir_fd=None, journal=None):
+    """Report the new basename of an item and rename it unless in dryrun mode
+
+    With dir_fd, an open descriptor of the directory path, the item is renamed relative to it.
+    A performed rename is recorded to journal unless it is None. With config.noclobber, the
+    item is renamed by place_new_basename(). Returns the new basename or None if the item got
+    skipped because its new name is taken."""
+
+    stats = STATS
+    if stats is not None:
+        start = time.perf_counter()
+    renamed = False
+    if config.noclobber and basename != new_basename:
+        new_basename = place_new_basename(path, basename, new_basename, config, dir_fd)
+        if new_basename is None:
+            return None
+        renamed = not config.dryrun and len(new_basename) <= MAX_PATHLENGTH
+
+    debug = logging.root.isEnabledFor(logging.DEBUG)
+    if debug:
+        logging.debug("new itemname for \"%s\" will be \"%s\"", basename, new_basename)
+
+    item = {'item': os.path.join(path, basename), 'new_basename': new_basename}
+    if config.dryrun:
+        if basename == new_basename:
+            logging.info("%s … no modification", basename, extra=item)
+        else:
+            logging.info("%-40s  →  %s", get_full_name(path, basename), new_basename, extra=item)
+    else:
+        if basename == new_basename:
+            logging.info("\"%s\" … no modification", get_full_name(path, basename), extra=item)
+        else:
+            if debug:
+                logging.debug("\"%s\" → \"%s\"", get_full_name(path, basename), new_basename)
+            logging.info("%-40s  →  %s", get_full_name(path, basename), new_basename, extra=item)
+            if len(new_basename) > MAX_PATHLENGTH:
+                report_name_too_long(new_basename)
+                raise OSError(errno.ENAMETOOLONG, os.strerror(errno.ENAMETOOLONG), new_basename)
+            elif renamed:
+                pass
+            elif dir_fd is not None:
+                os.rename(basename, new_basename, src_dir_fd=dir_fd, dst_dir_fd=dir_fd)
+            else:
+                os.rename(os.path.join(path, basename), os.path.join(path, new_basename))
+            if journal is not None:
+                journal.record(path, basename, new_basename)
+    if stats is not None:
+        stats.count('unchanged' if basename == new_basename else 'renamed')
+        stats.add('rename', start)
+    return new_basename
 
 
-def handle_item(path, basename, formatstring):
-    """Handle timestamp adding or removing with directories or files"""
+def rename_if_present(path, basename, new_basename, config, dir_fd=None, journal=None):
+    """Like apply_new_basename() but log an item which vanished in the meantime and return None
 
-    if options.remove:
-        logging.debug("removing timestamp from base \"%s\"" % basename)
-        new_basename = remove_timestamp_from_basename(basename)
-    else:
-        logging.debug("••••••••••••••••········· adding timestamp to base \"%s\"" % basename)
+    Items get stat'ed long before they are renamed, or not at all if they are listed in a
+    StatSource."""
 
-        if options.onlyfiles and os.path.isdir(basename):
-            logging.debug("skipping directory \"%s\" because of command line option \"-f\"" % basename)
-            return
+    try:
+        return apply_new_basename(path, basename, new_basename, config, dir_fd, journal)
+    except FileNotFoundError:
+        logging.critical("%s: is no file or directory (broken link?)" % os.path.join(path, basename))
+        return None
+
+
+def handle_item(path, basename, config, stat_result=None, dir_fd=None, journal=None, index=None, claimed=None):
+    """Handle timestamp adding or removing with directories or files
+
+    With dir_fd, an open descriptor of the directory path, the item is renamed relative to it.
+    The rename is recorded to journal unless it is None. Items known to index are skipped, the
+    others are added to it unless in dryrun mode. With claimed, the new name is checked by
+    claim_new_basename() first. Returns the new basename or None if the item got skipped."""
+
+    if index is not None:
+        if stat_result is None or isinstance(stat_result, os.DirEntry):
+            stat_result = stat_item(os.path.join(path, basename) if stat_result is None else stat_result, config,
+                                    dir_fd)
+        if index.known(basename, stat_result, path):
+            return None
+    new_basename = compute_new_name(os.path.join(path, basename), config, stat_result)
+    if new_basename is not None:
+        if claimed is not None:
+            new_basename = claim_new_basename(claimed, path, basename, new_basename, config)
+            if new_basename is None:
+                return None
+        new_basename = rename_if_present(path, basename, new_basename, config, dir_fd, journal)
+        if new_basename is None:
+            return None
+    if index is not None and not config.dryrun:
+        index.add(new_basename or basename, stat_result, path)
+    return new_basename
 
-        if options.onlydirectories and os.path.isfile(basename):
-            logging.debug("skipping file \"%s\" because of command line option \"-d\"" % basename)
-            return
 
-        new_basename = generate_new_basename(formatstring, basename)
+def list_directory(path):
+    """Return the os.DirEntry objects of path sorted by name; an empty list if it can not be read"""
+
+    stats = STATS
+    if stats is not None:
+        start = time.perf_counter()
+    try:
+        with os.scandir(path) as entries:
+            entries = sorted(entries, key=lambda entry: entry.name)
+        if stats is not None:
+            stats.add('discover', start, len(entries))
+        return entries
+    except OSError as error:
+        logging.error("%s: can not read directory: %s" % (path, error.strerror))
+        return []
+
+
+def scan_tree(top, stat_directories=False, stat_source=None):
+    """Yield the os.DirEntry of everything below the directory top, bottom-up.
+
+    The content of a directory is yielded before the directory itself so that renaming a
+    directory never invalidates entries still to come. Each directory is read completely before
+    any of its entries is yielded. Symbolic links to directories are not followed.
+    With stat_directories, the stat information of directories is cached in their DirEntry
+    before their content is read: renaming their content changes their modification time. This is
+    not needed for the directories listed in the StatSource stat_source."""
+
+    stack = [(None, iter(list_directory(top)))]
+    while stack:
+        directory, entries = stack[-1]
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if stat_directories and (stat_source is None or entry.path not in stat_source):
+                    try:
+                        entry.stat()
+                    except OSError:
+                        pass
+                stack.append((entry, iter(list_directory(entry.path))))
+                break
+            yield entry
+        else:
+            stack.pop()
+            if directory is not None:
+                yield directory
 
-    logging.debug("new itemname for \"%s\" will be \"%s\"" % (basename, new_basename))
 
-    if options.dryrun:
-        if basename == new_basename:
-            logging.info("%s … no modification" % basename)
+def rename_many(paths, config, journal=None, index=None):
+    """Add or remove the datestamps of all files and directories in paths according to config.
+
+    With config.recursive, everything within the directories in paths is handled as well, bottom-up.
+    With config.jobs greater than one or config.batch, the work is done by rename_parallel(), with
+    config.pipeline greater than zero by rename_pipelined().
+    Returns a list of (path, new_path) tuples of the items whose name changed (or would have
+    changed in dryrun mode). Performed renames are recorded to journal unless it is None. Items
+    which did not change since they were added to index are skipped, see Index. Raises OSError
+    with errno.ENAMETOOLONG before renaming an item to a name longer than MAX_PATHLENGTH."""
+
+    return list(iter_renames(paths, config, journal, index))
+
+
+def iter_renames(paths, config, journal=None, index=None):
+    """Like rename_many() but yield the (path, new_path) tuples one by one.
+
+    paths may be any iterable; it is consumed lazily so that an unbounded stream of paths is
+    handled in constant memory, except with config.jobs greater than one or config.batch which
+    need all items for their planning. With config.pipeline, the renames are yielded once all
+    items are done."""
+
+    if config.jobs > 1 or config.batch:
+        yield from rename_parallel(paths, config, journal, index)
+        return
+    if config.pipeline:
+        yield from rename_pipelined(paths, config, journal, index)
+        return
+
+    claimed = {} if config.noclobber else None
+    with DirectoryHandles() as handles:
+        for item in paths:
+            item = item.rstrip(os.sep + (os.altsep or '')) or item
+            path = os.path.dirname(item)
+            basename = os.path.basename(item)
+            if STATS is not None:
+                start = time.perf_counter()
+            try:
+                dir_fd = handles.get(path)
+                stat_result = stat_item(item, config, dir_fd)
+            except OSError:
+                stat_result = None
+            if STATS is not None:
+                STATS.add('stat', start)
+            if stat_result is None or not (stat.S_ISDIR(stat_result.st_mode) or stat.S_ISREG(stat_result.st_mode)):
+                logging.critical("%s: is no file or directory (broken link?)" % item)
+                continue
+
+            if config.recursive and stat.S_ISDIR(stat_result.st_mode):
+                for entry in scan_tree(item, stat_directories=not config.remove,
+                                       stat_source=config.renamer.stat_source):
+                    if not (entry.is_dir() or entry.is_file()):
+                        logging.critical("%s: is no file or directory (broken link?)" % entry.path)
+                        continue
+                    if logging.root.isEnabledFor(logging.DEBUG):
+                        logging.debug("handling item: %s  <-----------------", entry.path)
+                    entry_path = os.path.dirname(entry.path)
+                    new_basename = handle_item(entry_path, entry.name, config, entry, handles.get(entry_path),
+                                               journal, index, claimed)
+                    if new_basename is not None and new_basename != entry.name:
+                        yield entry.path, os.path.join(entry_path, new_basename)
+                        if entry.is_dir():
+                            handles.forget(entry.path)
+                dir_fd = handles.get(path)  # the descriptor may have been closed in the meantime
+
+            if logging.root.isEnabledFor(logging.DEBUG):
+                logging.debug("handling item: %s  <-----------------", item)
+                logging.debug("has directory: %s", path)
+                logging.debug("has basename:  %s", basename)
+
+            new_basename = handle_item(path, basename, config, stat_result, dir_fd, journal, index, claimed)
+            if new_basename is not None and new_basename != basename:
+                yield item, os.path.join(path, new_basename)
+                if stat.S_ISDIR(stat_result.st_mode):
+                    handles.forget(item)
+
+
+class ShardLogFilter(logging.Filter):
+    """Hold back the log records of the worker threads of rename_parallel()
+
+    A worker collects the records of its directory in local.records; the main thread emits them
+    once the directory is done so that the output of a directory is not interleaved with others."""
+
+    def __init__(self):
+        logging.Filter.__init__(self)
+        self.local = threading.local()
+
+    def filter(self, record):
+        records = getattr(self.local, 'records', None)
+        if records is None:
+            return True
+        records.append(record)
+        return False
+
+
+class PlanStore(object):
+    """Compact store of renames planned or done, for runs over millions of items
+
+    Every entry takes 28 bytes in four array columns (the number of its directory, the offsets
+    of its old and new basename, and its position in the input) plus its basenames, which are
+    kept encoded in one shared buffer, the new one right after the old one. Directories are
+    interned into a table. Entries are added as (position, path, basename, new_basename) by any
+    number of threads and read back as (path, basename, new_basename) tuples in the order they
+    were added by iterating the store, or in the order of their position by ordered()."""
+
+    def __init__(self):
+        self.directories = []           # the path of each directory number
+        self.numbers = {}               # path → directory number
+        self.directory = array('I')
+        self.old = array('Q')           # offset of the old basename in names
+        self.new = array('Q')           # offset of the new basename in names
+        self.positions = array('Q')
+        self.names = bytearray()
+        self.lock = threading.Lock()
+        self.encoding, self.errors = sys.getfilesystemencoding(), sys.getfilesystemencodeerrors()
+
+    def add(self, position, path, basename, new_basename):
+        old, new = basename.encode(self.encoding, self.errors), new_basename.encode(self.encoding, self.errors)
+        with self.lock:
+            number = self.numbers.get(path)
+            if number is None:
+                number = self.numbers[path] = len(self.directories)
+                self.directories.append(path)
+            self.directory.append(number)
+            self.positions.append(position)
+            self.old.append(len(self.names))
+            self.names += old
+            self.new.append(len(self.names))
+            self.names += new
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __getitem__(self, index):
+        end = self.old[index + 1] if index + 1 < len(self.old) else len(self.names)
+        return (self.directories[self.directory[index]],
+                self.names[self.old[index]:self.new[index]].decode(self.encoding, self.errors),
+                self.names[self.new[index]:end].decode(self.encoding, self.errors))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def ordered(self):
+        """Yield the entries in the order of their position
+
+        The entries are taken from the runs of ascending positions within one directory they were
+        added in, like the items of each directory by rename_parallel(), so this takes memory for
+        the runs only. Runs which do not overlap are yielded one after the other, others are merged."""
+
+        positions, directory = self.positions, self.directory
+        if not positions:
+            return
+        starts = [0] + [index for index in range(1, len(positions))
+                        if positions[index] < positions[index - 1] or directory[index] != directory[index - 1]]
+        runs = sorted(zip(starts, starts[1:] + [len(positions)]), key=lambda run: positions[run[0]])
+        if all(positions[run[1] - 1] < positions[following[0]] for run, following in zip(runs, runs[1:])):
+            for start, end in runs:
+                for index in range(start, end):
+                    yield self[index]
+            return
+        import heapq
+        for position, index in heapq.merge(*(zip(itertools.islice(positions, start, end), range(start, end))
+                                             for start, end in runs)):
+            yield self[index]
+
+
+class Shard(object):
+    """The items of one directory handled by one worker of rename_parallel()
+
+    The items are queued in columns like the entries of a PlanStore: their positions in the input,
+    their types, and the ends of their basenames, which are kept encoded in one buffer. Every
+    item takes 13 bytes plus its basename; the stat_result of an item is kept only if it had to
+    be taken beforehand (the items given in recursive mode and directories before their content
+    changes them). Items are added with their position, basename, stat_result or None, and mode
+    (stat.S_IFDIR or stat.S_IFREG if known from their DirEntry, else 0) and read back as
+    (position, basename, stat_result, mode) tuples in the order they were added by iterating the
+    Shard."""
+
+    __slots__ = ('key', 'path', 'positions', 'modes', 'ends', 'names', 'stats', 'parent', 'pending', 'done',
+                 'records', 'too_long')
+
+    MODES = (0, stat.S_IFREG, stat.S_IFDIR)
+    CODES = {0: 0, stat.S_IFREG: 1, stat.S_IFDIR: 2}
+    ENCODING, ERRORS = sys.getfilesystemencoding(), sys.getfilesystemencodeerrors()
+
+    def __init__(self, key, path):
+        self.key = key          # absolute path of the directory
+        self.path = path        # the directory as given on the command line
+        self.positions = array('Q')
+        self.modes = array('B')  # the index of the mode in MODES
+        self.ends = array('I')  # end of the encoded basename in names
+        self.names = bytearray()
+        self.stats = {}         # position → stat_result taken beforehand
+        self.parent = None      # the closest Shard of a directory above, renamed after this one
+        self.pending = 0        # number of Shards this one waits for
+        self.done = False
+        self.records = []       # held back log records
+        self.too_long = []      # (index, new basename) of names longer than MAX_PATHLENGTH
+
+    def add(self, position, basename, stat_result=None, mode=0):
+        if stat_result is not None:
+            self.stats[position] = stat_result
+        self.positions.append(position)
+        self.modes.append(self.CODES[mode])
+        self.names += basename.encode(self.ENCODING, self.ERRORS)
+        self.ends.append(len(self.names))
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __iter__(self):
+        start, names, stats, modes = 0, self.names, self.stats, self.MODES
+        for position, mode, end in zip(self.positions, self.modes, self.ends):
+            yield (position, names[start:end].decode(self.ENCODING, self.ERRORS), stats.get(position),
+                   modes[mode])
+            start = end
+
+
+def plan_batch(path, planned, kept, config):
+    """Plan the renames of the items of directory path for config.batch, independent of their order
+
+    planned holds (position, basename, new_basename, stat_result) tuples of the items of the
+    directory, kept the names of the other items within it, which stay. Items which would get
+    the same new name, or the name of an item which stays, are skipped with an error; they stay
+    as well, so items which would get their names are skipped in turn. With
+    config.collision_suffix, they get the first free name with the suffix and a number instead,
+    in the order of their names. The other renames are ordered so that no item is renamed before
+    the item with its new name got renamed: chains of renames (a → b, b → c) from their end and
+    cycles (a → b, b → a) by way of a temporary name.
+
+    Returns the steps to take as (position, basename, source, target, stat_result) tuples, the
+    items which keep their name first: rename source to target where basename is the name of
+    the item before. A rename to a temporary name has None as position."""
+
+    taken = set(kept)
+    targets = {}
+    steps = []
+    for item in planned:
+        if item[2] == item[1]:
+            taken.add(item[1])
+            steps.append((item[0], item[1], item[1], item[1], item[3]))
         else:
-            logging.info("%-40s  →  %s" % (get_full_name(path, basename), new_basename))
-    else:
-        if basename == new_basename:
-            logging.info("\"%s\" … no modification" % get_full_name(path, basename))
+            targets.setdefault(item[2], []).append(item)
+    names = taken.union(item[1] for item in planned).union(targets)  # no suffixed name may be one of them
+
+    blocked = not config.collision_suffix
+    while blocked:  # skipped items keep their names, which other items may not get in turn
+        blocked = [new_basename for new_basename, items in targets.items() if len(items) > 1 or new_basename in taken]
+        for new_basename in blocked:
+            for position, basename, candidate, stat_result in sorted(targets.pop(new_basename),
+                                                                     key=lambda item: item[1]):
+                logging.error("ERROR: %s: would be the name of more than one item, skipping \"%s\"" % (
+                    os.path.join(path, new_basename), os.path.join(path, basename)))
+                taken.add(basename)
+
+    renames = []
+    for new_basename, items in targets.items():
+        if len(items) == 1 and new_basename not in taken:
+            renames.append(items[0])
+            taken.add(new_basename)
+            continue
+        number = 1
+        for position, basename, candidate, stat_result in sorted(items, key=lambda item: item[1]):
+            while candidate in taken or (candidate != new_basename and candidate in names):
+                number += 1
+                candidate = add_collision_suffix(new_basename, config.collision_suffix, number)
+            taken.add(candidate)
+            renames.append((position, basename, candidate, stat_result))
+
+    renames.sort(key=lambda item: item[0])
+    by_basename = dict((item[1], item) for item in renames)
+    done = set()
+    for item in renames:
+        if item[1] in done:
+            continue
+        chain = [item]
+        done.add(item[1])
+        while chain[-1][2] in by_basename and chain[-1][2] not in done:
+            chain.append(by_basename[chain[-1][2]])
+            done.add(chain[-1][1])
+        if len(chain) > 1 and chain[-1][2] == chain[0][1]:
+            position, basename, new_basename, stat_result = chain[0]
+            temporary = TEMPORARY_PREFIX + '%i-%i' % (os.getpid(), position)
+            steps.append((None, basename, basename, temporary, stat_result))
+            steps.extend((item[0], item[1], item[1], item[2], item[3]) for item in reversed(chain[1:]))
+            steps.append((position, basename, temporary, new_basename, stat_result))
         else:
-            logging.debug("\"%s\" → \"%s\"" % (get_full_name(path, basename), new_basename))
-            logging.info("%-40s  →  %s" % (get_full_name(path, basename), new_basename))
-            if len(new_basename) > MAX_PATHLENGTH:
-                logging.error("ERROR: the current file needs to be renamed with a file name length of " +
-                              "%i which is greater than %i. " % (len(new_basename), MAX_PATHLENGTH) +
-                              "This usually causes \"[Errno 36] File name too long\" and therefore " +
-                              "I ignore this file for now. Please shorten file name for at " +
-                              "least %i characters and try again." % (len(new_basename)-MAX_PATHLENGTH))
-                sys.exit(1)
+            steps.extend((item[0], item[1], item[1], item[2], item[3]) for item in reversed(chain))
+    return steps
+
+
+def rename_shard(shard, config, log_filter, journal=None, index=None, renamed=None):
+    """Rename the items of one directory in their input order; run by the workers of rename_parallel()
+
+    All new names of the directory are computed before the first one is renamed. If one of them
+    is longer than MAX_PATHLENGTH, nothing within the directory gets renamed. With config.batch,
+    the renames are taken in the order of plan_batch() instead. Otherwise with config.noclobber,
+    the new names are checked by claim_new_basename() while they are computed. Items known to
+    index are skipped, the others are added to it unless in dryrun mode. The log records are
+    held back by log_filter unless it is None. The renames are added to the PlanStore renamed."""
+
+    if log_filter is not None:
+        log_filter.local.records = shard.records
+    dir_fd = None
+    try:
+        if USE_DIR_FD:
+            try:
+                dir_fd = os.open(shard.path or os.curdir, os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0))
+            except OSError:
+                for position, basename, stat_result, mode in shard:
+                    logging.critical("%s: is no file or directory (broken link?)" % os.path.join(shard.path, basename))
+                return
+        planned = []
+        indexed = []
+        claimed = {}
+        kept = []
+        for position, basename, stat_result, mode in shard:
+            item = os.path.join(shard.path, basename)
+            if stat_result is None and not (mode and config.remove and index is None):  # the type is enough
+                if STATS is not None:
+                    start = time.perf_counter()
+                try:
+                    stat_result = stat_item(item, config, dir_fd, mode)
+                except OSError:
+                    pass
+                if STATS is not None:
+                    STATS.add('stat', start)
+                if stat_result is None or not (stat.S_ISDIR(stat_result.st_mode) or
+                                               stat.S_ISREG(stat_result.st_mode)):
+                    logging.critical("%s: is no file or directory (broken link?)" % item)
+                    continue
+            if index is not None:
+                if index.known(basename, stat_result, shard.path):
+                    kept.append(basename)
+                    continue
+            logging.debug("handling item: %s  <-----------------", item)
+            new_basename = compute_new_name(item, config, stat_result)
+            if index is None:
+                stat_result = None  # not needed anymore; it takes about 600 bytes per item
+            if new_basename is None:
+                indexed.append((basename, stat_result))
+                kept.append(basename)
+            elif config.batch or not config.noclobber:
+                planned.append((position, basename, new_basename, stat_result))
             else:
-                os.rename(basename, new_basename)
+                new_basename = claim_new_basename(claimed, shard.path, basename, new_basename, config)
+                if new_basename is not None:
+                    planned.append((position, basename, new_basename, stat_result))
+
+        if not config.dryrun:
+            shard.too_long = [(position, new_basename) for position, basename, new_basename, stat_result in planned
+                              if len(new_basename) > MAX_PATHLENGTH]
+            for position, new_basename in shard.too_long:
+                report_name_too_long(new_basename)
+            if shard.too_long:
+                return
+
+        if config.batch:
+            steps = plan_batch(shard.path, planned, kept, config)
+        else:
+            steps = [(position, basename, basename, new_basename, stat_result)
+                     for position, basename, new_basename, stat_result in planned]
+        for position, basename, source, target, stat_result in steps:
+            new_basename = rename_if_present(shard.path, source, target, config, dir_fd, journal)
+            if new_basename is None:
+                continue
+            if new_basename != source:
+                # renames of config.batch are read back in the order they were done, not by position
+                renamed.add(0 if position is None else position, shard.path, source, new_basename)
+            if position is not None:
+                indexed.append((new_basename, stat_result))
+        if index is not None and not config.dryrun:
+            for basename, stat_result in indexed:
+                index.add(basename, stat_result, shard.path)
+    finally:
+        if dir_fd is not None:
+            os.close(dir_fd)
+        if log_filter is not None:
+            log_filter.local.records = None
+
+
+def collect_shards(paths, config):
+    """Group the items of paths (and their content in recursive mode) by directory
+
+    Returns the Shards in the order of their last item which is the content of a directory before
+    the directory in recursive mode. Each Shard is linked to the closest Shard of a directory above
+    it which has to wait for it."""
+
+    cwd = os.getcwd()
+    shards = {}
+    by_path = {}
+    order = []
+
+    def add(index, item, basename, stat_result, mode=0):
+        path = os.path.dirname(item)
+        shard = by_path.get(path)
+        if shard is None:
+            key = os.path.normpath(os.path.join(cwd, path))
+            shard = shards.get(key)
+            if shard is None:
+                shard = shards[key] = Shard(key, path)
+                order.append(shard)
+            by_path[path] = shard
+        shard.add(index, basename, stat_result, mode)
+
+    index = 0
+    for item in paths:
+        item = item.rstrip(os.sep + (os.altsep or '')) or item
+        stat_result = None
+        if config.recursive:
+            try:
+                stat_result = stat_item(item, config)
+            except OSError:
+                pass
+            if stat_result is not None and stat.S_ISDIR(stat_result.st_mode):
+                source = config.renamer.stat_source
+                for entry in scan_tree(item, stat_directories=not config.remove, stat_source=source):
+                    if entry.is_dir():
+                        entry_stat = None
+                        if not config.remove and (source is None or entry.path not in source):
+                            try:
+                                entry_stat = entry.stat()  # cached by scan_tree()
+                            except OSError:
+                                pass
+                        add(index, entry.path, entry.name, entry_stat, stat.S_IFDIR)
+                    elif entry.is_file():
+                        add(index, entry.path, entry.name, None, stat.S_IFREG)
+                    else:
+                        logging.critical("%s: is no file or directory (broken link?)" % entry.path)
+                        continue
+                    index += 1
+        add(index, item, os.path.basename(item), stat_result)
+        index += 1
+
+    for shard in order:
+        parent = shard.key
+        while True:
+            above = os.path.dirname(parent)
+            if above == parent:
+                break
+            parent = above
+            if parent in shards:
+                shard.parent = shards[parent]
+                shard.parent.pending += 1
+                break
+
+    order.sort(key=lambda shard: shard.positions[-1])
+    return order
+
+
+def rename_parallel(paths, config, journal=None, index=None):
+    """Like rename_many() but with config.jobs threads, each working on the items of one directory
+
+    The items within a directory are handled in their input order by one thread, so names
+    colliding within a directory are handled like in sequential mode; with config.batch, they
+    are handled in the order of plan_batch() instead, by config.jobs threads. A directory is
+    handled only after all directories below it are done since it may contain some of them.
+    The log output of each directory is emitted as one block in the order of the last item of
+    each directory; with a single thread, it is emitted right away instead. Names longer than
+    MAX_PATHLENGTH are detected before anything within their directory is renamed; after all
+    other directories are done, OSError with errno.ENAMETOOLONG is raised for the first of them
+    in input order. The renames are kept in a PlanStore until all directories are done and
+    returned as an iterator in input order; with config.batch, in the order they were done
+    instead, including the renames to and from temporary names, so that a plan of them can be
+    replayed."""
+
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+    shards = collect_shards(paths, config)
+    renamed = PlanStore()
+    root = logging.getLogger()
+    log_filter = ShardLogFilter() if config.jobs > 1 else None
+    if log_filter is not None:
+        root.addFilter(log_filter)
+    emitted = 0
+    try:
+        with ThreadPoolExecutor(max_workers=config.jobs) as executor:
+            running = dict((executor.submit(rename_shard, shard, config, log_filter, journal, index, renamed), shard)
+                           for shard in shards if not shard.pending)
+            while running:
+                done, not_done = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    shard = running.pop(future)
+                    future.result()
+                    shard.done = True
+                    if shard.parent is not None:
+                        shard.parent.pending -= 1
+                        if not shard.parent.pending:
+                            running[executor.submit(rename_shard, shard.parent, config, log_filter, journal,
+                                                    index, renamed)] = shard.parent
+                while emitted < len(shards) and shards[emitted].done:
+                    for record in shards[emitted].records:
+                        root.handle(record)
+                    shards[emitted].records = None
+                    emitted += 1
+    finally:
+        if log_filter is not None:
+            root.removeFilter(log_filter)
+
+    too_long = sorted(entry for shard in shards for entry in shard.too_long)
+    if too_long:
+        raise OSError(errno.ENAMETOOLONG, os.strerror(errno.ENAMETOOLONG), too_long[0][1])
+    return ((os.path.join(path, basename), os.path.join(path, new_basename))
+            for path, basename, new_basename in (renamed if config.batch else renamed.ordered()))
+
+
+def rename_pipelined(paths, config, journal=None, index=None):
+    """Like rename_many() but with an asynchronous pipeline of up to config.pipeline items in flight
+
+    Meant for file systems with a high latency like network shares where sequential mode mostly
+    waits for the round trips of stat'ing and renaming one item after the other. The items are
+    discovered by a thread of its own, stat'ed and renamed by config.pipeline threads, and their
+    new names are computed by an asyncio event loop in between. Discovery pauses while
+    config.pipeline items are not renamed yet. Renames are started in input order; a rename waits
+    for the renames in flight which involve one of its names and a directory for the renames
+    within it, so that the result is the same as in sequential mode. The log output of the items
+    in flight may be interleaved. Raises OSError with errno.ENAMETOOLONG for the first name
+    longer than MAX_PATHLENGTH once the renames in flight are done; nothing after it is renamed.
+    Must not be called from a running event loop."""
+
+    import asyncio
+    return asyncio.run(run_pipeline(paths, config, journal, index))
+
+
+async def run_pipeline(paths, config, journal=None, index=None):
+    """the coroutine of rename_pipelined()"""
+
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+
+    loop = asyncio.get_running_loop()
+    cwd = os.getcwd()
+    slots = asyncio.Semaphore(config.pipeline)
+    stopping = threading.Event()
+    computed = {}       # position → (path, basename, new_basename, stat_result, is_directory) or None
+    ready = asyncio.Event()
+    examining = set()   # tasks of examine()
+    in_flight = {}      # (directory, name) → the future of the last rename started involving name
+    within = {}         # directory → the futures of the renames in flight within it
+    renamed = []        # (position, old path, new path)
+    failures = []       # (position, OSError)
+    claimed = {}        # see claim_new_basename()
+
+    def discover():
+        """put the items of paths, and their content in recursive mode, into the pipeline in order"""
+        position = 0
+        for item in paths:
+            item = item.rstrip(os.sep + (os.altsep or '')) or item
+            stat_result = None
+            if config.recursive:
+                try:
+                    stat_result = stat_item(item, config)
+                except OSError:
+                    pass
+                if stat_result is not None and stat.S_ISDIR(stat_result.st_mode):
+                    for entry in scan_tree(item, stat_directories=not config.remove,
+                                           stat_source=config.renamer.stat_source):
+                        if stopping.is_set():
+                            return position
+                        if not (entry.is_dir() or entry.is_file()):
+                            logging.critical("%s: is no file or directory (broken link?)" % entry.path)
+                            continue
+                        asyncio.run_coroutine_threadsafe(admit(position, entry.path, entry), loop).result()
+                        position += 1
+            if stopping.is_set():
+                return position
+            asyncio.run_coroutine_threadsafe(admit(position, item, stat_result), loop).result()
+            position += 1
+        return position
+
+    async def admit(position, item, stat_result):
+        await slots.acquire()  # the backpressure of the renames on discovery
+        task = loop.create_task(examine(position, item, stat_result))
+        examining.add(task)
+        task.add_done_callback(examining.discard)
+
+    async def examine(position, item, stat_result):
+        """stat item unless at hand and compute its new name, reading embedded times within the executor"""
+        result = None
+        try:
+            path, basename = os.path.dirname(item), os.path.basename(item)
+            if stat_result is None:
+                try:
+                    stat_result = await loop.run_in_executor(executor, stat_item, item, config)
+                except OSError:
+                    pass
+                if stat_result is None or not (stat.S_ISDIR(stat_result.st_mode) or
+                                               stat.S_ISREG(stat_result.st_mode)):
+                    logging.critical("%s: is no file or directory (broken link?)" % item)
+                    return
+            elif isinstance(stat_result, os.DirEntry) and (index is not None or
+                                                          not keeps_basename(basename, config)):
+                try:
+                    stat_result = await loop.run_in_executor(executor, stat_item, stat_result, config)
+                except OSError:
+                    logging.critical("%s: is no file or directory (broken link?)" % item)
+                    return
+            if index is not None and index.known(basename, stat_result, path):
+                return
+            if isinstance(stat_result, os.DirEntry):
+                is_directory = stat_result.is_dir()
+            else:
+                is_directory = stat.S_ISDIR(stat_result.st_mode)
+            if config.renamer.meta and not config.remove and not is_directory:  # reads the file
+                new_basename = await loop.run_in_executor(executor, compute_new_name, item, config, stat_result)
+            else:
+                new_basename = compute_new_name(item, config, stat_result)
+            result = (path, basename, new_basename, stat_result, is_directory)
+        finally:
+            computed[position] = result
+            ready.set()
+
+    def finish(position, path, basename, new_basename, stat_result, future):
+        """bookkeeping of a rename done by a thread"""
+        key = os.path.normpath(os.path.join(cwd, path))
+        for name in (basename, new_basename):
+            if in_flight.get((key, name)) is future:
+                del in_flight[(key, name)]
+        within[key].discard(future)
+        if not within[key]:
+            del within[key]
+        if future.exception() is not None:
+            failures.append((position, future.exception()))
+            stopping.set()
+        elif future.result() is not None:  # the name it got with config.noclobber
+            renamed.append((position, os.path.join(path, basename), os.path.join(path, future.result())))
+            if index is not None:
+                index.add(future.result(), stat_result, path)
+        slots.release()
+
+    with ThreadPoolExecutor(max_workers=config.pipeline) as executor:
+        discoverer = ThreadPoolExecutor(max_workers=1)
+        try:
+            discovery = loop.run_in_executor(discoverer, discover)
+            discovery.add_done_callback(lambda future: ready.set())
+            position = 0
+            while True:
+                if position not in computed:
+                    if discovery.done() and position >= discovery.result():
+                        break
+                    ready.clear()
+                    await ready.wait()
+                    continue
+                result = computed.pop(position)
+                position += 1
+                if result is None or failures:  # nothing to do or draining after a failure
+                    slots.release()
+                    continue
+                path, basename, new_basename, stat_result, is_directory = result
+                if new_basename is not None and config.noclobber:
+                    new_basename = claim_new_basename(claimed, path, basename, new_basename, config)
+                    if new_basename is None:
+                        slots.release()
+                        continue
+                if new_basename is None or new_basename == basename or config.dryrun:
+                    if new_basename is not None:
+                        new_basename = apply_new_basename(path, basename, new_basename, config)  # does no renames
+                        if new_basename is None:
+                            slots.release()
+                            continue
+                        if new_basename != basename:
+                            renamed.append((position - 1, os.path.join(path, basename),
+                                            os.path.join(path, new_basename)))
+                    if index is not None and not config.dryrun:
+                        index.add(new_basename or basename, stat_result, path)
+                    slots.release()
+                    continue
+                if len(new_basename) > MAX_PATHLENGTH:
+                    try:
+                        apply_new_basename(path, basename, new_basename, config)  # raises before renaming
+                    except OSError as error:
+                        failures.append((position - 1, error))
+                        stopping.set()
+                    slots.release()
+                    continue
+
+                key = os.path.normpath(os.path.join(cwd, path))
+                waiting = [in_flight.get((key, name)) for name in (basename, new_basename)]
+                if is_directory:
+                    waiting.extend(within.get(os.path.join(key, basename), ()))
+                waiting = [future for future in waiting if future is not None and not future.done()]
+                if waiting:
+                    await asyncio.wait(waiting)
+                    if failures:
+                        slots.release()
+                        continue
+                future = loop.run_in_executor(executor, rename_if_present, path, basename, new_basename, config,
+                                              None, journal)
+                in_flight[(key, basename)] = in_flight[(key, new_basename)] = future
+                within.setdefault(key, set()).add(future)
+                future.add_done_callback(partial(finish, position - 1, path, basename, new_basename,
+                                                           stat_result))
+            remaining = [future for futures in within.values() for future in futures]
+            if remaining:
+                await asyncio.wait(remaining)
+        finally:
+            stopping.set()
+            discoverer.shutdown(wait=False)
+
+    if failures:
+        raise min(failures, key=lambda failure: failure[0])[1]
+    return [(old, new) for position, old, new in sorted(renamed)]
+
+
+class Journal(object):
+    """Append-only record of performed renames which undo_journal() reverses
+
+    Every rename is written as one JSON line with the absolute directory and the old and new
+    basename and handed to the operating system right away, so it survives a crash of date2name.
+    The journal is only fsync'ed every SYNC_EVERY renames and when it is closed, so that recording
+    costs next to nothing. Renames of several threads may be recorded concurrently. Use it as a
+    context manager to close it."""
+
+    SYNC_EVERY = 1000
+
+    def __init__(self, path):
+        self.stream = open(path, 'a+b')
+        self.lock = threading.Lock()
+        self.unsynced = 0
+        if self.stream.tell() > 0:
+            self.stream.seek(-1, os.SEEK_END)
+            if self.stream.read(1) != b'\n':
+                self.stream.write(b'\n')  # terminate an entry cut off by a crash
+
+    def record(self, path, basename, new_basename):
+        import json
+        line = json.dumps({'dir': os.path.abspath(path), 'old': basename, 'new': new_basename}) + '\n'
+        with self.lock:
+            self.stream.write(line.encode('ascii'))
+            self.stream.flush()
+            self.unsynced += 1
+            if self.unsynced >= self.SYNC_EVERY:
+                os.fsync(self.stream.fileno())
+                self.unsynced = 0
+
+    def close(self):
+        with self.lock:
+            self.stream.flush()
+            os.fsync(self.stream.fileno())
+            self.stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_journal(stream, chunk_size=65536):
+    """Yield the entries of a journal written by Journal to the binary stream, the last one first
+
+    The stream is read backwards chunk by chunk. Lines which are no complete entry, like one cut
+    off by a crash, are skipped with a warning."""
+
+    import json
+
+    def parse(line):
+        if line.strip():
+            try:
+                return json.loads(line)
+            except ValueError:
+                logging.warning("skipping incomplete journal entry %r" % line)
+        return None
+
+    stream.seek(0, os.SEEK_END)
+    position = stream.tell()
+    remainder = b''
+    while position > 0:
+        size = min(chunk_size, position)
+        position -= size
+        stream.seek(position)
+        lines = (stream.read(size) + remainder).split(b'\n')
+        remainder = lines.pop(0)
+        for line in reversed(lines):
+            entry = parse(line)
+            if entry is not None:
+                yield entry
+    entry = parse(remainder)
+    if entry is not None:
+        yield entry
+
+
+def exists_in(path, basename, dir_fd=None):
+    """return whether basename exists within directory path (without following a link)"""
+    try:
+        os.lstat(os.path.join(path, basename) if dir_fd is None else basename, dir_fd=dir_fd)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def undo_journal(stream, config, journal=None):
+    """Reverse the renames recorded by Journal to the binary stream, the last one first
+
+    Renames which cannot be reversed because the renamed item is gone (e.g. it was undone before)
+    or an item with the old name exists again are skipped with an error; the old name is never
+    replaced, see rename_noclobber(). Only config.dryrun is used from config. The reversing
+    renames are recorded to journal unless it is None. Yields the (path, new_path) tuples of the
+    reversing renames like iter_renames()."""
+
+    undo_config = RenameConfig(dryrun=config.dryrun, noclobber=True)
+    with DirectoryHandles() as handles:
+        for entry in read_journal(stream):
+            path, basename, new_basename = entry['dir'], entry['old'], entry['new']
+            try:
+                dir_fd = handles.get(path)
+            except OSError:
+                logging.error("%s: not found, skipping its undo" % os.path.join(path, new_basename))
+                continue
+            if not exists_in(path, new_basename, dir_fd):
+                logging.error("%s: not found, skipping its undo" % os.path.join(path, new_basename))
+                continue
+            if exists_in(path, basename, dir_fd):
+                logging.error("%s: exists already, skipping undo of \"%s\"" % (os.path.join(path, basename),
+                                                                               os.path.join(path, new_basename)))
+                continue
+            if apply_new_basename(path, new_basename, basename, undo_config, dir_fd, journal) is None:
+                continue
+            handles.forget(os.path.join(path, new_basename))
+            yield os.path.join(path, new_basename), os.path.join(path, basename)
+
+
+class Index(object):
+    """The items handled by earlier runs, which later runs skip until they change
+
+    An item is known by a 64 bit hash of its device, inode, modification time, and name, or of
+    its absolute path instead of its device and inode if it has no inode number, like the items
+    listed in a StatSource; the keys are kept sorted in an array, 8 bytes per item. Items whose key is known get skipped
+    before their name is looked at. Only the keys looked up successfully or added during this
+    run are kept by save(), so the items deleted, changed, or not handled since are evicted.
+
+    The file holds a JSON header line with the version, the settings of the configuration which
+    determine new names, the number of keys, and their CRC-32, followed by the keys as 8 byte
+    little-endian integers. An index which does not pass this check or was written with other
+    settings is ignored: all items are looked at then."""
+
+    IGNORED_SETTINGS = ('recursive', 'jobs', 'pipeline', 'stat_source', 'noclobber', 'collision_suffix', 'batch',
+                        'dryrun')
+
+    def __init__(self, path, config):
+        from hashlib import blake2b
+        self.blake2b = blake2b
+        self.encoding, self.errors = sys.getfilesystemencoding(), sys.getfilesystemencodeerrors()
+        self.path = path
+        self.settings = dict((name, value) for name, value in config._asdict().items()
+                             if name not in self.IGNORED_SETTINGS)
+        self.keys = array('Q')
+        self.seen = array('Q')
+        self.hits = 0
+        try:
+            with open(path, 'rb') as stream:
+                self.load(stream)
+        except FileNotFoundError:
+            pass
+        except ValueError as error:
+            logging.warning("WARNING: %s: %s, looking at all items" % (path, error))
+
+    def load(self, stream):
+        """Read the keys from the binary stream; raises ValueError if they fail the check"""
+        import json
+        import zlib
+        try:
+            header = json.loads(stream.readline())
+        except ValueError:
+            header = None
+        if not isinstance(header, dict) or header.get('date2name_index') != INDEX_VERSION:
+            raise ValueError("not a date2name index of version %i" % INDEX_VERSION)
+        if header.get('settings') != self.settings:
+            raise ValueError("index written with other options")
+        data = stream.read()
+        if len(data) != 8 * header.get('count', -1) or zlib.crc32(data) != header.get('crc32'):
+            raise ValueError("index damaged")
+        self.keys.frombytes(data)
+        if sys.byteorder == 'big':
+            self.keys.byteswap()
+
+    def key(self, basename, stat_result, path=''):
+        """Return the key of the item basename within the directory path with the os.stat_result or
+        os.DirEntry stat_result"""
+        if isinstance(stat_result, os.DirEntry):
+            stat_result = stat_result.stat()
+        if stat_result.st_ino:
+            identity = b'%i %i %i ' % (stat_result.st_dev, stat_result.st_ino, stat_result.st_mtime_ns)
+        else:  # a stat_result of a StatSource
+            directory = os.path.abspath(path).encode(self.encoding, self.errors)
+            identity = b'%i %s/' % (stat_result.st_mtime_ns, directory)
+        name = basename.encode(self.encoding, self.errors)  # like os.fsencode() but faster
+        return int.from_bytes(self.blake2b(identity + name, digest_size=8).digest(), 'little')
+
+    def known(self, basename, stat_result, path=''):
+        """Return whether the item was handled before and did not change since; it is kept then"""
+        key = self.key(basename, stat_result, path)
+        position = bisect_left(self.keys, key)
+        if position < len(self.keys) and self.keys[position] == key:
+            self.seen.append(key)
+            self.hits += 1
+            return True
+        return False
+
+    def add(self, basename, stat_result, path=''):
+        """Remember the item basename within the directory path, e.g. after renaming it to basename"""
+        self.seen.append(self.key(basename, stat_result, path))
+
+    def save(self):
+        """Replace the file with the keys seen during this run"""
+        import json
+        import zlib
+        keys = array('Q', sorted(set(self.seen)))
+        if sys.byteorder == 'big':
+            keys.byteswap()
+        data = keys.tobytes()
+        header = {'date2name_index': INDEX_VERSION, 'settings': self.settings, 'count': len(keys),
+                  'crc32': zlib.crc32(data)}
+        with open(self.path + '.tmp', 'wb') as stream:
+            stream.write(json.dumps(header).encode('utf-8') + b'\n')
+            stream.write(data)
+            stream.flush()
+            os.fsync(stream.fileno())
+        os.replace(self.path + '.tmp', self.path)
+
+
+def read_paths(stream, delimiter=b'\n', chunk_size=65536):
+    """Yield the paths of a binary stream separated by delimiter while reading it chunk by chunk
+
+    Empty paths are skipped, bytes which are not valid in the file system encoding are kept
+    like os.fsdecode() does."""
+
+    remainder = b''
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        pieces = (remainder + chunk).split(delimiter)
+        remainder = pieces.pop()
+        for piece in pieces:
+            if piece:
+                yield os.fsdecode(piece)
+    if remainder:
+        yield os.fsdecode(remainder)
+
+
+def is_temporary_name(basename):
+    """Return whether basename is a temporary name of plan_batch()"""
+    return basename.startswith(TEMPORARY_PREFIX)
+
+
+def plan_entry(path, new_path, config):
+    """Return the plan entry of renaming path to new_path according to config as a dict
+
+    The entry holds the absolute directory, the old and the new basename, the source of the
+    datestamp ("mtime", "ctime", "meta" for the time embedded in the file or else its time, "name"
+    for a converted datestamp, "temporary" for a rename to or from a temporary name of
+    config.batch, or None when removing one)
+    and the kind of the datestamp found in the old basename if it was used."""
+
+    basename = os.path.basename(path)
+    datestamp = None if config.nocorrections else config.renamer.classify(basename)
+    if is_temporary_name(basename) or is_temporary_name(os.path.basename(new_path)):
+        source, datestamp = 'temporary', None
+    elif config.remove:
+        source = None
+    elif datestamp is None or datestamp.kind == 'NODATESTAMP':
+        source, datestamp = ('meta' if config.meta else 'ctime' if config.ctime else 'mtime'), None
+    else:
+        source = 'name'
+    return {'dir': os.path.abspath(os.path.dirname(path)), 'old': basename, 'new': os.path.basename(new_path),
+            'source': source, 'kind': datestamp.kind if datestamp is not None else None}
+
+
+def write_plan(renames, stream, config):
+    """Write the (path, new_path) tuples of renames as a plan for apply_plan() to the text stream
+
+    The plan is written in JSON lines: a header with config followed by one plan_entry() per
+    item in the order of renames. Returns the number of entries written."""
+
+    import json
+    stream.write(json.dumps({'date2name_plan': PLAN_VERSION, 'config': config._asdict()}) + '\n')
+    count = 0
+    for path, new_path in renames:
+        stream.write(json.dumps(plan_entry(path, new_path, config)) + '\n')
+        count += 1
+    return count
+
+
+def check_plan_entry(path, basename, new_basename, planned_config, dir_fd=None):
+    """Return whether renaming basename within path to new_basename is still what planned_config results in
+
+    Logs an error and returns False if the item vanished, new_basename exists already, or the
+    new name computed now differs (e.g. because the item was modified in the meantime). Renames to
+    and from temporary names of config.batch are not computed again."""
+
+    item = os.path.join(path, basename)
+    try:
+        stat_result = os.stat(item if dir_fd is None else basename, dir_fd=dir_fd)
+    except OSError:
+        logging.error("%s: vanished since the plan was written, skipping it" % item)
+        return False
+    if new_basename != basename and os.path.lexists(os.path.join(path, new_basename)):
+        logging.error("%s: exists already, skipping \"%s\"" % (os.path.join(path, new_basename), item))
+        return False
+    if is_temporary_name(basename) or is_temporary_name(new_basename):
+        return True
+    if compute_new_name(item, planned_config, stat_result) != new_basename:
+        logging.error("%s: changed since the plan was written, skipping it" % item)
+        return False
+    return True
+
+
+def apply_plan(stream, config, check_drift=False, journal=None):
+    """Rename the items of a plan written by write_plan() to the text stream in its order
+
+    Items are neither stat'ed nor classified again unless check_drift is set: then every item is
+    checked by check_plan_entry() against the configuration the plan was written with. Only
+    config.dryrun, config.noclobber, and config.collision_suffix are used from config. Performed
+    renames are recorded to journal unless it is None.
+    Yields the (path, new_path) tuples like iter_renames().
+    Raises ValueError if stream does not hold a plan."""
+
+    import json
+    header = json.loads(stream.readline() or 'null')
+    if not isinstance(header, dict) or header.get('date2name_plan') != PLAN_VERSION:
+        raise ValueError("not a date2name plan of version %i" % PLAN_VERSION)
+    planned_config = RenameConfig(**header['config'])
+
+    with DirectoryHandles() as handles:
+        for line in stream:
+            entry = json.loads(line)
+            path, basename, new_basename = entry['dir'], entry['old'], entry['new']
+            item = os.path.join(path, basename)
+            try:
+                dir_fd = handles.get(path)
+            except OSError:
+                logging.critical("%s: is no file or directory (broken link?)" % item)
+                continue
+            if check_drift and not check_plan_entry(path, basename, new_basename, planned_config, dir_fd):
+                continue
+            try:
+                new_basename = apply_new_basename(path, basename, new_basename, config, dir_fd, journal)
+            except FileNotFoundError:
+                logging.critical("%s: is no file or directory (broken link?)" % item)
+                continue
+            if new_basename is None:
+                continue
+            handles.forget(item)
+            yield item, os.path.join(path, new_basename)
+
+
+def handle_request(request, config, configs, journal=None):
+    """Perform a rename request of serve() and return the response as a dict
+
+    request is a dict with the list of paths to handle, optionally a dict of options by the
+    field names of RenameConfig which replace the ones of config, and optionally the directory
+    cwd relative paths are relative to. The response holds the renames as [path, new_path] lists
+    like iter_renames() yields them and an error message if the request is invalid or renaming
+    failed. configs maps configurations to themselves so that their Renamer with its datestamp
+    cache is reused by later requests."""
+
+    renames = []
+    try:
+        if not isinstance(request, dict) or not isinstance(request.get('paths'), list) \
+           or not all(isinstance(path, str) for path in request['paths']) \
+           or not isinstance(request.get('options', {}), dict) or not isinstance(request.get('cwd', ''), str):
+            raise ValueError("a request needs a list of paths, optionally a dict of options, and optionally a cwd, "
+                             "paths and cwd being strings")
+        requested = RenameConfig(**dict(config._asdict(), **request.get('options', {})))
+        if len(configs) >= SERVE_CONFIGS:
+            configs.clear()
+        requested = configs.setdefault(requested, requested)
+    except (TypeError, ValueError) as error:
+        logging.error("ERROR: invalid request: %s" % error)
+        return {'renames': renames, 'error': "invalid request: %s" % error}
+
+    paths = request['paths']
+    if request.get('cwd'):
+        paths = [os.path.join(request['cwd'], path) for path in paths]
+    try:
+        for path, new_path in iter_renames(paths, requested, journal):
+            renames.append([path, new_path])
+    except OSError as error:
+        if error.errno != errno.ENAMETOOLONG:
+            logging.error("ERROR: %s" % error)
+        return {'renames': renames, 'error': str(error)}
+    return {'renames': renames}
+
+
+def serve_connection(connection, config, configs, journal=None):
+    """Answer the requests of one client of serve() until it closes the connection
+
+    Requests and responses are JSON objects, one per line; see handle_request()."""
+
+    import json
+    try:
+        with connection, connection.makefile('rb') as requests, connection.makefile('wb') as responses:
+            for line in requests:
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                except ValueError as error:
+                    response = {'renames': [], 'error': "invalid request: %s" % error}
+                else:
+                    try:
+                        response = handle_request(request, config, configs, journal)
+                    except Exception as error:  # answer instead of leaving the client waiting
+                        logging.error("ERROR: request failed: %r", error)
+                        response = {'renames': [], 'error': "request failed: %r" % error}
+                responses.write(json.dumps(response).encode('utf-8') + b'\n')
+                responses.flush()
+    except OSError as error:
+        logging.debug("connection closed: %s", error)
+
+
+def serve(socket_path, config, journal=None):
+    """Handle rename requests on the Unix socket socket_path until interrupted
+
+    Every client is served by a thread of its own with serve_connection(). The options of a
+    request replace the ones of config. The datestamp patterns are compiled and the Renamer of
+    config is built before the first request, and configurations are kept with their Renamer
+    across requests, so a request costs no startup time. The socket is accessible by the
+    current user only; a stale socket left by a server which is gone is replaced. Raises OSError
+    with errno.EADDRINUSE if another server listens on socket_path already."""
+
+    import socket
+
+    try:
+        if stat.S_ISSOCK(os.lstat(socket_path).st_mode):
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                try:
+                    probe.connect(socket_path)
+                except ConnectionRefusedError:
+                    os.unlink(socket_path)
+                else:
+                    raise OSError(errno.EADDRINUSE, os.strerror(errno.EADDRINUSE), socket_path)
+    except FileNotFoundError:
+        pass
+
+    get_datestamp_classifier()
+    configs = {config: config}
+    config.renamer.format_time(time.time())
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        umask = os.umask(0o077)
+        try:
+            server.bind(socket_path)
+        finally:
+            os.umask(umask)
+        try:
+            server.listen()
+            logging.info("serving rename requests on %s", socket_path)
+            while True:
+                connection, address = server.accept()
+                threading.Thread(target=serve_connection, args=(connection, config, configs, journal),
+                                 daemon=True).start()
+        finally:
+            os.unlink(socket_path)
+
+
+class Inotify(object):
+    """The Linux inotify API through ctypes, for watch()
+
+    directories maps the watch descriptors to the watched directories; a directory is removed
+    from it once the kernel stops watching it (e.g. because it got deleted)."""
+
+    CLOSE_WRITE = 0x00000008
+    MOVED_FROM = 0x00000040
+    MOVED_TO = 0x00000080
+    DELETE = 0x00000200
+    Q_OVERFLOW = 0x00004000
+    IGNORED = 0x00008000
+    ISDIR = 0x40000000
+
+    def __init__(self):
+        if not sys.platform.startswith('linux'):
+            raise OSError(errno.ENOSYS, "inotify is only available on Linux")
+        import ctypes
+        self.get_errno = ctypes.get_errno
+        self.libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(self.get_errno(), os.strerror(self.get_errno()))
+        self.directories = {}
+
+    def add_watch(self, directory, mask):
+        """Watch directory for the events in mask"""
+        descriptor = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), mask)
+        if descriptor < 0:
+            raise OSError(self.get_errno(), os.strerror(self.get_errno()), directory)
+        self.directories[descriptor] = directory
+
+    def read(self):
+        """Return the pending events as (directory, mask, name) tuples, waiting for one if there is none"""
+        import struct
+        data = os.read(self.fd, 65536)
+        events = []
+        offset = 0
+        while offset < len(data):
+            descriptor, mask, cookie, length = struct.unpack_from('iIII', data, offset)
+            name = os.fsdecode(data[offset + 16:offset + 16 + length].rstrip(b'\0'))
+            offset += 16 + length
+            events.append((self.directories.get(descriptor), mask, name))
+            if mask & self.IGNORED:
+                self.directories.pop(descriptor, None)
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def keeps_basename(basename, config):
+    """Return whether config leaves basename as it is, judged by the name alone without stat'ing the item"""
+
+    datestamp = config.renamer.classify(basename)
+    has_datestamp = datestamp is not None and datestamp.kind != 'NODATESTAMP'
+    if config.remove:
+        return not has_datestamp
+    if config.nocorrections or not has_datestamp:
+        return False
+    if config.withtime and datestamp.kind in ('WITHTIME_AND_SECONDS', 'WITHTIME_NO_SECONDS'):
+        return datestamp.separators == (('T', '.', '.') if datestamp.second is not None else ('T', '.'))
+    return datestamp.kind in config.renamer.unchanged_kinds
+
+
+def watch(directories, config, journal=None, debounce=WATCH_DEBOUNCE):
+    """Handle the items written to or moved into directories according to config as they arrive
+
+    Runs until none of the directories is watched anymore. Items are collected until no event
+    arrived for debounce seconds (or for ten times as long at most) and then renamed together,
+    so that a file is handled once after a burst of writes. Items which vanish in the meantime
+    are dropped. Items whose name config keeps (see keeps_basename()), hidden items, and the
+    items just renamed by watch() itself are skipped without stat'ing them: the cost of a batch
+    only depends on the number of new items. Items which were in directories before are not
+    handled. Raises OSError if inotify is not available or a directory can not be watched."""
+
+    import select
+
+    pending = OrderedDict()  # (directory, name) of the items to handle, in the order of arrival
+    renamed_to = set()       # (directory, name) of the items renamed by watch()
+    first = last = None
+
+    def add(directory, name, is_directory=None):
+        """queue the item unless it is skipped; return whether it got queued"""
+        if (directory, name) in renamed_to:
+            renamed_to.discard((directory, name))
+        elif name.startswith('.') or keeps_basename(name, config):
+            logging.debug("skipping \"%s\"", os.path.join(directory, name))
+        elif is_directory is None or not (config.onlyfiles and is_directory or
+                                          config.onlydirectories and not is_directory):
+            pending[(directory, name)] = None
+            return True
+        return False
+
+    with Inotify() as inotify:
+        for directory in directories:
+            inotify.add_watch(directory.rstrip(os.sep) or directory, Inotify.CLOSE_WRITE | Inotify.MOVED_TO |
+                              Inotify.MOVED_FROM | Inotify.DELETE)
+        logging.info("watching %s", ", ".join(directories))
+        while inotify.directories:
+            timeout = None
+            if pending:
+                timeout = max(0.0, min(last + debounce, first + 10 * debounce) - time.monotonic())
+            if select.select([inotify.fd], [], [], timeout)[0]:
+                queued = False
+                for directory, mask, name in inotify.read():
+                    if mask & Inotify.Q_OVERFLOW:
+                        logging.warning("WARNING: too many events at once, looking at all items again")
+                        renamed_to.clear()
+                        for watched in list(inotify.directories.values()):
+                            for entry in list_directory(watched):
+                                queued = add(watched, entry.name) or queued
+                    elif mask & Inotify.IGNORED:
+                        logging.error("ERROR: %s: is not watched anymore" % directory)
+                    elif mask & (Inotify.MOVED_FROM | Inotify.DELETE):
+                        pending.pop((directory, name), None)
+                    else:
+                        queued = add(directory, name, bool(mask & Inotify.ISDIR)) or queued
+                if not pending:
+                    first = None
+                    continue
+                if queued:
+                    last = time.monotonic()
+                    if first is None:
+                        first = last
+                if time.monotonic() < first + 10 * debounce:  # a steady stream of events waits so long at most
+                    continue
+
+            items = [os.path.join(directory, name) for directory, name in pending]
+            pending.clear()
+            first = None
+            for item in items:
+                try:
+                    for path, new_path in iter_renames([item], config, journal):
+                        if not config.dryrun:
+                            renamed_to.add(os.path.split(new_path))
+                except OSError as error:
+                    if error.errno != errno.ENAMETOOLONG:
+                        logging.error("ERROR: %s: %s" % (item, error.strerror))
+
+
+def usage_error(message):
+    """Exit with message and the usage of the command line interface like OptionParser.error()"""
+    build_parser().error(message)
 
 
 def main():
     """Main function [make pylint happy :)]"""
 
+    global STATS
+    (options, args) = parse_arguments(sys.argv[1:])
+
     if options.version:
         print(os.path.basename(sys.argv[0]) + " " + PROG_VERSION_DATE)
         sys.exit(0)
 
-    if len(args) < 1:
-        parser.error("invalid usage")
+    if options.null:
+        options.stdin = True
+
+    if options.plan_out:
+        options.dryrun = True
+
+    if options.collision_suffix is not None:
+        if not is_collision_suffix(options.collision_suffix):
+            usage_error("please use a collision suffix (--collision-suffix) with one %i for the number, like \"_%i\"")
+        options.noclobber = True
+
+    if options.apply_plan and (args or options.stdin or options.plan_out):
+        usage_error("please use option apply-plan (--apply-plan) without any files or plan-out (--plan-out)")
+
+    if options.undo and (args or options.stdin or options.plan_out or options.apply_plan):
+        usage_error("please use option undo (--undo) without any files, plan-out (--plan-out), or apply-plan " +
+                    "(--apply-plan)")
+
+    if options.serve and (args or options.stdin or options.plan_out or options.apply_plan or options.undo):
+        usage_error("please use option serve (--serve) without any files, plan-out (--plan-out), apply-plan " +
+                    "(--apply-plan), or undo (--undo)")
+
+    if options.watch and (options.stdin or options.plan_out or options.apply_plan or options.undo or options.serve
+                          or options.recursive):
+        usage_error("please use option watch (--watch) with directories only, without recursive (-R), plan-out " +
+                    "(--plan-out), apply-plan (--apply-plan), undo (--undo), or serve (--serve)")
+
+    if options.index and (options.apply_plan or options.undo or options.serve or options.watch):
+        usage_error("please use option index (--index) without apply-plan (--apply-plan), undo (--undo), serve " +
+                    "(--serve), or watch (--watch)")
+
+    if len(args) < 1 and not options.stdin and not options.apply_plan and not options.undo and not options.serve:
+        usage_error("invalid usage")
 
     if (options.verbose and options.quiet):
-        parser.error("please use either verbose (--verbose) or quiet (-q) option")
+        usage_error("please use either verbose (--verbose) or quiet (-q) option")
 
     if (options.onlyfiles and options.onlydirectories):
-        parser.error("please use either option files (-f) or option directories (-f) or none of them (for renaming directories and files)")
+        usage_error("please use either option files (-f) or option directories (-f) or none of them (for renaming " +
+                    "directories and files)")
 
-    if (options.ctime and options.mtime):
-        parser.error("please use either ctime (-c) or mtime (-m) option")
+    if options.jobs is not None and options.jobs < 1:
+        usage_error("please use at least one job (-j)")
+
+    if options.pipeline is not None and options.pipeline < 1:
+        usage_error("please use at least one item in the pipeline (--pipeline)")
 
-    if (not options.ctime and not options.mtime):
-        options.mtime = True
+    if options.pipeline and ((options.jobs and options.jobs > 1) or options.batch):
+        usage_error("please use pipeline (--pipeline) without jobs (-j) and batch (--batch)")
+
+    if (options.ctime and options.mtime):
+        usage_error("please use either ctime (-c) or mtime (-m) option")
 
     if (options.compact and options.withtime) \
        or (options.compact and options.month) \
        or (options.month and options.withtime):
-        parser.error("please use either the default, short, month, or withtime format")
+        usage_error("please use either the default, short, month, or withtime format")
 
     # log handling
-    handle_logging()
+    handle_logging(options)
 
     filelist = args[0:]
-    logging.debug("filelist: [%s]" % filelist)
-
-    if options.compact:
-        formatstring = FORMATSTRING_COMPACT
-    elif options.short:
-        formatstring = FORMATSTRIING_SHORT
-    elif options.month:
-        formatstring = FORMATSTRING_MONTH
-    elif options.withtime:
-        formatstring = FORMATSTRING_WITHTIME
-    else:
-        logging.debug("no option given for format string; taking standard format")
-        formatstring = FORMATSTRING_STANDARD
-
-    original_path = os.getcwd()
-
-    for item in filelist:
-        if os.path.isdir(item) or os.path.isfile(item):
-            logging.debug("handling item: " + item + "  <-----------------")
-
-            path = os.path.dirname(item)
-            logging.debug("has directory: " + path)
-            basename = os.path.basename(item)
-            logging.debug("has basename:  " + basename)
-
-            if path:
-                os.chdir(path)
-            logging.debug("changed cwd to: " + os.getcwd())
-            handle_item(os.path.dirname(item), os.path.basename(item), formatstring)
-            os.chdir(original_path)
+    logging.debug("filelist: [%s]", filelist)
+    if options.stdin:
+        filelist = itertools.chain(filelist, read_paths(sys.stdin.buffer, b'\0' if options.null else b'\n'))
 
+    try:
+        config = RenameConfig.from_options(options)
+    except ValueError as error:
+        usage_error(str(error))
+    journal = Journal(options.journal) if options.journal else None
+    index = Index(options.index, config) if options.index else None
+    if options.stat_source:
+        try:
+            config.renamer  # loads the listing
+        except OSError as error:
+            logging.error("ERROR: %s: %s" % (options.stat_source, error.strerror))
+            sys.exit(1)
+    if options.stats:
+        STATS = RunStats()
+        logging.root.addHandler(STATS)
+    if options.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        if options.serve or options.watch:
+            import signal
+            signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))  # cleans up on the way out
+            try:
+                if options.serve:
+                    serve(options.serve, config, journal)
+                else:
+                    watch(filelist, config, journal)
+            except OSError as error:
+                logging.error("ERROR: %s: %s" % (error.filename or options.serve or "--watch", error.strerror))
+                sys.exit(1)
+        elif options.undo:
+            with open(options.undo, 'rb') as undo:
+                for renamed in undo_journal(undo, config, journal):
+                    pass
+        elif options.apply_plan:
+            with open(options.apply_plan, encoding='utf-8') as plan:
+                try:
+                    for renamed in apply_plan(plan, config, options.check_drift, journal):
+                        pass
+                except ValueError as error:
+                    logging.error("ERROR: %s: %s" % (options.apply_plan, error))
+                    sys.exit(1)
+        elif options.plan_out:
+            with open(options.plan_out, 'w', encoding='utf-8') as plan:
+                write_plan(iter_renames(filelist, config, index=index), plan, config)
         else:
-            logging.critical("%s: is no file or directory (broken link?)" % item)
+            for renamed in iter_renames(filelist, config, journal, index):
+                pass
+        if index is not None:
+            logging.debug("index: %i items skipped", index.hits)
+            if not config.dryrun:
+                index.save()
+        logging.debug("datestamp cache: %i hits, %i misses", config.renamer.hits, config.renamer.misses)
+    except OSError as error:
+        if error.errno != errno.ENAMETOOLONG:
+            raise
+        sys.exit(1)
+    finally:
+        if journal is not None:
+            journal.close()
+        if options.profile:
+            profiler.disable()
+            profiler.dump_stats(options.profile)
+        if STATS is not None:
+            if index is not None:
+                STATS.count('skipped', index.hits)
+            print(STATS.report(), file=sys.stderr)
 
 
 if __name__ == "__main__":
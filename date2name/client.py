@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+date2name client
+~~~~~~~~~~~~~~~~
+
+Hands the files given to a server started with "date2name --serve SOCKET" and
+prints their renames, instead of starting date2name for every call.
+
+This file only uses the standard library and does not import date2name, so it
+starts about as fast as Python does when run as a script:
+
+    python3 -S date2name/client.py --socket SOCKET [options] file ...
+
+The socket may be given by $DATE2NAME_SOCKET as well. The options are the ones
+of date2name which control the renaming (like --dryrun or --compact); the
+options the server was started with are used for the others.
+
+:license: GPL v2 or any later version
+"""
+
+import os
+import sys
+
+# json and socket would take most of the startup time of this file (through importing re and
+# enum): their C parts do all that is needed
+try:
+    from _json import encode_basestring_ascii, scanstring
+except ImportError:
+    from json.encoder import encode_basestring_ascii
+    from json.decoder import scanstring
+try:
+    from _socket import socket, AF_UNIX, SOCK_STREAM, SHUT_WR
+except ImportError:
+    from socket import socket, AF_UNIX, SOCK_STREAM, SHUT_WR
+
+# the date2name options the server takes by request, as the field names of RenameConfig
+SWITCHES = {'-d': 'onlydirectories', '--directories': 'onlydirectories', '-f': 'onlyfiles', '--files': 'onlyfiles',
+            '-C': 'compact', '--compact': 'compact', '-M': 'month', '--month': 'month',
+            '-S': 'short', '--short': 'short', '-w': 'withtime', '--withtime': 'withtime',
+            '-r': 'remove', '--remove': 'remove', '-R': 'recursive', '--recursive': 'recursive',
+            '-c': 'ctime', '--ctime': 'ctime', '-m': None, '--mtime': None,
+            '--meta': 'meta', '--nocorrections': 'nocorrections', '--no-clobber': 'noclobber', '--batch': 'batch',
+            '-s': 'dryrun', '--dryrun': 'dryrun'}
+VALUES = {'-j': ('jobs', int), '--jobs': ('jobs', int), '--pipeline': ('pipeline', int),
+          '--format': ('template', str), '--delimiter': ('delimiter', str),
+          '--collision-suffix': ('collision_suffix', str)}
+
+
+class ServerError(Exception):
+    """The server could not handle a request"""
+
+
+def parse_arguments(argv):
+    """Return the socket, the options as a dict, the files, and whether to be quiet from the command line argv
+
+    Raises ValueError for unknown options or invalid values."""
+
+    socket_path = os.environ.get('DATE2NAME_SOCKET')
+    options, files, quiet = {}, [], False
+    arguments = iter(argv)
+    for argument in arguments:
+        if argument == '--':
+            files.extend(arguments)
+        elif argument.startswith('--'):
+            name, separator, value = argument.partition('=')
+            if name in VALUES or name == '--socket':
+                value = value if separator else next(arguments)
+            elif separator:
+                raise ValueError("option %s takes no value" % name)
+            if name == '--socket':
+                socket_path = value
+            elif name == '--quiet':
+                quiet = True
+            elif name in VALUES:
+                options[VALUES[name][0]] = VALUES[name][1](value)
+            elif name in SWITCHES:
+                options[SWITCHES[name]] = True
+            else:
+                raise ValueError("unknown option %s" % name)
+        elif argument.startswith('-') and argument != '-':
+            for index, letter in enumerate(argument[1:]):  # bundled like -sC or -j4
+                flag = '-' + letter
+                if flag in VALUES:
+                    options[VALUES[flag][0]] = VALUES[flag][1](argument[index + 2:] or next(arguments))
+                    break
+                elif flag == '-q':
+                    quiet = True
+                elif flag in SWITCHES:
+                    options[SWITCHES[flag]] = True
+                else:
+                    raise ValueError("unknown option %s" % flag)
+        else:
+            files.append(argument)
+    options.pop(None, None)
+    if 'collision_suffix' in options:
+        options['noclobber'] = True
+    if not socket_path:
+        raise ValueError("please give the socket of the server with --socket or $DATE2NAME_SOCKET")
+    return socket_path, options, files, quiet
+
+
+def encode(value):
+    """Return value, made of dicts, lists, strings, booleans, integers, and None, as JSON"""
+    if isinstance(value, str):
+        return encode_basestring_ascii(value)
+    elif isinstance(value, dict):
+        return '{' + ', '.join(encode(key) + ': ' + encode(item) for key, item in value.items()) + '}'
+    elif isinstance(value, list):
+        return '[' + ', '.join(encode(item) for item in value) + ']'
+    elif value is None or isinstance(value, bool):
+        return {None: 'null', True: 'true', False: 'false'}[value]
+    return str(int(value))
+
+
+def decode(text, index=0):
+    """Return the JSON value at index of text, made of objects, arrays, and strings, and the index after it
+
+    Raises ValueError for anything else."""
+    while text[index] in ' \t\r\n':
+        index += 1
+    if text[index] == '"':
+        return scanstring(text, index + 1)
+    elif text[index] not in '[{':
+        raise ValueError("unexpected %r in the response" % text[index])
+    closing = ']' if text[index] == '[' else '}'
+    items = []
+    index += 1
+    while True:
+        while text[index] in ' \t\r\n,:':
+            index += 1
+        if text[index] == closing:
+            break
+        item, index = decode(text, index)
+        items.append(item)
+    return (items if closing == ']' else dict(zip(items[::2], items[1::2]))), index + 1
+
+
+def request(socket_path, paths, options=None):
+    """Let the server at socket_path rename paths with options and return its renames as (path, new_path) tuples
+
+    Relative paths are relative to the current directory. Raises ServerError with the message of
+    the server if it could not handle the request and OSError if it is not reachable."""
+
+    message = {'paths': list(paths), 'options': options or {}, 'cwd': os.getcwd()}
+    connection = socket(AF_UNIX, SOCK_STREAM)
+    try:
+        connection.connect(socket_path)
+        connection.sendall(encode(message).encode('ascii') + b'\n')
+        connection.shutdown(SHUT_WR)
+        response = b''
+        while not response.endswith(b'\n'):
+            chunk = connection.recv(65536)
+            if not chunk:
+                break
+            response += chunk
+    finally:
+        connection.close()
+    try:
+        response = decode(response.decode('ascii'))[0]
+    except (ValueError, IndexError):
+        raise ServerError("no valid response")
+    if 'error' in response:
+        raise ServerError(response['error'])
+    return [tuple(renamed) for renamed in response['renames']]
+
+
+def main(argv=None):
+    """Rename the files of the command line argv by the server; return the exit status"""
+
+    program = os.path.basename(sys.argv[0])
+    try:
+        socket_path, options, files, quiet = parse_arguments(sys.argv[1:] if argv is None else argv)
+    except (ValueError, StopIteration) as error:
+        print("%s: error: %s" % (program, str(error) or "missing value of an option"), file=sys.stderr)
+        return 2
+    if not files:
+        print("%s: error: invalid usage" % program, file=sys.stderr)
+        return 2
+    try:
+        renames = request(socket_path, files, options)
+    except (OSError, ServerError) as error:
+        print("%s: error: %s" % (program, error), file=sys.stderr)
+        return 1
+    if not quiet:
+        for path, new_path in renames:
+            print("%-40s  →  %s" % (path, os.path.basename(new_path)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -24,7 +24,11 @@ completion of the test sequence.  In both cases, the progress of the ongoing
 tests is reported to the CLI (flag -v).
 
 """
+import json
 import os
+import subprocess
+import sys
+import threading
 import time
 
 from datetime import datetime
@@ -32,6 +36,8 @@ from subprocess import getstatusoutput, getoutput
 
 import pytest
 
+import date2name
+
 PROGRAM = str("./date2name/__init__.py")
 TFILE = str("test_file.txt")  # the intermediate test file written
 TFOLDER = str("test_folder")  # for complementary check on folders
@@ -481,3 +487,970 @@ def test_folder_remove_stamp(arg1, arg2, name=TFOLDER):
     assert os.path.isdir(name)           # presence unstamped folder
     os.rmdir(name)
     assert os.path.isdir(name) is False  # space cleaning
+
+@pytest.mark.files
+@pytest.mark.remove
+@pytest.mark.parametrize("arg1", ["-r", "--remove"])
+def test_file_remove_without_stamp(arg1):
+    """Keep the file name if there is no stamp to retract."""
+    prepare_testfile()
+    test = getoutput(f"python3 {PROGRAM} {TFILE} {arg1}")
+    assert os.path.isfile(TFILE)  # file name is unchanged
+    os.remove(TFILE)
+
+@pytest.mark.files
+@pytest.mark.default
+@pytest.mark.parametrize("arg1", ["210921", "20210921",
+                                  "2021-09-21T13.59.59", "2021-09-21T13.59",
+                                  "2021-09-21T13.59.59.", "2021-09-21 13:59.59"])
+def test_file_convert_stamp(arg1):
+    """Convert an existing stamp to the default pattern YYYY-MM-DD."""
+    BASIS = "test.txt"
+    old = "_".join([arg1, BASIS]) if not arg1.endswith(".") else arg1 + BASIS
+    new = "2021-09-21_test.txt" if not arg1.endswith(".") else "2021-09-21.test.txt"
+    with open(old, mode="w") as newfile:
+        newfile.write("This is a test file.")
+
+    test = getoutput(f"python3 {PROGRAM} '{old}'")
+
+    assert os.path.isfile(old) is False  # absence of old stamp
+    assert os.path.isfile(new)           # presence of converted stamp
+    os.remove(new)
+
+@pytest.mark.files
+@pytest.mark.default
+def test_library_compute_new_name(tmp_path):
+    """Compute the new name without renaming the file."""
+    name = tmp_path / TFILE
+    name.write_text("This is a test file.")
+    day = query_modification_time(str(name)).split()[0]
+
+    config = date2name.RenameConfig()
+    assert date2name.compute_new_name(str(name), config) == "_".join([day, TFILE])
+    assert date2name.compute_new_name(str(tmp_path), date2name.RenameConfig(onlyfiles=True)) is None
+    assert name.is_file()  # nothing was renamed
+
+@pytest.mark.files
+@pytest.mark.compact
+def test_library_rename_many(tmp_path):
+    """Rename files and folders by the library function."""
+    name = tmp_path / TFILE
+    name.write_text("This is a test file.")
+    folder = tmp_path / TFOLDER
+    folder.mkdir()
+    day = query_modification_time(str(name)).split()[0].replace("-", "")
+
+    renamed = date2name.rename_many([str(name), str(folder), str(tmp_path / "missing")],
+                                    date2name.RenameConfig(compact=True, onlyfiles=True))
+
+    new = tmp_path / "_".join([day, TFILE])
+    assert renamed == [(str(name), str(new))]
+    assert new.is_file()
+    assert folder.is_dir()  # skipped because of onlyfiles
+
+def test_library_invalid_config():
+    """Reject mutually exclusive options."""
+    with pytest.raises(ValueError):
+        date2name.RenameConfig(compact=True, withtime=True)
+
+@pytest.mark.folders
+@pytest.mark.default
+@pytest.mark.parametrize("arg1", ["-R", "--recursive"])
+def test_folder_recursive(arg1, tmp_path):
+    """Prepend 'YYYY-MM-DD_' to all files and folders of a tree."""
+    top = tmp_path / TFOLDER
+    (top / "inner").mkdir(parents=True)
+    (top / "inner" / TFILE).write_text("This is a test file.")
+    (top / "2021-09-21_stamped.txt").write_text("This is a test file.")
+    stamps = {}
+    for name in [top / "inner" / TFILE, top / "inner", top]:
+        stamps[name] = query_modification_time(str(name)).split()[0]
+
+    test = getoutput(f"python3 {PROGRAM} {arg1} {top}")
+
+    new_top = tmp_path / "_".join([stamps[top], TFOLDER])
+    new_inner = new_top / "_".join([stamps[top / "inner"], "inner"])
+    assert new_top.is_dir()
+    assert new_inner.is_dir()
+    assert (new_inner / "_".join([stamps[top / "inner" / TFILE], TFILE])).is_file()
+    assert (new_top / "2021-09-21_stamped.txt").is_file()  # no modification
+
+@pytest.mark.folders
+@pytest.mark.remove
+@pytest.mark.parametrize("arg1", [True, False])
+def test_library_directory_handles(arg1, tmp_path, monkeypatch):
+    """Retract stamps in a deep tree with and without folder descriptors, also of folders given differently."""
+    monkeypatch.setattr(date2name, "USE_DIR_FD", arg1 and date2name.USE_DIR_FD)
+    monkeypatch.setattr(date2name.DirectoryHandles, "MAX_OPEN", 2)
+    folder = tmp_path
+    for level in range(5):
+        folder = folder / f"2021-09-21_level{level}"
+        folder.mkdir()
+        (folder / "2021-09-21_test.txt").write_text("This is a test file.")
+
+    date2name.rename_many([str(tmp_path / "2021-09-21_level0") + os.sep],
+                          date2name.RenameConfig(remove=True, recursive=True))
+
+    folder = tmp_path
+    for level in range(5):
+        folder = folder / f"level{level}"
+        assert (folder / "test.txt").is_file()
+
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "2021-09-21_dir").mkdir()
+    for name in ["a", "b"]:
+        (tmp_path / "2021-09-21_dir" / f"2021-09-21_{name}.txt").write_text(name)
+
+    date2name.rename_many(["2021-09-21_dir/2021-09-21_a.txt", "./2021-09-21_dir", "2021-09-21_dir/2021-09-21_b.txt"],
+                          date2name.RenameConfig(remove=True))
+
+    assert sorted(path.name for path in (tmp_path / "dir").iterdir()) == ["2021-09-21_b.txt", "a.txt"]
+
+@pytest.mark.folders
+@pytest.mark.default
+@pytest.mark.parametrize("arg1", ["-j 4", "--jobs 4"])
+def test_folder_parallel(arg1, tmp_path):
+    """Prepend 'YYYY-MM-DD_' to all files and folders of a tree in parallel."""
+    top = tmp_path / TFOLDER
+    for folder in ["a", "b", "c"]:
+        (top / folder / "inner").mkdir(parents=True)
+        (top / folder / "inner" / TFILE).write_text("This is a test file.")
+        os.utime(top / folder, (0, 86400 * 365))  # modified on 1971-01-01
+    day = query_modification_time(str(top / "a" / "inner" / TFILE)).split()[0]
+    folder_day = query_modification_time(str(top / "a")).split()[0]
+
+    test = getoutput(f"python3 {PROGRAM} {arg1} -R {top}")
+
+    for folder in ["a", "b", "c"]:
+        new = tmp_path / "_".join([day, TFOLDER]) / "_".join([folder_day, folder])
+        assert (new / "_".join([day, "inner"]) / "_".join([day, TFILE])).is_file()
+
+@pytest.mark.files
+@pytest.mark.default
+def test_file_parallel_name_too_long(tmp_path):
+    """Do not rename anything in a folder where one name would become too long."""
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    long_name = tmp_path / "a" / ("x" * 250)
+    long_name.write_text("This is a test file.")
+    (tmp_path / "a" / TFILE).write_text("This is a test file.")
+    (tmp_path / "b" / TFILE).write_text("This is a test file.")
+
+    status, output = getstatusoutput(f"python3 {PROGRAM} -j 2 {tmp_path / 'b' / TFILE} "
+                                     f"{long_name} {tmp_path / 'a' / TFILE}")
+
+    assert status == 1
+    assert long_name.is_file()
+    assert (tmp_path / "a" / TFILE).is_file()      # not renamed
+    assert not (tmp_path / "b" / TFILE).is_file()  # renamed
+
+@pytest.mark.files
+@pytest.mark.default
+@pytest.mark.parametrize("arg1", ["-0", "--null"])
+def test_file_stdin_null(arg1, tmp_path):
+    """Prepend 'YYYY-MM-DD_' to all files found by 'find -print0'."""
+    for name in ["a", "with\nnewline", "b"]:
+        (tmp_path / name).write_text("This is a test file.")
+    day = query_modification_time(str(tmp_path / "a")).split()[0]
+
+    status, output = getstatusoutput(f"find {tmp_path} -type f -print0 | python3 {PROGRAM} {arg1}")
+
+    assert status == 0
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted([
+        "_".join([day, name]) for name in ["a", "with\nnewline", "b"]])
+
+@pytest.mark.files
+@pytest.mark.default
+def test_file_stdin_lines(tmp_path):
+    """Handle the files given as arguments and those read line by line from standard input."""
+    for name in ["a", "b", "c"]:
+        (tmp_path / name).write_text("This is a test file.")
+    day = query_modification_time(str(tmp_path / "a")).split()[0]
+
+    status, output = getstatusoutput(f"printf '{tmp_path / 'b'}\\n\\n{tmp_path / 'c'}\\n' | "
+                                     f"python3 {PROGRAM} --stdin {tmp_path / 'a'}")
+
+    assert status == 0
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["_".join([day, name]) for name in "abc"]
+
+def test_read_paths():
+    """Split a stream into paths independently of the chunk size."""
+    import io
+    stream = io.BytesIO(b"first\0\0second one\0third\nline\0")
+
+    assert list(date2name.read_paths(stream, b"\0", chunk_size=3)) == ["first", "second one", "third\nline"]
+
+@pytest.mark.files
+@pytest.mark.default
+def test_file_plan_out_and_apply(tmp_path):
+    """Write a plan without renaming and rename according to it afterwards."""
+    (tmp_path / TFILE).write_text("This is a test file.")
+    (tmp_path / "20210102-stamped.txt").write_text("This is a test file.")
+    day = query_modification_time(str(tmp_path / TFILE)).split()[0]
+    plan = tmp_path.parent / f"{tmp_path.name}.jsonl"
+
+    status, output = getstatusoutput(f"python3 {PROGRAM} --plan-out {plan} "
+                                     f"{tmp_path / '20210102-stamped.txt'} {tmp_path / TFILE}")
+
+    assert status == 0
+    assert (tmp_path / TFILE).is_file()  # nothing renamed yet
+    entries = [json.loads(line) for line in plan.read_text().splitlines()]
+    assert entries[0]["date2name_plan"] == 1
+    assert entries[1:] == [
+        {"dir": str(tmp_path), "old": "20210102-stamped.txt", "new": "2021-01-02-stamped.txt",
+         "source": "name", "kind": "COMPACT"},
+        {"dir": str(tmp_path), "old": TFILE, "new": "_".join([day, TFILE]), "source": "mtime", "kind": None}]
+
+    status, output = getstatusoutput(f"python3 {PROGRAM} --apply-plan {plan}")
+
+    assert status == 0
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["2021-01-02-stamped.txt", "_".join([day, TFILE])]
+
+@pytest.mark.files
+@pytest.mark.default
+def test_file_apply_plan_check_drift(tmp_path):
+    """Skip items of a plan which were modified or removed in the meantime."""
+    for name in ["a", "b", "c"]:
+        (tmp_path / name).write_text("This is a test file.")
+    day = query_modification_time(str(tmp_path / "a")).split()[0]
+    plan = tmp_path.parent / f"{tmp_path.name}.jsonl"
+    getoutput(f"python3 {PROGRAM} --plan-out {plan} {tmp_path / 'a'} {tmp_path / 'b'} {tmp_path / 'c'}")
+    os.utime(tmp_path / "b", (0, 86400 * 365))  # modified on 1971-01-01
+    (tmp_path / "c").unlink()
+
+    status, output = getstatusoutput(f"python3 {PROGRAM} --apply-plan {plan} --check-drift")
+
+    assert status == 0
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["_".join([day, "a"]), "b"]
+
+@pytest.mark.folders
+@pytest.mark.default
+@pytest.mark.parametrize("arg1", ["", "-j 2"])
+def test_folder_journal_undo(arg1, tmp_path):
+    """Restore the original names of a tree from a journal."""
+    top = tmp_path / TFOLDER
+    (top / "inner").mkdir(parents=True)
+    (top / "inner" / TFILE).write_text("This is a test file.")
+    (top / "20210102-stamped.txt").write_text("This is a test file.")
+    before = sorted(path.relative_to(tmp_path) for path in tmp_path.rglob("*"))
+    journal = tmp_path.parent / f"{tmp_path.name}.journal"
+
+    getoutput(f"python3 {PROGRAM} {arg1} -R --journal {journal} {top}")
+    assert len(journal.read_text().splitlines()) == 4
+    with journal.open("a") as stream:
+        stream.write('{"dir": "/cut off by a cra')
+
+    status, output = getstatusoutput(f"python3 {PROGRAM} --undo {journal}")
+
+    assert status == 0
+    assert sorted(path.relative_to(tmp_path) for path in tmp_path.rglob("*")) == before
+
+def test_read_journal():
+    """Read a journal backwards independently of the chunk size."""
+    import io
+    stream = io.BytesIO(b'{"old": "a"}\n\n{"old": "b"}\n{"old": "c"}\n{"ol')
+
+    assert [entry["old"] for entry in date2name.read_journal(stream, chunk_size=5)] == ["c", "b", "a"]
+
+def test_renamer():
+    """Build the Renamer of a configuration once and stamp names with its delimiter policy."""
+    stat_result = os.stat_result((0o100644, 0, 0, 1, 0, 0, 0, 0, 86400 * 365 + 43200, 0))
+    config = date2name.RenameConfig(compact=True)
+    renamer = config.renamer
+
+    assert config.renamer is renamer
+    assert renamer.unchanged_kinds == {"COMPACT", "SHORT"}
+    assert renamer.stamp(renamer.formatstring, "a b", stat_result) == "19710101 a b"
+    assert renamer.stamp(renamer.formatstring, "ab", stat_result) == "19710101_ab"
+    assert date2name.RenameConfig(delimiter="--").renamer.stamp("%Y", "a b", stat_result) == "1971--a b"
+
+@pytest.mark.parametrize("zone", ["Europe/Vienna", "America/St_Johns", "Asia/Kathmandu", "Australia/Lord_Howe"])
+@pytest.mark.parametrize("option", ["compact", "month", "withtime"])
+def test_renamer_format_time(zone, option, monkeypatch):
+    """Memoize datestamps without mixing up days around midnight and DST transitions."""
+    if not os.path.exists(os.path.join("/usr/share/zoneinfo", zone)):
+        pytest.skip(f"no time zone data for {zone}")
+    monkeypatch.setenv("TZ", zone)
+    time.tzset()
+    try:
+        renamer = date2name.RenameConfig(**{option: True}).renamer
+        for start in range(1616800000, 1617100000, 67):  # around 2021-03-28
+            for timestamp in [start, start + 0.5]:
+                assert renamer.format_time(timestamp) == time.strftime(renamer.formatstring,
+                                                                       time.localtime(timestamp))
+        assert renamer.hits > 0
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+@pytest.mark.files
+@pytest.mark.default
+def test_file_json_log(tmp_path):
+    """Log every renamed item as a JSON object to a file instead of the console."""
+    (tmp_path / TFILE).write_text("This is a test file.")
+    day = query_modification_time(str(tmp_path / TFILE)).split()[0]
+    log = tmp_path.parent / f"{tmp_path.name}.log"
+
+    status, output = getstatusoutput(f"python3 {PROGRAM} --log-format json --log-file {log} {tmp_path / TFILE}")
+
+    assert status == 0
+    assert output == ""
+    entries = [json.loads(line) for line in log.read_text().splitlines()]
+    assert len(entries) == 1
+    assert entries[0]["level"] == "INFO"
+    assert entries[0]["item"] == str(tmp_path / TFILE)
+    assert entries[0]["new_basename"] == "_".join([day, TFILE])
+    assert (tmp_path / "_".join([day, TFILE])).is_file()
+
+@pytest.mark.parametrize("argv", [["-sC", "a"], ["--jobs=2", "-v", "a", "b"], ["-j", "3", "--", "-s"],
+                                  ["--log-format", "json", "--delimiter", "-", "a"], []])
+def test_parse_arguments(argv):
+    """Parse the command line like the OptionParser of date2name."""
+    options, args = date2name.parse_arguments(argv)
+    expected_options, expected_args = date2name.build_parser().parse_args(argv)
+    assert vars(options) == vars(expected_options)
+    assert args == expected_args
+
+def test_startup():
+    """Import date2name without its deferred modules and within the budget of the startup benchmark."""
+    status, output = getstatusoutput("python3 benchmarks/bench_startup.py --check --repeat 5")
+    assert "deferred modules imported none" in output
+    assert status == 0, output
+
+def test_handle_request(tmp_path):
+    """Answer rename requests of the server with the renames or an error message."""
+    (tmp_path / TFILE).write_text("This is a test file.")
+    day = query_modification_time(str(tmp_path / TFILE)).split()[0]
+    config = date2name.RenameConfig(dryrun=True)
+    configs = {}
+
+    response = date2name.handle_request({"paths": [TFILE], "cwd": str(tmp_path), "options": {"compact": True}},
+                                        config, configs)
+    assert response == {"renames": [[str(tmp_path / TFILE), str(tmp_path / "_".join([day.replace("-", ""), TFILE]))]]}
+    assert (tmp_path / TFILE).is_file()
+    renamer = next(iter(configs)).renamer
+    date2name.handle_request({"paths": [], "options": {"compact": True}}, config, configs)
+    assert next(iter(configs)).renamer is renamer
+
+    assert "error" in date2name.handle_request({"paths": TFILE}, config, configs)
+    assert "error" in date2name.handle_request({"paths": [], "options": {"compact": True, "month": True}},
+                                               config, configs)
+    assert "error" in date2name.handle_request({"paths": [], "options": {"bogus": True}}, config, configs)
+    for request in [{"paths": [5]}, {"paths": [TFILE], "cwd": 5}, {"paths": [None]}]:
+        assert date2name.handle_request(request, config, configs)["error"].startswith("invalid request")
+    assert (tmp_path / TFILE).is_file()
+
+def test_serve_connection(monkeypatch):
+    """Answer every request of a connection, also when handling one fails unexpectedly."""
+    import socket
+    def fail(*args):
+        raise RuntimeError("unexpected")
+    monkeypatch.setattr(date2name, "iter_renames", fail)
+    server, client = socket.socketpair()
+    thread = threading.Thread(target=date2name.serve_connection,
+                              args=(server, date2name.RenameConfig(dryrun=True), {}))
+    thread.start()
+    with client, client.makefile("rb") as responses:
+        client.sendall(b'{"paths": ["a.txt"]}\n{"paths": [5]}\nnot json\n')
+        client.shutdown(socket.SHUT_WR)
+        errors = [json.loads(line)["error"] for line in responses]
+    thread.join()
+    assert [error.split(":")[0] for error in errors] == ["request failed", "invalid request", "invalid request"]
+
+@pytest.mark.files
+@pytest.mark.default
+def test_file_serve(tmp_path):
+    """Rename a file by the client shim of a server started with --serve."""
+    (tmp_path / TFILE).write_text("This is a test file.")
+    day = query_modification_time(str(tmp_path / TFILE)).split()[0]
+    socket_path = tmp_path / "date2name.sock"
+    server = subprocess.Popen(["python3", PROGRAM, "--quiet", "--serve", str(socket_path)])
+    try:
+        for attempt in range(500):
+            if socket_path.exists():
+                break
+            time.sleep(0.01)
+
+        status, output = getstatusoutput(f"python3 -S ./date2name/client.py --socket {socket_path} {tmp_path / TFILE}")
+
+        assert status == 0
+        assert output.endswith("_".join([day, TFILE]))
+        assert (tmp_path / "_".join([day, TFILE])).is_file()
+        status, output = getstatusoutput(f"python3 -S ./date2name/client.py --socket {socket_path} -C -M {TFILE}")
+        assert status == 1
+        assert "please use either the default, short, month, or withtime format" in output
+    finally:
+        server.terminate()
+        assert server.wait() == 0
+    assert not socket_path.exists()
+
+@pytest.mark.parametrize("basename, options, expected", [
+    ("2021-01-31_test.txt", {}, True),
+    ("20210131_test.txt", {}, False),
+    ("20210131_test.txt", {"compact": True}, True),
+    ("test.txt", {}, False),
+    ("2021-01-31_test.txt", {"nocorrections": True}, False),
+    ("2021-01-31T12.00.00_test.txt", {"withtime": True}, True),
+    ("2021-01-31T12:00:00_test.txt", {"withtime": True}, False),
+    ("test.txt", {"remove": True}, True),
+    ("2021-01-31_test.txt", {"remove": True}, False)])
+def test_keeps_basename(basename, options, expected):
+    """Tell by the name alone whether an item keeps it."""
+    assert date2name.keeps_basename(basename, date2name.RenameConfig(**options)) is expected
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is only available on Linux")
+def test_watch(tmp_path):
+    """Stamp new files as they arrive in a watched directory."""
+    import shutil
+    import threading
+
+    watched = tmp_path / "incoming"
+    watched.mkdir()
+    watcher = threading.Thread(target=date2name.watch, args=([str(watched)], date2name.RenameConfig(), None, 0.05))
+    watcher.start()
+    time.sleep(0.2)
+    (watched / TFILE).write_text("This is a test file.")
+    (watched / "2021-01-31_stamped.txt").write_text("This is a stamped test file.")
+    (tmp_path / "moved.txt").write_text("This is a moved test file.")
+    (tmp_path / "moved.txt").rename(watched / "moved.txt")
+    day = query_modification_time(str(watched / TFILE)).split()[0]
+
+    for attempt in range(100):
+        if len(list(watched.glob(f"{day}_*"))) == 2:
+            break
+        time.sleep(0.05)
+    names = sorted(path.name for path in watched.iterdir())
+    shutil.rmtree(watched)
+    watcher.join(5)
+
+    assert not watcher.is_alive()
+    assert names == sorted(["2021-01-31_stamped.txt", "_".join([day, TFILE]), "_".join([day, "moved.txt"])])
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is only available on Linux")
+def test_watch_steady_stream(tmp_path):
+    """Stamp a new file after the debounce time while events of items which are skipped keep arriving."""
+    import shutil
+    import threading
+
+    watched = tmp_path / "incoming"
+    watched.mkdir()
+    watcher = threading.Thread(target=date2name.watch, args=([str(watched)], date2name.RenameConfig(), None, 0.1))
+    watcher.start()
+    time.sleep(0.2)
+    (watched / TFILE).write_text("This is a test file.")
+    day = query_modification_time(str(watched / TFILE)).split()[0]
+
+    writer = subprocess.Popen(["sh", "-c", "while :; do echo x > 2021-01-31_log.txt; done"], cwd=watched)
+    start = time.monotonic()
+    while time.monotonic() < start + 2 and not (watched / "_".join([day, TFILE])).is_file():
+        time.sleep(0.01)
+    handled = time.monotonic() - start
+    writer.kill()
+    writer.wait()
+    shutil.rmtree(watched)
+    watcher.join(5)
+
+    assert not watcher.is_alive()
+    assert handled < 0.6  # not ten times the debounce time
+
+def test_index(tmp_path):
+    """Skip the items handled by an earlier run until they change."""
+    for name in ["a.txt", "2021-01-31_b.txt", "2021-01-31_c.txt"]:
+        (tmp_path / name).write_text("This is a test file.")
+    day = query_modification_time(str(tmp_path / "a.txt")).split()[0]
+    paths = lambda: sorted(str(path) for path in tmp_path.glob("*.txt"))
+    config = date2name.RenameConfig()
+    index_path = str(tmp_path / "index")
+
+    index = date2name.Index(index_path, config)
+    assert date2name.rename_many(paths(), config, index=index) == [(str(tmp_path / "a.txt"),
+                                                                   str(tmp_path / f"{day}_a.txt"))]
+    index.save()
+
+    os.utime(tmp_path / "2021-01-31_b.txt", ns=(0, 1700000000 * 10 ** 9))
+    (tmp_path / "2021-01-31_c.txt").unlink()
+    index = date2name.Index(index_path, config)
+    assert len(index.keys) == 3
+    assert date2name.rename_many(paths(), config, index=index) == []
+    assert index.hits == 1
+    index.save()
+    assert len(date2name.Index(index_path, config).keys) == 2
+
+    assert len(date2name.Index(index_path, config._replace(compact=True)).keys) == 0
+    with open(index_path, "ab") as index_file:
+        index_file.write(b"\0")
+    assert len(date2name.Index(index_path, config).keys) == 0
+
+@pytest.mark.files
+@pytest.mark.default
+def test_file_index(tmp_path):
+    """Report nothing about a file the index knows."""
+    (tmp_path / TFILE).write_text("This is a test file.")
+    day = query_modification_time(str(tmp_path / TFILE)).split()[0]
+    new_file = tmp_path / "_".join([day, TFILE])
+
+    status, output = getstatusoutput(f"python3 {PROGRAM} --index {tmp_path / 'index'} {tmp_path / TFILE}")
+    assert status == 0
+    assert new_file.is_file()
+    status, output = getstatusoutput(f"python3 {PROGRAM} --index {tmp_path / 'index'} {new_file}")
+    assert status == 0
+    assert output == ""
+
+@pytest.mark.folders
+@pytest.mark.default
+@pytest.mark.parametrize("pipeline", [1, 4])
+def test_folder_pipeline(pipeline, tmp_path):
+    """Rename a tree with the asynchronous pipeline like sequentially."""
+    trees = []
+    for name in ["sequential", "pipeline"]:
+        top = tmp_path / name / TFOLDER
+        for folder in ["a", "b"]:
+            (top / folder / "inner").mkdir(parents=True)
+            for file in [TFILE, "2021-01-31_" + TFILE, "20210131_x.txt"]:
+                (top / folder / "inner" / file).write_text("This is a test file.")
+                (top / folder / file).write_text("This is a test file.")
+        for path in [top, *top.rglob("*")]:
+            os.utime(path, (0, 86400 * 365))  # modified on 1971-01-01
+        trees.append(tmp_path / name)
+
+    sequential = date2name.rename_many([str(trees[0] / TFOLDER)], date2name.RenameConfig(recursive=True))
+    pipelined = date2name.rename_many([str(trees[1] / TFOLDER)],
+                                      date2name.RenameConfig(recursive=True, pipeline=pipeline))
+
+    assert len(sequential) == 13
+    assert pipelined == [(old.replace("sequential", "pipeline"), new.replace("sequential", "pipeline"))
+                         for old, new in sequential]
+    assert sorted(path.relative_to(trees[1]) for path in trees[1].rglob("*")) == \
+        sorted(path.relative_to(trees[0]) for path in trees[0].rglob("*"))
+
+@pytest.mark.files
+@pytest.mark.default
+def test_file_pipeline_name_too_long(tmp_path):
+    """Stop the pipeline at a name which would become too long."""
+    long_name = tmp_path / ("x" * 250)
+    long_name.write_text("This is a test file.")
+    for name in ["a", "b"]:
+        (tmp_path / name).write_text("This is a test file.")
+
+    status, output = getstatusoutput(f"python3 {PROGRAM} --pipeline 2 {tmp_path / 'a'} {long_name} {tmp_path / 'b'}")
+
+    assert status == 1
+    assert long_name.is_file()
+    assert not (tmp_path / "a").is_file()  # renamed
+    assert (tmp_path / "b").is_file()      # not renamed
+
+@pytest.mark.parametrize("renameat2", [True, False])
+def test_rename_noclobber(renameat2, tmp_path, monkeypatch):
+    """Never replace an existing item, with renameat2() and with its fallback."""
+    if not renameat2:
+        monkeypatch.setattr(date2name, "RENAMEAT2", False)
+    for name in ["a", "b"]:
+        (tmp_path / name).write_text(name)
+        (tmp_path / (name + "_dir")).mkdir()
+
+    with pytest.raises(FileExistsError):
+        date2name.rename_noclobber(str(tmp_path / "a"), str(tmp_path / "b"))
+    with pytest.raises(FileExistsError):
+        date2name.rename_noclobber(str(tmp_path / "a_dir"), str(tmp_path / "b_dir"))
+    date2name.rename_noclobber(str(tmp_path / "a"), str(tmp_path / "c"))
+    date2name.rename_noclobber(str(tmp_path / "a_dir"), str(tmp_path / "c_dir"))
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["b", "b_dir", "c", "c_dir"]
+    assert (tmp_path / "b").read_text() == "b"
+    assert (tmp_path / "c").read_text() == "a"
+
+@pytest.mark.files
+@pytest.mark.default
+@pytest.mark.parametrize("arg1", ["", "-j 2", "--pipeline 2"])
+def test_file_noclobber(arg1, tmp_path):
+    """Skip or number the items whose new name is taken, within the run or on disk."""
+    for name in ["2021-01-31_a.txt", "20210131_a.txt", "b.txt"]:
+        (tmp_path / name).write_text(name)
+    day = query_modification_time(str(tmp_path / "b.txt")).split()[0]
+    (tmp_path / f"{day}_b.txt").write_text("existing")
+    items = " ".join(str(tmp_path / name) for name in ["2021-01-31_a.txt", "20210131_a.txt", "b.txt"])
+
+    status, output = getstatusoutput(f"python3 {PROGRAM} {arg1} --no-clobber {items}")
+    assert status == 0
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted([
+        "2021-01-31_a.txt", "20210131_a.txt", "b.txt", f"{day}_b.txt"])
+
+    status, output = getstatusoutput(f"python3 {PROGRAM} {arg1} --collision-suffix=_%i {items}")
+    assert status == 0
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted([
+        "2021-01-31_a.txt", "2021-01-31_a_2.txt", f"{day}_b.txt", f"{day}_b_2.txt"])
+    assert (tmp_path / "2021-01-31_a_2.txt").read_text() == "20210131_a.txt"
+    assert (tmp_path / f"{day}_b.txt").read_text() == "existing"
+
+def test_plan_batch():
+    """Order chains of renames from their end and break cycles with a temporary name."""
+    config = date2name.RenameConfig(batch=True)
+    planned = [(0, "a", "b", None), (1, "b", "c", None), (2, "x", "y", None), (3, "y", "x", None),
+               (4, "k", "k", None), (5, "m", "k", None), (6, "n", "o", None), (7, "p", "o", None)]
+
+    steps = date2name.plan_batch("", planned, ["q"], config)
+
+    temporary = steps[3][3]
+    assert temporary.startswith(".date2name-")
+    assert steps == [(4, "k", "k", "k", None),
+                     (1, "b", "b", "c", None), (0, "a", "a", "b", None),
+                     (None, "x", "x", temporary, None), (3, "y", "y", "x", None), (2, "x", temporary, "y", None)]
+    steps = date2name.plan_batch("", planned + [(8, "r", "q", None)], ["q"],
+                                 date2name.RenameConfig(batch=True, noclobber=True, collision_suffix="_%i"))
+    assert [step for step in steps if step[0] in (5, 6, 7, 8)] == [
+        (5, "m", "m", "k_2", None), (6, "n", "n", "o", None), (7, "p", "p", "o_2", None), (8, "r", "r", "q_2", None)]
+    steps = date2name.plan_batch("", [(0, "s", "t", None), (1, "t", "u", None), (2, "v", "u", None),
+                                      (3, "w", "s", None)], [], config)
+    assert steps == []  # t and v stay, so s stays, so w stays
+
+@pytest.mark.files
+@pytest.mark.remove
+@pytest.mark.parametrize("arg1", ["--batch", "--batch -j 2"])
+def test_file_batch(arg1, tmp_path):
+    """Skip items stripped down to the same name, whatever their order, and those taking their names."""
+    for order in [["2021-03-04_foo", "20210304_foo", "2021-03-05_bar"],
+                  ["20210304_foo", "2021-03-05_bar", "2021-03-04_foo"]]:
+        for name in order:
+            (tmp_path / name).write_text(name)
+
+        status, output = getstatusoutput(f"python3 {PROGRAM} -r {arg1} " +
+                                         " ".join(str(tmp_path / name) for name in order))
+
+        assert status == 0
+        assert output.count("ERROR") == 2
+        assert sorted(path.name for path in tmp_path.iterdir()) == ["2021-03-04_foo", "20210304_foo", "bar"]
+        for path in tmp_path.iterdir():
+            path.unlink()
+
+    names = ["2021-01-01_2021-01-02_x", "2021-01-02_x", "2021-01-03_x"]
+    for name in names:
+        (tmp_path / name).write_text(name)
+    status, output = getstatusoutput(f"python3 {PROGRAM} -r {arg1} " + " ".join(str(tmp_path / name) for name in names))
+    assert status == 0
+    assert output.count("ERROR") == 3
+    assert all((tmp_path / name).read_text() == name for name in names)
+
+@pytest.mark.files
+@pytest.mark.remove
+@pytest.mark.parametrize("arg1", ["", "--check-drift"])
+def test_file_batch_plan(arg1, tmp_path):
+    """Replay a plan of a batch in the order of its renames."""
+    names = ["2021-01-01_2021-01-02_x", "2021-01-02_x"]
+    for name in names:
+        (tmp_path / name).write_text(name)
+
+    status, output = getstatusoutput(f"python3 {PROGRAM} -r --batch --plan-out {tmp_path / 'plan.jsonl'} " +
+                                     " ".join(str(tmp_path / name) for name in names))
+    assert status == 0
+    status, output = getstatusoutput(f"python3 {PROGRAM} --apply-plan {tmp_path / 'plan.jsonl'} {arg1}")
+
+    assert status == 0
+    assert (tmp_path / "x").read_text() == "2021-01-02_x"
+    assert (tmp_path / "2021-01-02_x").read_text() == "2021-01-01_2021-01-02_x"
+
+def test_plan_store():
+    """Read renames back from a PlanStore in the order added and in input order, and items from a Shard."""
+    store = date2name.PlanStore()
+    assert list(store.ordered()) == []
+    entries = [(4, "b", "x", "2021-01-31_x"), (5, "b", "y", "2021-01-31_y"), (0, "a", "ä", "2021-01-31_ä"),
+               (2, "a", "\udcff", "2021-01-31_\udcff"), (1, "", "z", "2021-01-31_z"), (3, "b", "w", "2021-01-31_w")]
+    for entry in entries:
+        store.add(*entry)
+
+    assert len(store) == 6
+    assert list(store) == [entry[1:] for entry in entries]
+    assert list(store.ordered()) == [entry[1:] for entry in sorted(entries)]
+    assert len(store.directories) == 3
+
+    import stat
+    stat_result = os.stat(".")
+    shard = date2name.Shard(os.getcwd(), "")
+    for position, basename, result, mode in [(3, "ä", None, stat.S_IFREG), (5, "\udcff", stat_result, stat.S_IFDIR),
+                                             (8, "z", None, 0)]:
+        shard.add(position, basename, result, mode)
+    assert len(shard) == 3
+    assert list(shard) == [(3, "ä", None, stat.S_IFREG), (5, "\udcff", stat_result, stat.S_IFDIR), (8, "z", None, 0)]
+
+def make_tiff(order, tag, value):
+    """Return a TIFF structure holding the ASCII value of tag, in the Exif IFD unless tag is DateTime."""
+    byteorder = {"II": "little", "MM": "big"}[order]
+
+    def ifd(tag, kind, count, value):
+        fields = [(1, 2), (tag, 2), (kind, 2), (count, 4), (value, 4), (0, 4)]
+        return b"".join(number.to_bytes(size, byteorder) for number, size in fields)
+
+    data = order.encode() + (42).to_bytes(2, byteorder) + (8).to_bytes(4, byteorder)
+    if tag != 0x0132:
+        data += ifd(0x8769, 4, 1, 26)
+    return data + ifd(tag, 2, len(value), len(data) + 18) + value
+
+def make_jpeg(tiff):
+    """Return a JPEG with an APP0 segment and the EXIF tiff."""
+    exif = b"Exif\x00\x00" + tiff
+    return (b"\xff\xd8\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00" +
+            b"\xff\xe1" + (len(exif) + 2).to_bytes(2, "big") + exif + b"\xff\xda\x00\x02" + b"\x00" * 64)
+
+def test_read_embedded_time(tmp_path):
+    """Read the time embedded in photos, movies, and PDFs without reading their content."""
+    taken = datetime(2019, 6, 1, 10, 20, 30).timestamp()
+    (tmp_path / "exif.jpg").write_bytes(make_jpeg(make_tiff("MM", 0x9003, b"2019:06:01 10:20:30\x00")))
+    (tmp_path / "raw.cr2").write_bytes(make_tiff("II", 0x0132, b"2019:06:01 10:20:30\x00"))
+    (tmp_path / "no-clock.jpg").write_bytes(make_jpeg(make_tiff("II", 0x9003, b"0000:00:00 00:00:00\x00")))
+    (tmp_path / "no-exif.jpg").write_bytes(b"\xff\xd8\xff\xda\x00\x02" + b"\x00" * 64)
+    (tmp_path / "short.jpg").write_bytes(b"\xff\xd8\xff\xe1\x00\x01" + b"\x00" * 64)
+    (tmp_path / "notes.txt").write_text("2019:06:01 10:20:30")
+
+    with open(tmp_path / "movie.mov", "wb") as movie:
+        media_size = 3 * 2 ** 30  # sparse, skipped by its 64 bit size
+        movie.write(b"\x00\x00\x00\x10ftypqt  \x00\x00\x02\x00")
+        movie.write((1).to_bytes(4, "big") + b"mdat" + (16 + media_size).to_bytes(8, "big"))
+        movie.seek(media_size, os.SEEK_CUR)
+        mvhd = b"\x01\x00\x00\x00" + (1559384430 + 2082844800).to_bytes(8, "big") + bytes(100)
+        movie.write((16 + len(mvhd)).to_bytes(4, "big") + b"moov" +
+                    (8 + len(mvhd)).to_bytes(4, "big") + b"mvhd" + mvhd)
+
+    (tmp_path / "document.pdf").write_bytes(b"%PDF-1.4\n" + b"%" * 100000 +
+                                            b"trailer << /Info << /CreationDate (D:20190601122030+02'00') >> >>")
+    (tmp_path / "local.pdf").write_bytes(b"%PDF-1.7\n<< /CreationDate(D:20190601102030) >>")
+
+    assert date2name.read_embedded_time(str(tmp_path / "exif.jpg")) == taken
+    assert date2name.read_embedded_time(str(tmp_path / "raw.cr2")) == taken
+    assert date2name.read_embedded_time(str(tmp_path / "movie.mov")) == 1559384430
+    assert date2name.read_embedded_time(str(tmp_path / "document.pdf")) == 1559384430
+    assert date2name.read_embedded_time(str(tmp_path / "local.pdf")) == taken
+    for name in ["no-clock.jpg", "no-exif.jpg", "short.jpg", "notes.txt", "missing.jpg"]:
+        assert date2name.read_embedded_time(str(tmp_path / name)) is None
+
+@pytest.mark.files
+@pytest.mark.default
+def test_file_meta(tmp_path):
+    """Take the capture time of photos and the modification time of other files."""
+    (tmp_path / "photo.jpg").write_bytes(make_jpeg(make_tiff("II", 0x9003, b"2019:06:01 10:20:30\x00")))
+    (tmp_path / "notes.txt").write_text("notes")
+    day = query_modification_time(str(tmp_path / "notes.txt")).split()[0]
+
+    status, output = getstatusoutput(f"python3 {PROGRAM} --meta {tmp_path / 'photo.jpg'} {tmp_path / 'notes.txt'}")
+
+    assert status == 0
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(["2019-06-01_photo.jpg", f"{day}_notes.txt"])
+
+@pytest.mark.files
+def test_library_meta_pipeline(tmp_path, monkeypatch):
+    """Read the embedded times of the pipeline within its threads instead of its event loop."""
+    (tmp_path / "photo.jpg").write_bytes(make_jpeg(make_tiff("II", 0x9003, b"2019:06:01 10:20:30\x00")))
+    threads = []
+    read_embedded_time = date2name.read_embedded_time
+    monkeypatch.setattr(date2name, "read_embedded_time",
+                        lambda path: threads.append(threading.current_thread()) or read_embedded_time(path))
+
+    renamed = date2name.rename_many([str(tmp_path / "photo.jpg")], date2name.RenameConfig(meta=True, pipeline=2))
+
+    assert renamed == [(str(tmp_path / "photo.jpg"), str(tmp_path / "2019-06-01_photo.jpg"))]
+    assert threads and threading.main_thread() not in threads
+
+def test_run_stats(tmp_path, monkeypatch):
+    """Count the kinds of datestamps, the outcomes, and the items per phase while STATS is set."""
+    for name in ["a.txt", "2021-01-31_b.txt", "20210131_c.txt", "1d.txt"]:
+        (tmp_path / name).write_text(name)
+    (tmp_path / "folder").mkdir()
+    stats = date2name.RunStats()
+    monkeypatch.setattr(date2name, "STATS", stats)
+
+    date2name.rename_many([str(tmp_path)], date2name.RenameConfig(recursive=True, onlyfiles=True))
+
+    assert dict((kind, number) for kind, number in stats.kinds.items() if number) == {
+        "NODATESTAMP": 1, "STANDARD": 1, "COMPACT": 1, "other": 1}
+    assert stats.outcomes == {"renamed": 3, "unchanged": 1, "skipped": 2, "errors": 0}
+    assert stats.items["discover"] == 5
+    assert stats.items["classify"] == 4
+    assert stats.items["format"] == 3
+    assert stats.items["rename"] == 4
+    assert "renamed" in stats.report()
+
+@pytest.mark.files
+@pytest.mark.default
+def test_file_stats_profile(tmp_path):
+    """Print the statistics to standard error and write a profile readable by pstats."""
+    import pstats
+    prepare_testfile(str(tmp_path / "a.txt"))
+    profile = tmp_path / "run.prof"
+
+    status, output = getstatusoutput(f"python3 {PROGRAM} --quiet --stats --profile {profile} " +
+                                     f"{tmp_path / 'a.txt'} {tmp_path / 'missing.txt'}")
+
+    assert status == 0
+    assert "1 renamed, 0 unchanged, 0 skipped, 1 errors" in output
+    assert "rename" in output.splitlines()[-1]
+    assert any("handle_item" in function for filename, line, function in pstats.Stats(str(profile)).stats)
+
+def test_classify_many(monkeypatch):
+    """Agree with classify_basename() and remove_timestamp_from_basename() name by name."""
+    import random
+    rand = random.Random(42)
+    stamps = ["%Y-%m-%dT%H.%M.%S", "%Y-%m-%dT%H.%M", "%Y-%m-%d", "%Y%m%d", "%y%m%d", "%Y-%m", "%Y-%m-%d %H:%M"]
+    pieces = ["2021", "21", "-", "01", "13", "31", "T", ".", "_", " ", "\t", "x", "a.txt", "٢", "\x1f", ""]
+    names = [time.strftime(rand.choice(stamps), time.localtime(rand.randrange(-10 ** 9, 2 * 10 ** 9))) +
+             "".join(rand.choice(pieces) for _ in range(rand.randrange(5))) for _ in range(3000)]
+    names += ["".join(rand.choice(pieces) for _ in range(rand.randrange(8))) for _ in range(2000)]
+    names += ["2021-01-31T10.20.30_a", "2021-01-31T10.20 b", "2021-01-31_c ", "20210131 d", "690131_e",
+              "680131_f", "2021-01_g", "2021-01-31_", "a\0b", "2021-01-31_\0"]
+    monkeypatch.setattr(date2name, "BULK_CHUNK", 97)
+
+    columns = date2name.classify_many(iter(names))
+
+    assert len(columns) == len(names)
+    for index, name in enumerate(names):
+        datestamp = date2name.classify_basename(name)
+        assert columns.kind(index) == (datestamp.kind if datestamp is not None else None)
+        if datestamp is not None and datestamp.kind != "NODATESTAMP":
+            assert [getattr(columns, field)[index] for field in columns.FIELDS] == [
+                int(value) if value is not None else -1 for value in
+                (datestamp.year, datestamp.month, datestamp.day, datestamp.hour, datestamp.minute, datestamp.second)]
+            assert columns.lengths[index] == datestamp.length
+    assert sum(columns.counts().values()) == len(names)
+    assert date2name.strip_many(names) == [date2name.remove_timestamp_from_basename(name) for name in names]
+    assert date2name.strip_many([]) == [] and len(date2name.classify_many([])) == 0
+
+def test_stat_source(tmp_path, monkeypatch):
+    """Take the times and types of listed items from the listing and stat the others."""
+    import stat
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "tree" / "folder").mkdir(parents=True)
+    for name in ["a.txt", "b.txt", "c.txt", "link.txt", "unlisted.txt"]:
+        (tmp_path / "tree" / name).write_text(name)
+    (tmp_path / "listing").write_bytes(b"f 1559384430.5 tree/a.txt\0" +
+                                       b"d 1262304000 ./tree/folder/\0" +
+                                       b"1600000000 " + bytes(tmp_path / "tree" / "b.txt") + b"\0" +
+                                       b"f 1 tree/c.txt\0f 1700000000.123456789123 tree/c.txt\0" +
+                                       b"l 1 tree/link.txt\0not a record\0\0")
+    (tmp_path / "listing.txt").write_bytes(b"f 1559384430 tree/a.txt\n\n")
+    source = date2name.StatSource("listing")
+    config = date2name.RenameConfig(stat_source="listing")
+
+    assert len(source) == 4 and len(date2name.StatSource("listing.txt")) == 1
+    assert "tree/folder" in source and str(tmp_path / "tree" / "folder") in source
+    assert "tree/link.txt" not in source and "tree/unlisted.txt" not in source
+    assert date2name.stat_item("tree/a.txt", config).st_mtime == 1559384430.5
+    assert stat.S_ISDIR(date2name.stat_item("tree/folder", config).st_mode)
+    assert stat.S_ISREG(date2name.stat_item("tree/b.txt", config).st_mode)
+    assert date2name.stat_item("tree/c.txt", config).st_mtime_ns == 1700000000123456789
+    assert date2name.stat_item("tree/link.txt", config).st_ino == os.stat("tree/link.txt").st_ino
+
+    with monkeypatch.context() as patch:
+        patch.setattr(date2name, "hash", lambda path: 0, raising=False)  # all keys collide
+        colliding = date2name.StatSource("listing")
+    assert len(colliding) == 4 and "tree/unlisted.txt" not in colliding
+    for path in ["tree/a.txt", "tree/folder", "tree/b.txt", "tree/c.txt"]:
+        assert colliding.times[colliding.find(path)] == source.times[source.find(path)]
+
+    stamped = [time.strftime("%Y-%m-%d_", time.localtime(os.stat(path).st_mtime)) + os.path.basename(path)
+               for path in ["tree", "tree/link.txt", "tree/unlisted.txt"]]
+    renames = date2name.rename_many(["tree"], config._replace(recursive=True))
+
+    assert sorted(os.path.basename(new_path) for path, new_path in renames) == sorted(
+        ["2010-01-01_folder", "2019-06-01_a.txt", "2020-09-13_b.txt", "2023-11-14_c.txt"] + stamped)
+
+    (tmp_path / "x" / "same").mkdir(parents=True)
+    (tmp_path / "y").mkdir()
+    (tmp_path / "y" / "same").write_text("same")
+    (tmp_path / "same.listing").write_bytes(b"d 1559384430 x/same\0f 1559384430 y/same\0")
+    config = date2name.RenameConfig(onlyfiles=True, stat_source="same.listing")
+    index = date2name.Index(str(tmp_path / "index"), config)
+    assert date2name.rename_many(["x/same"], config, index=index) == []
+    index.save()
+    index = date2name.Index(str(tmp_path / "index"), config)  # listed items have no inode, but a path
+    assert date2name.rename_many(["y/same"], config, index=index) == [("y/same", "y/2019-06-01_same")]
+
+@pytest.mark.files
+@pytest.mark.default
+def test_file_stat_source(tmp_path):
+    """Take the time of a file from the listing, skip listed files which vanished, and fail on a missing listing."""
+    prepare_testfile(str(tmp_path / "a.txt"))
+    (tmp_path / "listing").write_bytes(b"f 1559384430 " + bytes(tmp_path / "a.txt") + b"\0")
+
+    status, output = getstatusoutput(f"python3 {PROGRAM} --stat-source {tmp_path / 'missing'} {tmp_path / 'a.txt'}")
+    assert status == 1
+    assert "No such file or directory" in output
+
+    status, output = getstatusoutput(f"python3 {PROGRAM} --stat-source {tmp_path / 'listing'} {tmp_path / 'a.txt'}")
+    assert status == 0
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["2019-06-01_a.txt", "listing"]
+
+    for options in ["", "-j 2", "--pipeline 2"]:
+        status, output = getstatusoutput(f"python3 {PROGRAM} {options} --stat-source {tmp_path / 'listing'} "
+                                         f"{tmp_path / 'a.txt'}")  # listed but renamed meanwhile
+        assert status == 0
+        assert "a.txt: is no file or directory" in output and "Traceback" not in output
+
+def test_stamp_template():
+    """Format like strftime(), recognize the datestamps again, and convert built-in datestamps."""
+    for template in ["%Y%m%d", "%Y-%m-%dT%H.%M.%S", "%y%j %%%a", "%G-W%V-%u", "%d.%B %Y %I%p"]:
+        stamp_template = date2name.StampTemplate(template)
+        for timestamp in range(0, 2000000000, 12345678):
+            struct_time = time.localtime(timestamp)
+            datestamp = stamp_template.format(struct_time)
+            assert datestamp == time.strftime(template, struct_time)
+            assert stamp_template.match(datestamp + "_name.txt").group("TEMPLATE") == datestamp
+
+    stamp_template = date2name.StampTemplate("%Y%m%d-%H%M")
+    datestamp = stamp_template.classify("20190601-1230 name.txt")
+    assert (datestamp.kind, datestamp.year, datestamp.month, datestamp.day, datestamp.hour, datestamp.minute,
+            datestamp.second, datestamp.length) == ("TEMPLATE", "2019", "06", "01", "12", "30", None, 14)
+    assert stamp_template.classify("2019-06-01_name.txt").kind == "STANDARD"
+    assert stamp_template.classify("20190601-12_name.txt").kind == "COMPACT"
+    assert stamp_template.convert(date2name.classify_basename("2019-06-01T12.30.15_a.txt"), "a") == "20190601-1230"
+    assert stamp_template.convert(date2name.classify_basename("2019-02-30_a.txt"), "a") is None
+    for template in ["%Y-%m", "%Y"]:
+        stamp_template = date2name.StampTemplate(template)
+        assert stamp_template.classify("2019-06-01_name.txt").kind == "STANDARD"
+        assert stamp_template.classify("2019-06-01T10.20.30_x").kind == "WITHTIME_AND_SECONDS"
+    assert date2name.StampTemplate("%Y-%m").classify("2019-06_name.txt").kind == "TEMPLATE"
+    for template in ["%Y/%m", "%Y%Q", "name"]:
+        with pytest.raises(ValueError):
+            date2name.StampTemplate(template)
+    with pytest.raises(ValueError):
+        date2name.RenameConfig(template="%Y", compact=True)
+
+@pytest.mark.files
+@pytest.mark.default
+def test_file_stamp_template(tmp_path):
+    """Add a datestamp of a template, keep it on a second run, convert, remove, and reject bad templates."""
+    for name in ["a.txt", "2019-06-01_b.txt"]:
+        prepare_testfile(str(tmp_path / name))
+        os.utime(tmp_path / name, (1559384430, 1559384430))
+    stamp = time.strftime("%Y%m%d-%H%M", time.localtime(1559384430))
+
+    for _ in range(2):
+        status, output = getstatusoutput(f"python3 {PROGRAM} --format %Y%m%d-%H%M {tmp_path / '*.txt'}")
+        assert status == 0
+        assert sorted(path.name for path in tmp_path.iterdir()) == ["20190601-0000_b.txt", f"{stamp}_a.txt"]
+
+    status, output = getstatusoutput(f"python3 {PROGRAM} --format %Y%m%d-%H%M -r {tmp_path / '*.txt'}")
+    assert status == 0
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["a.txt", "b.txt"]
+
+    for options in ["--format %Y%Q", "--format %Y -C"]:
+        status, output = getstatusoutput(f"python3 {PROGRAM} {options} {tmp_path / 'a.txt'}")
+        assert status == 2
+        assert "error:" in output
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["a.txt", "b.txt"]
+
+@pytest.mark.files
+@pytest.mark.default
+def test_file_stamp_template_prefix(tmp_path):
+    """Convert and remove built-in datestamps which start like a datestamp of the template."""
+    names = ["2019-06-01_name.txt", "2019-06-01T10.20.30_x"]
+    for template, converted in [("%Y-%m", ["2019-06_name.txt", "2019-06_x"]), ("%Y", ["2019_name.txt", "2019_x"])]:
+        for name in names:
+            prepare_testfile(str(tmp_path / name))
+        status, output = getstatusoutput(f"python3 {PROGRAM} --format {template} {tmp_path / '2019*'}")
+        assert status == 0
+        assert sorted(path.name for path in tmp_path.iterdir()) == converted
+        for path in tmp_path.iterdir():
+            path.unlink()
+
+    for name in names:
+        prepare_testfile(str(tmp_path / name))
+    status, output = getstatusoutput(f"python3 {PROGRAM} --format %Y-%m -r {tmp_path / '2019*'}")
+    assert status == 0
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["name.txt", "x"]